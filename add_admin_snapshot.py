@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Patch script: Serve the aggregated admin snapshot.
+
+Patches theblackbox.py on the Raspberry Pi so its REST router includes
+the APIRouter from admin_snapshot.py. admin.html then refreshes from
+/admin/snapshot?since=<version> every 2 s, one request that costs a 304
+when nothing changed, instead of seven requests per refresh.
+
+The snapshot samples the existing routes in-process, so nothing else in
+theblackbox.py changes. admin.html falls back to the separate requests
+when the server has no /admin/snapshot.
+
+Usage on the Pi:
+  sudo cp event_stream.py admin_snapshot.py /opt/theblackbox/
+  sudo cp admin.html /var/www/html/theblackbox/
+  python3 add_admin_snapshot.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import sys
+
+from patch_helpers import mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+SNAPSHOT_MARKER = "include_router(admin_snapshot.router)"
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if SNAPSHOT_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (admin snapshot already mounted)")
+        return
+
+    mounted = mount_after_action_route(content, [
+        "# Aggregated admin state (admin_snapshot.py)",
+        "import admin_snapshot",
+        "admin_snapshot.start(self._rest_router)",
+        "self._rest_router." + SNAPSHOT_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount the admin snapshot after. Please add manually."
+        )
+        return
+    write_file(THEBLACKBOX_PY, mounted)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Admin Snapshot")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("admin.html now refreshes from /admin/snapshot on port 5000.")
+        print("Make sure admin_snapshot.py and event_stream.py are in")
+        print("/opt/theblackbox/ and the updated admin.html is deployed.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Patch script: Serve audio clips and live audio from a ring-buffered capture.
+
+Patches on the Raspberry Pi:
+
+1. theblackbox.py: its REST router includes the APIRouter from
+   audio_capture.py: /audio/clip?seconds=N, the last N seconds of a
+   continuous capture as an audio/wav body, and /audio/live, the same
+   capture as a live stream. admin.html's Listen (5 sec) loads
+   /audio/clip instead of waiting for /audio/stream to record and
+   base64-encode, and Live Listen plays /audio/live instead of the
+   Icecast mount on port 8000. /audio/stream itself is left as it is.
+2. start.sh: no longer starts blackbox-audio (audio-stream.sh feeding
+   Icecast), which would otherwise hold the microphone.
+
+Set AUDIO_DEVICE (and AUDIO_RATE) in the service environment if the
+microphone is not the ALSA default device (see audio_capture.py).
+
+Usage on the Pi:
+  sudo cp audio_capture.py /opt/theblackbox/
+  sudo cp admin.html /var/www/html/theblackbox/
+  python3 add_audio_capture.py
+  sudo systemctl disable --now blackbox-audio
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import sys
+
+from patch_helpers import mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+START_SH = "/opt/theblackbox/start.sh"
+
+AUDIO_MARKER = "include_router(audio_capture.router)"
+AUDIO_SERVICE_START = "(sleep 20 && sudo systemctl start blackbox-audio) &"
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if AUDIO_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (audio capture already mounted)")
+        return
+
+    mounted = mount_after_action_route(content, [
+        "# Ring-buffered microphone capture: /audio/clip, /audio/live (audio_capture.py)",
+        "import audio_capture",
+        "audio_capture.start()",
+        "self._rest_router." + AUDIO_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount the audio route after. Please add manually."
+        )
+        return
+    write_file(THEBLACKBOX_PY, mounted)
+    patched.append(THEBLACKBOX_PY)
+
+
+def patch_start_sh():
+    content = read_file(START_SH)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if AUDIO_SERVICE_START not in content:
+        skipped.append(f"{START_SH} (blackbox-audio not started)")
+        return
+
+    lines = content.split("\n")
+    idx = next(i for i, line in enumerate(lines) if AUDIO_SERVICE_START in line)
+    # Drop the comment that fix_boot_issues.py put above it, too
+    start = idx - 1 if idx > 0 and lines[idx - 1].startswith("# Start audio stream") else idx
+    del lines[start:idx + 1]
+    write_file(START_SH, "\n".join(lines))
+    patched.append(START_SH)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Ring-Buffered Audio")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+    patch_start_sh()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("Audio: /audio/clip?seconds=5 and /audio/live on port 5000.")
+        print("Stop the Icecast feed: sudo systemctl disable --now blackbox-audio")
+        print("Make sure audio_capture.py is in /opt/theblackbox/ and the")
+        print("updated admin.html is deployed.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
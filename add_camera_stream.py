@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Patch script: Serve camera frames and an MJPEG stream from one capture.
+
+Patches theblackbox.py on the Raspberry Pi so its REST router includes
+the APIRouter from camera_stream.py: /camera/frame (the latest frame as
+image/jpeg) and /camera/stream (MJPEG). admin.html's Take Photo loads
+/camera/frame instead of base64 JSON from /camera/photo, and Live View
+shows the stream. /camera/photo itself is left as it is.
+
+Set CAMERA_SOURCE=photo in the service environment if the camera is not
+driven by rpicam-vid/libcamera-vid; frames are then taken through the
+/camera/photo handler (see camera_stream.py).
+
+Usage on the Pi:
+  sudo cp camera_stream.py /opt/theblackbox/
+  sudo cp admin.html /var/www/html/theblackbox/
+  python3 add_camera_stream.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import sys
+
+from patch_helpers import mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+CAMERA_MARKER = "include_router(camera_stream.router)"
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if CAMERA_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (camera stream already mounted)")
+        return
+
+    mounted = mount_after_action_route(content, [
+        "# Shared camera capture: /camera/frame, /camera/stream (camera_stream.py)",
+        "import camera_stream",
+        "camera_stream.start(self._rest_router)",
+        "self._rest_router." + CAMERA_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount the camera routes after. Please add manually."
+        )
+        return
+    write_file(THEBLACKBOX_PY, mounted)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Camera Frames and MJPEG Stream")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("Camera frames: /camera/frame and /camera/stream on port 5000.")
+        print("Make sure camera_stream.py is in /opt/theblackbox/ and the")
+        print("updated admin.html is deployed.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
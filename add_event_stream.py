@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Patch script: Serve the kiosk's Server-Sent Events stream.
+
+Patches theblackbox.py on the Raspberry Pi:
+
+1. The REST router includes the APIRouter from event_stream.py, which
+   turns changes of the /banner response and the current challenge into
+   events. theblackbox.html then subscribes to /events once instead of
+   polling /banner every 500 ms and tip.php every 2 s.
+2. The /player/login, /player/logout and /challenge/action handlers are
+   wrapped in event_stream.poking(), so the banner and challenge change
+   they make is pushed as soon as they return.
+
+Tips are posted to /tip on port 5000 by admin.html now and kept in
+/opt/theblackbox/tip.json; tip.php is no longer read by the kiosk.
+
+Usage on the Pi:
+  sudo cp event_stream.py /opt/theblackbox/
+  sudo cp theblackbox.html admin.html /var/www/html/theblackbox/
+  python3 add_event_stream.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+from patch_helpers import insert_before_line, mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+EVENTS_MARKER = "include_router(event_stream.router)"
+POKE_MARKER = "event_stream.poking("
+
+# The handler expression, up to the methods argument or the closing paren
+POKE_ROUTES = ("challenge/action", "player/login", "player/logout")
+POKE_ROUTE = re.compile(
+    r'self\._rest_router\.add_api_route\("/(challenge/action|player/login|player/logout)",'
+    r'\s*(.+?)(?=,\s*methods=|\)\s*$)',
+    re.M)
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def mount_router(content):
+    """Step 1; returns the new content or None on error."""
+    # The sampled route handlers are looked up on first use, so it does
+    # not matter whether they are registered before or after this point
+    mounted = mount_after_action_route(content, [
+        "# Server-Sent Events for the kiosk (event_stream.py)",
+        "import event_stream",
+        "event_stream.start(self._rest_router, lambda: self._challenge_index)",
+        "self._rest_router." + EVENTS_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount the event stream after. Please add manually."
+        )
+    return mounted
+
+
+def poke_routes(content):
+    """Step 2; returns the new content or None on error."""
+    matches = list(POKE_ROUTE.finditer(content))
+    missing = sorted(set(POKE_ROUTES) - {m.group(1) for m in matches})
+    if missing:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the route(s) "
+            + ", ".join("/" + route for route in missing)
+            + " to push changes after. Please add manually."
+        )
+        return None
+
+    # Wrap from the end backwards, so the match offsets stay valid
+    for match in reversed(matches):
+        wrapped = f"{POKE_MARKER}{match.group(2)})"
+        content = content[:match.start(2)] + wrapped + content[match.end(2):]
+    return insert_before_line(content, matches[0].start(), [
+        "# Push the state these routes change right away (event_stream.py)",
+        "import event_stream",
+    ])
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+    original = content
+
+    for marker, step, what in ((EVENTS_MARKER, mount_router, "event stream already mounted"),
+                               (POKE_MARKER, poke_routes, "routes already push changes")):
+        if marker in content:
+            skipped.append(f"{THEBLACKBOX_PY} ({what})")
+            continue
+        content = step(content)
+        if content is None:
+            return
+
+    if content != original:
+        write_file(THEBLACKBOX_PY, content)
+        patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Server-Sent Events Stream")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("The kiosk now subscribes to /events on port 5000.")
+        print("Make sure event_stream.py is in /opt/theblackbox/ and the")
+        print("updated theblackbox.html and admin.html are deployed.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Patch script: Mount the GPIO routes inside the main BlackBox server.
+
+Patches theblackbox.py on the Raspberry Pi so its REST router includes
+the APIRouter from gpio_service.py. The /gpio/... routes are then served
+by the main server on port 5000, and the separate blackbox-gpio service
+on port 5001 is no longer needed.
+
+The GPIO hardware threads start on the first /gpio request, so the main
+server starts normally even when RPi.GPIO is missing; only the GPIO
+routes report an error then.
+
+Usage on the Pi:
+  sudo cp gpio_service.py gpio_backend.py /opt/theblackbox/
+  python3 add_gpio_router.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import sys
+
+from patch_helpers import mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+GPIO_MARKER = "include_router(gpio_router)"
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if GPIO_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (GPIO router already mounted)")
+        return
+
+    mounted = mount_after_action_route(content, [
+        "# GPIO routes (gpio_service.py), served in-process on this port",
+        "from gpio_service import router as gpio_router",
+        "self._rest_router." + GPIO_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount the GPIO router after. Please add manually."
+        )
+        return
+    write_file(THEBLACKBOX_PY, mounted)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Mount GPIO Router")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("GPIO routes are now served by theblackbox.py on port 5000.")
+        print("The standalone service can be disabled:")
+        print("  sudo systemctl disable --now blackbox-gpio.service")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Patch script: Answer highscore queries from an in-memory rank index.
+
+Patches theblackbox.py on the Raspberry Pi:
+
+1. The player store (self._db_store_alt) is wrapped in IndexedStore from
+   highscore_index.py. Calls pass straight through; players written by
+   the store's write methods (completion, hint penalty, rename) are
+   re-indexed right after.
+2. The highscore block of _rest_player_list (as written by
+   fix_highscore_dupes.py) reads the records from the index instead of
+   listing and serializing every completed player per request.
+
+The index is loaded from the database on first use, so it is rebuilt
+from the stored highscores after every restart.
+
+Usage on the Pi:
+  sudo cp highscore_index.py /opt/theblackbox/
+  python3 add_highscore_index.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+STORE_MARKER = "highscore_index.IndexedStore("
+LIST_MARKER = "self._db_store_alt.index.page("
+
+STORE_ASSIGN = re.compile(r"^([ \t]*)self\._db_store_alt = [^\n]*\n", re.M)
+HIGHSCORE_IF = "if highscore > 0:"
+UID_ELIF = "elif uid > 0:"
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def wrap_store(content):
+    """Step 1; returns the new content or None on error."""
+    match = STORE_ASSIGN.search(content)
+    if match is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the self._db_store_alt "
+            "assignment. Please add manually."
+        )
+        return None
+    indent = match.group(1)
+    wrapper = (
+        indent + "# Keep the highscore rank index (highscore_index.py) in step\n"
+        + indent + "import highscore_index\n"
+        + indent + "self._db_store_alt = " + STORE_MARKER
+        + "self._db_store_alt, Player.FLAGS_CHALLENGE_COMPLETE)\n"
+    )
+    return content[:match.end()] + wrapper + content[match.end():]
+
+
+def use_index(content):
+    """Step 2; returns the new content or None on error."""
+    start = content.find(HIGHSCORE_IF)
+    end = content.find(UID_ELIF, start)
+    if start == -1 or end == -1:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the highscore block of "
+            "_rest_player_list. Please add manually."
+        )
+        return None
+
+    line_start = content.rfind("\n", 0, start) + 1
+    indent = content[line_start:start]
+    block = (
+        HIGHSCORE_IF + "\n"
+        + indent + "    # Completed players, ranked, from highscore_index.py\n"
+        + indent + "    player_details.extend(" + LIST_MARKER + "))\n"
+        + indent
+    )
+    return content[:start] + block + content[end:]
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+    original = content
+
+    if STORE_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (player store already indexed)")
+    else:
+        content = wrap_store(content)
+        if content is None:
+            return
+
+    if LIST_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (highscore list already uses the index)")
+    else:
+        content = use_index(content)
+        if content is None:
+            return
+
+    if content != original:
+        write_file(THEBLACKBOX_PY, content)
+        patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Highscore Rank Index")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("/player/list?highscore=1 is now served from the rank index.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
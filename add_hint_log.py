@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Patch script: Persist the hints given to each player.
+
+Patches theblackbox.py on the Raspberry Pi (after add_hint_system.py):
+
+1. _rest_challenge_hint records every hint it gives in hint_log.py.
+   Recording only queues the row; it is written in the background.
+2. _player_data_load restores self._hints_used from the log instead of
+   starting from zero, so a restart mid-game keeps the hints already
+   given (and paid for). The restore goes after both the _hints_used
+   reset and the self._player assignment, whichever comes last, so it
+   looks up the player being loaded.
+3. The REST router includes the APIRouter from hint_log.py, which
+   serves the per-challenge statistics at /challenge/hint/stats. The
+   admin dashboard shows them under "Hints Used".
+
+Usage on the Pi:
+  sudo cp hint_log.py admin_snapshot.py /opt/theblackbox/
+  sudo cp admin.html /var/www/html/theblackbox/
+  python3 add_hint_log.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+from patch_helpers import insert_after_line, mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+HINT_COUNT = "self._hints_used[challenge_idx] = used"
+HINTS_RESET = "self._hints_used = {}"
+RECORD_MARKER = "hint_log.record("
+RESTORE_MARKER = "hint_log.hints_used("
+ROUTER_MARKER = "include_router(hint_log.router)"
+
+PLAYER_ASSIGN = re.compile(r"^[ \t]*self\._player = ", re.M)
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def record_hints(content):
+    """Step 1; returns the new content or None on error."""
+    idx = content.find(HINT_COUNT)
+    if idx == -1:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find '{HINT_COUNT}' in "
+            "_rest_challenge_hint. Run add_hint_system.py first."
+        )
+        return None
+    return insert_after_line(content, idx, [
+        "# Persist the hint given (hint_log.py)",
+        "import hint_log",
+        RECORD_MARKER + "self._player, challenge_idx, used)",
+    ])
+
+
+def restore_hints(content):
+    """Step 2; returns the new content or None on error."""
+    method = content.find("def _player_data_load")
+    end = content.find("\n    def ", method + 1) if method != -1 else -1
+    if end == -1:
+        end = len(content)
+    idx = content.find(HINTS_RESET, method, end) if method != -1 else -1
+    if idx == -1:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the _hints_used reset in "
+            "_player_data_load. Please add manually."
+        )
+        return None
+    # The restore looks up self._player, so it has to be assigned first
+    assigned = PLAYER_ASSIGN.search(content, method, end)
+    if assigned is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the self._player assignment in "
+            "_player_data_load. Please add manually."
+        )
+        return None
+    # Last line of the assignment, which may continue over several lines
+    indent = content.find("self._player", assigned.start()) - assigned.start()
+    line_start = assigned.start()
+    line_end = content.find("\n", line_start)
+    while (content.count("(", assigned.start(), line_end)
+           > content.count(")", assigned.start(), line_end)):
+        line_start = line_end + 1
+        line_end = content.find("\n", line_start)
+    idx = max(idx, line_start + indent)
+    return insert_after_line(content, idx, [
+        "# Hints this player was given before (hint_log.py)",
+        "import hint_log",
+        "self._hints_used = " + RESTORE_MARKER + "self._player)",
+    ])
+
+
+def mount_router(content):
+    """Step 3; returns the new content or None on error."""
+    mounted = mount_after_action_route(content, [
+        "# Persisted hint usage and statistics (hint_log.py)",
+        "import hint_log",
+        "hint_log.start()",
+        "self._rest_router." + ROUTER_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount /challenge/hint/stats after. Please add manually."
+        )
+    return mounted
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+    original = content
+
+    for marker, step, what in ((RECORD_MARKER, record_hints, "hints already recorded"),
+                               (RESTORE_MARKER, restore_hints, "hints already restored"),
+                               (ROUTER_MARKER, mount_router, "hint stats already mounted")):
+        if marker in content:
+            skipped.append(f"{THEBLACKBOX_PY} ({what})")
+            continue
+        content = step(content)
+        if content is None:
+            return
+
+    if content != original:
+        write_file(THEBLACKBOX_PY, content)
+        patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Persisted Hint Usage")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("Hints given are kept in /opt/theblackbox/hints.sqlite.")
+        print("Statistics: /challenge/hint/stats on port 5000.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
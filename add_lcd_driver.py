@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Patch script: Route lcd_screen.py through the shadow-framebuffer driver.
+
+Patches lcd_screen.py on the Raspberry Pi so LcdScreen stops driving the
+HD44780 directly:
+
+1. The init routine (original, v2 or v3 from the fix_lcd_* scripts) is
+   replaced by LcdDriver.init(), which does the full reset sequence.
+2. _lcd_write_four_bits() hands every nibble to LcdDriver.feed().
+3. LcdScreen gets write_glyphs(text, row, col) for text with custom
+   glyphs (skulls, blood drops, progress bars; see lcd_driver.py), which
+   keeps them in the CGRAM slot cache instead of re-uploading them.
+4. The sleep(0.002) calls fix_lcd_timing.py (or fix_lcd_revert.py) put
+   after clear display and return home in clear() are removed. Those
+   commands now only reset the target framebuffer; the driver waits for
+   the controller itself (busy flag or SLOW_COMMAND_TIME) on the writer
+   thread, so the sleeps only held up the caller for 4 ms.
+
+Everything else in LcdScreen stays as it is. Its command/data stream is
+decoded by lcd_driver.py into a target framebuffer, and only the cells
+that actually changed go out over I2C. clear() no longer blanks the
+panel: text rewritten with the same characters costs nothing, and
+clear + rewrite of a banner becomes a few cell writes.
+
+Usage on the Pi:
+  sudo cp lcd_driver.py /opt/theblackbox/
+  python3 add_lcd_driver.py
+  sudo bash /opt/theblackbox/restart.sh
+
+The unpatched file is kept as lcd_screen.py.orig.
+"""
+
+import os
+import re
+import shutil
+import sys
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+LCD_SCREEN_PY = "/opt/theblackbox/lcd_screen.py"
+
+DRIVER_MARKER = "self._lcd_driver = LcdDriver.open()"
+GLYPH_MARKER = "def write_glyphs(self"
+CLEAR_DEF = "    def clear(self):"
+
+# Init blocks written by the original code, fix_lcd_init_v2.py and
+# fix_lcd_init_v3.py
+INIT_BLOCKS = [
+    """            # Initialisation routine
+            self._lcd_write_cmd(0x03)
+            self._lcd_write_cmd(0x03)
+            self._lcd_write_cmd(0x03)
+            self._lcd_write_cmd(0x02)""",
+    """            # Initialisation routine (single nibble writes for 4-bit mode switch)
+            self._lcd_write_four_bits(0x30)
+            self._lcd_write_four_bits(0x30)
+            self._lcd_write_four_bits(0x30)
+            self._lcd_write_four_bits(0x20)""",
+    """            # Wait for LCD power stabilization (cold boot needs >40ms)
+            sleep(0.05)
+
+            # Initialisation routine - robust for both cold and warm boot
+            # HD44780 datasheet: send 0x3 three times with delays, then 0x2
+            self._lcd_write_four_bits(0x30)
+            sleep(0.005)  # >4.1ms after first
+            self._lcd_write_four_bits(0x30)
+            sleep(0.005)  # >4.1ms after second
+            self._lcd_write_four_bits(0x30)
+            sleep(0.0002)  # >100us after third
+            self._lcd_write_four_bits(0x20)
+            sleep(0.0002)""",
+]
+
+NEW_INIT = """            # Initialisation routine (lcd_driver.py)
+            # The driver resets the controller and keeps a shadow copy of
+            # DDRAM; everything written below is diffed against it
+            from lcd_driver import LcdDriver
+            """ + DRIVER_MARKER + """
+            self._lcd_driver.init()"""
+
+GLYPH_METHOD = '''    def write_glyphs(self, text, row=0, col=0):
+        """ Write text that may contain lcd_driver glyph characters """
+        # e.g. glyph("skull") + " 00:12:34", progress_bar(0.4, 16)
+        if getattr(self, "_lcd_driver", None) is not None:
+            self._lcd_driver.write(text, row, col)
+
+'''
+
+# Added to clear() by fix_lcd_timing.py / fix_lcd_revert.py
+CLEAR_SLEEP = re.compile(r"^[ \t]*sleep\(0\.002\)  # HD44780 (clear|return home) takes 1\.52ms\n",
+                         re.M)
+
+FOUR_BITS_DEF = re.compile(r"^([ \t]*)def _lcd_write_four_bits\(self, (\w+)\):[^\n]*\n", re.M)
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def wire_driver(content):
+    """Steps 1 and 2; returns the new content or None on error."""
+    # --- Step 1: Replace the init routine ---
+    for block in INIT_BLOCKS:
+        if block in content:
+            content = content.replace(block, NEW_INIT, 1)
+            break
+    else:
+        errors.append(
+            f"{LCD_SCREEN_PY}: Could not find a known init routine "
+            "(original, v2 or v3). Please add manually."
+        )
+        return None
+
+    # --- Step 2: Forward nibbles to the driver ---
+    match = FOUR_BITS_DEF.search(content)
+    if match is None:
+        errors.append(
+            f"{LCD_SCREEN_PY}: Could not find _lcd_write_four_bits(). "
+            "Please add manually."
+        )
+        return None
+
+    indent = match.group(1) + "    "
+    body_start = match.end()
+    # Keep a docstring as the first statement of the method
+    docstring = re.match(r"\s*('''|\"\"\").*?\1[^\n]*\n", content[body_start:], re.S)
+    if docstring:
+        body_start += docstring.end()
+
+    forward = (
+        indent + "# Shadow framebuffer driver (lcd_driver.py) does the I/O\n"
+        + indent + "if getattr(self, \"_lcd_driver\", None) is not None:\n"
+        + indent + "    self._lcd_driver.feed(" + match.group(2) + ")\n"
+        + indent + "    return\n"
+    )
+    return content[:body_start] + forward + content[body_start:]
+
+
+def add_glyph_method(content):
+    """Step 3; returns the new content or None on error."""
+    idx = content.find(CLEAR_DEF)
+    if idx == -1:
+        errors.append(
+            f"{LCD_SCREEN_PY}: Could not find clear() to add write_glyphs() "
+            "before. Please add manually."
+        )
+        return None
+    return content[:idx] + GLYPH_METHOD + content[idx:]
+
+
+def drop_clear_sleeps(content):
+    """Step 4; content without the fixed sleeps in clear() (if any)."""
+    start = content.find(CLEAR_DEF)
+    if start == -1:
+        return content
+    end = content.find("\n    def ", start + len(CLEAR_DEF))
+    if end == -1:
+        end = len(content)
+    return content[:start] + CLEAR_SLEEP.sub("", content[start:end]) + content[end:]
+
+
+def patch_lcd_screen():
+    content = read_file(LCD_SCREEN_PY)
+    if content is None:
+        return
+    original = content
+
+    # --- Already patched? ---
+    if DRIVER_MARKER in content:
+        skipped.append(f"{LCD_SCREEN_PY} (LCD driver already wired in)")
+    else:
+        content = wire_driver(content)
+        if content is None:
+            return
+
+    if GLYPH_MARKER in content:
+        skipped.append(f"{LCD_SCREEN_PY} (write_glyphs() already added)")
+    else:
+        content = add_glyph_method(content)
+        if content is None:
+            return
+
+    dropped = drop_clear_sleeps(content)
+    if dropped == content:
+        skipped.append(f"{LCD_SCREEN_PY} (no fixed sleeps in clear())")
+    content = dropped
+
+    if content != original:
+        if not os.path.exists(LCD_SCREEN_PY + ".orig"):
+            shutil.copy2(LCD_SCREEN_PY, LCD_SCREEN_PY + ".orig")
+        write_file(LCD_SCREEN_PY, content)
+        patched.append(LCD_SCREEN_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - LCD Shadow Framebuffer Driver")
+    print("=" * 60)
+    print()
+
+    patch_lcd_screen()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("LcdScreen now only sends the cells that changed.")
+        print(f"Original saved as {LCD_SCREEN_PY}.orig")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Patch script: Run network actions as jobs on one worker thread.
+
+Patches theblackbox.py on the Raspberry Pi:
+
+1. The /network/action and /network/bypass handlers are wrapped in
+   network_jobs.queued(). Connect, disconnect and bypass changes
+   return a job right away and run on the job worker; the bypass
+   status (no parameters) and scan=1 are answered directly as before.
+2. The REST router includes the APIRouter from network_jobs.py, which
+   serves /network/jobs and /network/jobs/{id}.
+
+Apply after add_wifi_scan.py if both are used; the background
+scanner's scans then run on the job worker too.
+
+Usage on the Pi:
+  sudo cp network_jobs.py event_stream.py /opt/theblackbox/
+  sudo cp connect.html admin.html /var/www/html/theblackbox/
+  python3 add_network_jobs.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+from patch_helpers import insert_before_line
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+JOBS_MARKER = "network_jobs.queued("
+
+# The handler expression, up to the methods argument or the closing paren
+ROUTE = re.compile(
+    r'self\._rest_router\.add_api_route\("/network/(action|bypass)",\s*(.+?)(?=,\s*methods=|\)\s*$)',
+    re.M)
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if JOBS_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (network jobs already in place)")
+        return
+
+    matches = list(ROUTE.finditer(content))
+    if sorted(m.group(1) for m in matches) != ["action", "bypass"]:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /network/action and "
+            "/network/bypass routes. Please add manually."
+        )
+        return
+
+    # Start the worker and mount its routes before the first of the two
+    # routes, then wrap both handlers (from the end backwards, so the
+    # match offsets stay valid)
+    for match in reversed(matches):
+        wrapped = f'{JOBS_MARKER}{match.group(2)}, "{match.group(1)}")'
+        content = content[:match.start(2)] + wrapped + content[match.end(2):]
+    content = insert_before_line(content, matches[0].start(), [
+        "# Network actions as jobs on one worker (network_jobs.py)",
+        "import network_jobs",
+        "network_jobs.start(self._rest_router)",
+        "self._rest_router.include_router(network_jobs.router)",
+    ])
+
+    write_file(THEBLACKBOX_PY, content)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Network Job Queue")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("Network actions now return a job; follow it at")
+        print("/network/jobs/<id> or as network-job events on /events.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Patch script: Serve single players from a uid-keyed cache.
+
+Patches theblackbox.py on the Raspberry Pi so its REST router includes
+the APIRouter from player_cache.py. finish.html and other pages can then
+load GET /player/<uid> instead of /player/list?uid=<uid>.
+
+The cache is kept up to date by the player store wrapper from
+add_highscore_index.py, which has to be applied first.
+
+Usage on the Pi:
+  sudo cp player_cache.py highscore_index.py event_stream.py /opt/theblackbox/
+  sudo cp finish.html /var/www/html/theblackbox/
+  python3 add_player_cache.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import sys
+
+from patch_helpers import mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+CACHE_MARKER = "include_router(player_cache.router)"
+STORE_MARKER = "highscore_index.IndexedStore("
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if CACHE_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (player lookup already mounted)")
+        return
+
+    if STORE_MARKER not in content:
+        errors.append(
+            f"{THEBLACKBOX_PY}: The player store is not wrapped in IndexedStore "
+            "yet. Run add_highscore_index.py first."
+        )
+        return
+
+    # /player/{uid:int} only matches numbers, so /player/list and
+    # /player/logout are not affected
+    mounted = mount_after_action_route(content, [
+        "# Direct player lookup by uid (player_cache.py)",
+        "import player_cache",
+        "player_cache.start(self._db_store_alt, self._rest_router)",
+        "self._rest_router." + CACHE_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount the player lookup after. Please add manually."
+        )
+        return
+    write_file(THEBLACKBOX_PY, mounted)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Player Lookup Cache")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("GET /player/<uid> is now served from the player cache.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
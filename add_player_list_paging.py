@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Patch script: Page and window the /player/list highscore response.
+
+Patches theblackbox.py on the Raspberry Pi so /player/list?highscore=1
+takes these query parameters (all optional):
+
+  limit=20          - number of ranks from offset on (max 100)
+  offset=0          - first rank to send, 0-based
+  around_uid=123    - also send the players around this player's rank
+  window=2          - players above and below around_uid
+  fields=rank,player_name
+                    - only these keys per player
+  compact=1         - {"fields": [...], "rows": [[...], ...]} instead
+                      of one object per player
+  format=html       - the highscore.html list items, pre-rendered
+
+Every paged response also has "total" (completed players) and "rank"
+(of around_uid). Without any of the parameters the full list is
+returned as before, so older pages keep working.
+
+Needs the rank index from add_highscore_index.py.
+
+Usage on the Pi:
+  sudo cp highscore_index.py /opt/theblackbox/
+  sudo cp highscore.html admin.html /var/www/html/theblackbox/
+  python3 add_player_list_paging.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+from patch_helpers import insert_before_line
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+INDEX_LIST = "player_details.extend(self._db_store_alt.index.page())"
+PAGING_MARKER = "highscore_index.player_list("
+PAGING_PARAMS = ("limit: int = 0, offset: int = 0, around_uid: int = 0, "
+                 "window: int = 2, fields: str = \"\", compact: int = 0, "
+                 "format: str = \"json\"")
+
+LIST_DEF = re.compile(r"def _rest_player_list\(self([^)]*)\)")
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if PAGING_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (/player/list paging already added)")
+        return
+
+    idx = content.find(INDEX_LIST)
+    if idx == -1:
+        errors.append(
+            f"{THEBLACKBOX_PY}: The highscore list does not use the rank index "
+            "yet. Run add_highscore_index.py first."
+        )
+        return
+
+    match = LIST_DEF.search(content)
+    if match is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find def _rest_player_list(). "
+            "Please add manually."
+        )
+        return
+
+    # --- Step 1: Paging query parameters ---
+    params = match.group(1).rstrip().rstrip(",")
+    new_def = f"def _rest_player_list(self{params}, {PAGING_PARAMS})"
+
+    # --- Step 2: Answer paged requests from the index ---
+    content = insert_before_line(content, idx, [
+        "# Paged, windowed or pre-rendered list (highscore_index.py)",
+        "if limit or offset or around_uid or fields or compact or format != \"json\":",
+        "    import highscore_index",
+        "    return " + PAGING_MARKER + "self._db_store_alt.index, offset, limit,",
+        "                                        around_uid, window, fields, compact, format)",
+    ])
+    content = content[:match.start()] + new_def + content[match.end():]
+    write_file(THEBLACKBOX_PY, content)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Paged Player List")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("/player/list?highscore=1 now takes limit, offset, around_uid,")
+        print("window, fields, compact and format=html.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
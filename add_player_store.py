@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Patch script: Keep the players in SQLite (WAL, indexed).
+
+Patches theblackbox.py on the Raspberry Pi so the player store
+(self._db_store_alt) is opened through player_store.open_store(). On the
+first start the players of the current store are copied to
+/opt/theblackbox/players.sqlite; after that login, create and the
+highscore queries are answered from there, and writes are passed on to
+the current store as well (synchronously, so writes do not get faster).
+
+The SQLite store is put in right after the store is created, so the rank
+index from add_highscore_index.py, if applied, wraps it.
+
+Back up the current player database before the first restart. To go
+back, remove the two inserted lines; the current store has every write.
+
+Usage on the Pi:
+  sudo cp player_store.py /opt/theblackbox/
+  python3 add_player_store.py
+  sudo bash /opt/theblackbox/restart.sh
+
+Measure first with: python3 bench_player_store.py
+"""
+
+import os
+import re
+import sys
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+SQLITE_MARKER = "player_store.open_store("
+
+STORE_ASSIGN = re.compile(r"^([ \t]*)self\._db_store_alt = [^\n]*\n", re.M)
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if SQLITE_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (player store already in SQLite)")
+        return
+
+    # The first assignment creates the store; an IndexedStore wrap from
+    # add_highscore_index.py follows it and must stay outermost
+    match = STORE_ASSIGN.search(content)
+    if match is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the self._db_store_alt "
+            "assignment. Please add manually."
+        )
+        return
+
+    indent = match.group(1)
+    store_block = (
+        indent + "# Players in SQLite, migrated on first start (player_store.py)\n"
+        + indent + "import player_store\n"
+        + indent + "self._db_store_alt = " + SQLITE_MARKER + "self._db_store_alt, Player)\n"
+    )
+    content = content[:match.end()] + store_block + content[match.end():]
+    write_file(THEBLACKBOX_PY, content)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - SQLite Player Store")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("Players are copied to /opt/theblackbox/players.sqlite on the")
+        print("next start. Make sure player_store.py is in /opt/theblackbox/.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
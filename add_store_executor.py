@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Patch script: Run player store calls on a bounded read pool and a single writer.
+
+Patches theblackbox.py on the Raspberry Pi:
+
+1. The player store (self._db_store_alt) is wrapped by
+   store_executor.start() right after it is created, or after the
+   SQLite store from add_player_store.py when that is applied. Reads run
+   on a small pool of threads, writes one at a time on a writer thread.
+   The rank index from add_highscore_index.py, if applied, stays the
+   outermost wrap.
+2. The REST router includes the APIRouter from store_executor.py, which
+   serves the lanes' queue depth and wait times at /store/stats.
+3. The /player/login, /player/create and /challenge/hint handlers are
+   wrapped in store_executor.busy_as_503(), so a full store queue is
+   answered with a 503 {"success": false, ...} the pages can show
+   instead of a 500.
+
+Usage on the Pi:
+  sudo cp store_executor.py /opt/theblackbox/
+  python3 add_store_executor.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+from patch_helpers import insert_before_line, mount_after_action_route
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+EXECUTOR_MARKER = "store_executor.start("
+ROUTER_MARKER = "include_router(store_executor.router)"
+
+BUSY_MARKER = "store_executor.busy_as_503("
+
+# The handler expression, up to the methods argument or the closing paren
+BUSY_ROUTES = ("player/login", "player/create", "challenge/hint")
+BUSY_ROUTE = re.compile(
+    r'self\._rest_router\.add_api_route\("/(player/login|player/create|challenge/hint)",'
+    r'\s*(.+?)(?=,\s*methods=|\)\s*$)',
+    re.M)
+
+SQLITE_ASSIGN = re.compile(r"^([ \t]*)self\._db_store_alt = player_store\.open_store\([^\n]*\n", re.M)
+STORE_ASSIGN = re.compile(r"^([ \t]*)self\._db_store_alt = [^\n]*\n", re.M)
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def wrap_store(content):
+    """Step 1; returns the new content or None on error."""
+    match = SQLITE_ASSIGN.search(content) or STORE_ASSIGN.search(content)
+    if match is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the self._db_store_alt "
+            "assignment. Please add manually."
+        )
+        return None
+    indent = match.group(1)
+    wrapper = (
+        indent + "# Store calls on a read pool and one writer (store_executor.py)\n"
+        + indent + "import store_executor\n"
+        + indent + "self._db_store_alt = " + EXECUTOR_MARKER + "self._db_store_alt)\n"
+    )
+    return content[:match.end()] + wrapper + content[match.end():]
+
+
+def mount_router(content):
+    """Step 2; returns the new content or None on error."""
+    mounted = mount_after_action_route(content, [
+        "# Player store queue statistics (store_executor.py)",
+        "self._rest_router." + ROUTER_MARKER,
+    ])
+    if mounted is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /challenge/action route to "
+            "mount /store/stats after. Please add manually."
+        )
+    return mounted
+
+
+def wrap_handlers(content):
+    """Step 3; returns the new content or None on error."""
+    matches = list(BUSY_ROUTE.finditer(content))
+    if not matches:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /player/login, /player/create "
+            "or /challenge/hint routes. Please add manually."
+        )
+        return None
+    found = {m.group(1) for m in matches}
+    for route in BUSY_ROUTES:
+        if route not in found:
+            skipped.append(f"{THEBLACKBOX_PY} (no /{route} route to answer 503 on)")
+
+    # From the end backwards, so the match offsets stay valid
+    for match in reversed(matches):
+        wrapped = f"{BUSY_MARKER}{match.group(2)})"
+        content = content[:match.start(2)] + wrapped + content[match.end(2):]
+    return insert_before_line(content, matches[0].start(), [
+        "# A full player store queue is a 503 (store_executor.py)",
+        "import store_executor",
+    ])
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+    original = content
+
+    if EXECUTOR_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (player store already pooled)")
+    else:
+        content = wrap_store(content)
+        if content is None:
+            return
+
+    if ROUTER_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (/store/stats already mounted)")
+    else:
+        content = mount_router(content)
+        if content is None:
+            return
+
+    if BUSY_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (store handlers already answer 503)")
+    else:
+        content = wrap_handlers(content)
+        if content is None:
+            return
+
+    if content != original:
+        write_file(THEBLACKBOX_PY, content)
+        patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Pooled Player Store Access")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("Player store calls now run on a read pool and one writer.")
+        print("Queue depth and wait times: /store/stats on port 5000.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
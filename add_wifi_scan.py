@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Patch script: Serve /network/list from a background Wi-Fi scanner.
+
+Patches theblackbox.py on the Raspberry Pi:
+
+1. /network/list is answered by wifi_scan.network_list(), from an access
+   point table that a scanner thread refreshes through the original
+   handler. It takes ?since=<version> and then only sends changes.
+2. The /network/action handler is wrapped in wifi_scan.shared_scan(), so
+   scan=1 requests join the scanner's scan instead of each starting one.
+   All other actions go to the handler unchanged.
+
+The scanner only scans while connect.html is open (see wifi_scan.py for
+the intervals).
+
+Usage on the Pi:
+  sudo cp wifi_scan.py /opt/theblackbox/
+  sudo cp connect.html /var/www/html/theblackbox/
+  python3 add_wifi_scan.py
+  sudo bash /opt/theblackbox/restart.sh
+"""
+
+import os
+import re
+import sys
+
+from patch_helpers import insert_before_line
+
+# ---------------------------------------------------------------------------
+# File paths on the Pi
+# ---------------------------------------------------------------------------
+THEBLACKBOX_PY = "/opt/theblackbox/theblackbox.py"
+
+SCAN_MARKER = "wifi_scan.network_list"
+
+LIST_ROUTE = re.compile(r'self\._rest_router\.add_api_route\("/network/list",\s*([\w.]+)')
+ACTION_ROUTE = re.compile(r'self\._rest_router\.add_api_route\("/network/action",\s*([\w.]+)')
+
+errors = []
+patched = []
+skipped = []
+
+
+def read_file(path):
+    """Read a file and return its contents, or None on failure."""
+    if not os.path.exists(path):
+        errors.append(f"File not found: {path}")
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+
+def write_file(path, content):
+    """Write content to a file."""
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def patch_theblackbox():
+    content = read_file(THEBLACKBOX_PY)
+    if content is None:
+        return
+
+    # --- Already patched? ---
+    if SCAN_MARKER in content:
+        skipped.append(f"{THEBLACKBOX_PY} (Wi-Fi scanner already in place)")
+        return
+
+    list_match = LIST_ROUTE.search(content)
+    action_match = ACTION_ROUTE.search(content)
+    if list_match is None or action_match is None:
+        errors.append(
+            f"{THEBLACKBOX_PY}: Could not find the /network/list and "
+            "/network/action routes. Please add manually."
+        )
+        return
+    list_handler = list_match.group(1)
+    action_handler = action_match.group(1)
+
+    # Start the scanner before the first of the two routes; /network/list
+    # is then served from it and scan=1 actions join its scans. Edits are
+    # applied from the end backwards so the match offsets stay valid.
+    first = min(list_match.start(), action_match.start())
+    edits = sorted([
+        (action_match.start(1), action_match.end(1),
+         f"wifi_scan.shared_scan({action_handler})"),
+        (list_match.start(1), list_match.end(1), SCAN_MARKER),
+    ], reverse=True)
+    for start, end, text in edits:
+        content = content[:start] + text + content[end:]
+    content = insert_before_line(content, first, [
+        "# Access points from the background scanner (wifi_scan.py)",
+        "import wifi_scan",
+        f"wifi_scan.start({list_handler}, {action_handler})",
+    ])
+
+    write_file(THEBLACKBOX_PY, content)
+    patched.append(THEBLACKBOX_PY)
+
+
+# ===========================================================================
+# Main
+# ===========================================================================
+def main():
+    print("=" * 60)
+    print("  The BlackBox - Background Wi-Fi Scanner")
+    print("=" * 60)
+    print()
+
+    patch_theblackbox()
+
+    if patched:
+        print("PATCHED successfully:")
+        for p in patched:
+            print(f"  + {p}")
+        print()
+
+    if skipped:
+        print("SKIPPED (already applied):")
+        for s in skipped:
+            print(f"  ~ {s}")
+        print()
+
+    if errors:
+        print("ERRORS:")
+        for e in errors:
+            print(f"  ! {e}")
+        print()
+
+    if not errors:
+        print("/network/list is now served from the scanner's cache and")
+        print("takes ?since=<version> for changes only.")
+    else:
+        print("Some patches had errors - please review above.")
+
+    print()
+    print("Restart needed: sudo bash /opt/theblackbox/restart.sh")
+    print()
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Aggregated admin state with conditional GET.
+
+The route lives on an APIRouter that theblackbox.py mounts in-process
+(see add_admin_snapshot.py). admin.html refreshes from this one request
+instead of seven (status, challenge/status, banner, sensors/status,
+player/list?highscore=1, network/status and network/bypass). The
+response itself stands in for /status, which only told the page the
+server was up.
+
+Provides:
+  GET /admin/snapshot             - All sections, with an ETag
+  GET /admin/snapshot?since=N     - Only the sections changed after version N
+  GET /admin/snapshot?fresh=1     - Sample every section now (after actions)
+
+Response:
+  {"version": 1792336601234, "delta": false,
+   "sections": {"challenge": ..., "banner": ..., "sensors": ...,
+                "players": ..., "network": ..., "bypass": ...,
+                "hints": ...}}
+
+Each section is the unchanged response of the route it replaces. The
+sections are sampled by calling those route handlers in-process, at
+most once per MAX_AGE however many admin tablets are open. The player
+list is the top 10 the dashboard shows; "hints" is hint_log.py's
+statistics (an error without add_hint_log.py). A sample that differs
+from the stored one bumps the version, so the version only moves when
+something an admin can see has changed.
+
+Conditional requests cost a 304 without a body: If-None-Match with the
+current ETag, or since= with the current version. Versions start at the
+server's boot time, so a since= from before a restart gets the full
+state.
+"""
+
+import threading
+import time
+
+from fastapi import APIRouter, Request, Response
+
+from event_stream import route_source
+
+# Section name -> (route, query parameters) in theblackbox.py
+SECTIONS = {
+    "challenge": ("/challenge/status", {}),
+    "banner": ("/banner", {}),
+    "sensors": ("/sensors/status", {}),
+    "players": ("/player/list", {"highscore": 1, "limit": 10}),
+    "network": ("/network/status", {}),
+    "bypass": ("/network/bypass", {}),
+    "hints": ("/challenge/hint/stats", {}),
+}
+
+MAX_AGE = 1.0                       # seconds between samples of a section
+
+
+class SnapshotState:
+    """Last sample of every section, each with the version it changed at."""
+
+    def __init__(self, sources):
+        self._sources = sources
+        self._lock = threading.Lock()
+        # Starts at the boot time, so versions from before a restart are
+        # older than any section and get the full state
+        self.version = int(time.time() * 1000)
+        self._sections = {}         # name -> (version, data)
+        self._sampled = {}          # name -> monotonic time of last sample
+        self.samples = 0
+
+    def refresh(self):
+        """Re-sample the sections that are older than their max age."""
+        # Claim the due sections under the lock, but call the route
+        # handlers outside it: a slow one must not block since()
+        with self._lock:
+            now = time.monotonic()
+            due = [name for name in self._sources
+                   if now - self._sampled.get(name, -MAX_AGE) >= MAX_AGE]
+            for name in due:
+                self._sampled[name] = now
+            self.samples += len(due)
+
+        samples = {}
+        for name in due:
+            try:
+                samples[name] = self._sources[name]()
+            except Exception as e:
+                samples[name] = {"error": str(e)}
+
+        with self._lock:
+            for name, data in samples.items():
+                current = self._sections.get(name)
+                if current is None or current[1] != data:
+                    self.version += 1
+                    self._sections[name] = (self.version, data)
+
+    def invalidate(self, name=None):
+        """Sample a section (default: all) on the next request."""
+        with self._lock:
+            if name is None:
+                self._sampled.clear()
+            else:
+                self._sampled.pop(name, None)
+
+    def since(self, version):
+        """Return (current version, sections changed after version)."""
+        with self._lock:
+            if version is None or version > self.version:
+                version = -1
+            sections = {name: data for name, (changed, data) in self._sections.items()
+                        if changed > version}
+            return self.version, sections
+
+
+state = None
+
+
+def start(api_router):
+    """Sample the admin sections from the routes on api_router."""
+    global state
+    state = SnapshotState({name: route_source(api_router, path, **params)
+                           for name, (path, params) in SECTIONS.items()})
+
+
+def invalidate(name=None):
+    if state is not None:
+        state.invalidate(name)
+
+
+router = APIRouter()
+
+
+@router.get("/admin/snapshot")
+def admin_snapshot(request: Request, response: Response, since: int = -1, fresh: int = 0):
+    if state is None:
+        return {"error": "Admin snapshot not started"}
+    if fresh:
+        state.invalidate()
+    state.refresh()
+    version, sections = state.since(since if since >= 0 else None)
+    # A delta depends on since= as well as on the version
+    etag = f'"{version}"' if since < 0 else f'"{version}-{since}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == etag or since == version:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return {"version": version, "delta": since >= 0 and since <= version, "sections": sections}
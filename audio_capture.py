@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Continuous microphone capture into a ring buffer.
+
+admin.html's Listen (5 sec) used /audio/stream, which records for five
+seconds inside the request and then sends the WAV base64-encoded in
+JSON. The route here lives on an APIRouter that theblackbox.py mounts
+in-process (see add_audio_capture.py) and is served from a capture
+thread that keeps the last BUFFER_SECONDS of PCM in memory:
+
+Provides:
+  GET /audio/clip?seconds=5      - The last N seconds (1 to MAX_CLIP) as
+                                   an audio/wav body, sent as it is read
+  GET /audio/live?chunk_ms=100   - Live audio/wav of unbounded length, sent
+                                   in chunks of chunk_ms (MIN_CHUNK_MS to
+                                   MAX_CHUNK_MS) as they are captured
+
+While capture is running the clip is already in the buffer and is sent
+at once. Capture starts with the first request and pauses IDLE_AFTER
+seconds after the last one, so the microphone and CPU are left alone
+between game master checks. A clip asked for while paused (or just
+after) starts with the audio that is there and is completed live.
+When no audio arrives within STALL_TIMEOUT (no microphone, arecord
+failing), a clip or live request is answered with a 503 instead. When
+capture stops in the middle of a clip, the rest is sent as silence, so
+the body always has the length it announced.
+
+Capture runs one arecord process, 16-bit mono PCM:
+  AUDIO_DEVICE  - ALSA capture device (default "default")
+  AUDIO_RATE    - sample rate in Hz (default 16000)
+/audio/stream is left as it is, but cannot record while capture holds
+a device that is not shared (dsnoop).
+
+/audio/live replaces the Icecast mount that blackbox-audio fed: it
+starts at the newest audio, and a listener that falls more than
+LIVE_MAX_CHUNKS chunks behind (slow Wi-Fi) skips ahead to the newest
+chunk instead of hearing the room later and later.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+
+log = logging.getLogger(__name__)
+
+BUFFER_SECONDS = 30
+MAX_CLIP = BUFFER_SECONDS
+IDLE_AFTER = 300.0                  # seconds without requests before capture pauses
+CHUNK_SECONDS = 0.02                # arecord read size
+RETRY_DELAY = 2.0                   # seconds before restarting a failed arecord
+STALL_TIMEOUT = 5.0                 # seconds without new audio before giving up
+DEFAULT_CHUNK_MS = 100              # /audio/live chunk without ?chunk_ms=
+MIN_CHUNK_MS = 20
+MAX_CHUNK_MS = 1000
+LIVE_MAX_CHUNKS = 5                 # a listener further behind skips ahead
+STREAM_SIZE = 0xFFFFFFFF            # WAV size field of a stream without end
+SAMPLE_WIDTH = 2                    # S16_LE
+CHANNELS = 1
+
+# AudioCapture set by start()
+capture = None
+
+
+class PcmRing:
+    """Fixed-size PCM buffer addressed by absolute byte positions."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._lock = threading.Lock()
+        self.total = 0              # bytes ever written
+        self.start = 0              # position the current capture began at
+
+    def reset(self):
+        """Forget the buffered audio (capture restarted after a pause)."""
+        with self._lock:
+            self.start = self.total
+
+    def write(self, data):
+        with self._lock:
+            if len(data) > self.capacity:
+                self.total += len(data) - self.capacity
+                data = data[-self.capacity:]
+            at = self.total % self.capacity
+            head = min(len(data), self.capacity - at)
+            self._buf[at:at + head] = data[:head]
+            self._buf[:len(data) - head] = data[head:]
+            self.total += len(data)
+
+    def oldest(self):
+        """First position still in the buffer."""
+        with self._lock:
+            return max(self.start, self.total - self.capacity)
+
+    def available(self):
+        """Bytes of the current capture still in the buffer."""
+        return self.total - self.oldest()
+
+    def read(self, pos, max_bytes):
+        """(data, next position) from pos on; skips ahead past overwritten audio."""
+        with self._lock:
+            pos = max(pos, self.start, self.total - self.capacity)
+            end = min(self.total, pos + max_bytes)
+            at, size = pos % self.capacity, end - pos
+            head = min(size, self.capacity - at)
+            data = bytes(self._buf[at:at + head]) + bytes(self._buf[:size - head])
+            return data, end
+
+
+class AudioCapture:
+    """arecord into a PcmRing, while someone has asked recently."""
+
+    def __init__(self, device="default", rate=16000):
+        self.device = device
+        self.rate = rate
+        self.bytes_per_second = rate * SAMPLE_WIDTH * CHANNELS
+        self.ring = PcmRing(BUFFER_SECONDS * self.bytes_per_second)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wanted = 0.0
+
+    def want(self):
+        """Keep capturing for another IDLE_AFTER seconds."""
+        with self._lock:
+            self._wanted = time.monotonic()
+            if self._thread is None:
+                # Audio from before the pause is not continuous with what follows
+                self.ring.reset()
+                self._thread = threading.Thread(target=self._run, name="audio-capture",
+                                                daemon=True)
+                self._thread.start()
+
+    def _idle(self):
+        return time.monotonic() - self._wanted > IDLE_AFTER
+
+    def _arecord(self):
+        command = shutil.which("arecord")
+        if command is None:
+            raise RuntimeError("arecord not found")
+        return subprocess.Popen(
+            [command, "-q", "-t", "raw", "-f", "S16_LE", "-c", str(CHANNELS),
+             "-r", str(self.rate), "-D", self.device],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+
+    def _run(self):
+        frame = SAMPLE_WIDTH * CHANNELS
+        chunk = int(self.bytes_per_second * CHUNK_SECONDS)
+        while True:
+            # Decided under the lock, so a want() either sees this thread
+            # still running or starts a new one
+            with self._lock:
+                if self._idle():
+                    self._thread = None
+                    return
+            proc = None
+            try:
+                proc = self._arecord()
+                rest = b""
+                while not self._idle():
+                    data = proc.stdout.read(chunk)
+                    if not data:
+                        raise RuntimeError(f"arecord exited ({proc.poll()})")
+                    # Whole sample frames only, so positions stay aligned
+                    data = rest + data
+                    cut = len(data) - len(data) % frame
+                    rest = data[cut:]
+                    self.ring.write(data[:cut])
+            except Exception as e:
+                log.warning("Audio capture failed: %s", e)
+                time.sleep(RETRY_DELAY)
+                self.ring.reset()
+            finally:
+                if proc is not None:
+                    proc.terminate()
+                    try:
+                        proc.wait(timeout=2)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+
+    def wav_header(self, data_size):
+        return (b"RIFF" + struct.pack("<I", min(36 + data_size, STREAM_SIZE)) + b"WAVE"
+                + b"fmt " + struct.pack("<IHHIIHH", 16, 1, CHANNELS, self.rate,
+                                        self.bytes_per_second, SAMPLE_WIDTH * CHANNELS,
+                                        SAMPLE_WIDTH * 8)
+                + b"data" + struct.pack("<I", data_size))
+
+
+def start():
+    """Serve /audio/clip and /audio/live; the device comes from $AUDIO_DEVICE and $AUDIO_RATE."""
+    global capture
+    if capture is None:
+        capture = AudioCapture(os.environ.get("AUDIO_DEVICE", "default"),
+                               int(os.environ.get("AUDIO_RATE", "16000")))
+    return capture
+
+
+router = APIRouter()
+
+
+async def _audio_arrived():
+    """Wait up to STALL_TIMEOUT for captured audio; False if none came."""
+    deadline = time.monotonic() + STALL_TIMEOUT
+    while not capture.ring.available():
+        if time.monotonic() > deadline:
+            return False
+        capture.want()
+        await asyncio.sleep(CHUNK_SECONDS * 5)
+    return True
+
+
+async def _clip(size):
+    """The last size bytes, then live audio until size bytes are sent."""
+    ring = capture.ring
+    yield capture.wav_header(size)
+    pos = max(ring.total - size, ring.oldest())
+    left = size
+    last_data = time.monotonic()
+    while left > 0:
+        capture.want()
+        data, pos = ring.read(pos, left)
+        if data:
+            left -= len(data)
+            last_data = time.monotonic()
+            yield data
+        elif time.monotonic() - last_data > STALL_TIMEOUT:
+            # The length is already sent; end the clip with silence
+            log.warning("Audio capture stalled; /audio/clip padded with silence")
+            yield bytes(left)
+            return
+        else:
+            await asyncio.sleep(CHUNK_SECONDS * 5)
+
+
+@router.get("/audio/clip")
+async def audio_clip(seconds: float = 5):
+    if capture is None:
+        return JSONResponse({"success": False, "error": "Audio capture not started"},
+                            status_code=503)
+    capture.want()
+    if not await _audio_arrived():
+        return JSONResponse({"success": False, "error": "No audio captured"},
+                            status_code=503)
+    seconds = min(max(seconds, 1), MAX_CLIP)
+    frame = SAMPLE_WIDTH * CHANNELS
+    size = int(seconds * capture.bytes_per_second) // frame * frame
+    return StreamingResponse(_clip(size), media_type="audio/wav",
+                             headers={"Content-Length": str(44 + size),
+                                      "Cache-Control": "no-store"})
+
+
+async def _live(chunk):
+    """Live audio in chunk-byte pieces, from the newest audio on."""
+    ring = capture.ring
+    yield capture.wav_header(STREAM_SIZE)
+    pos = ring.total
+    wait = chunk / capture.bytes_per_second / 4
+    while True:
+        capture.want()
+        # A slow client blocks the yield below; on return it drops what
+        # it missed rather than falling further behind
+        if ring.total - pos > LIVE_MAX_CHUNKS * chunk:
+            pos = ring.total - chunk
+        if ring.total - pos < chunk:
+            await asyncio.sleep(wait)
+            continue
+        data, pos = ring.read(pos, chunk)
+        yield data
+
+
+@router.get("/audio/live")
+async def audio_live(chunk_ms: int = DEFAULT_CHUNK_MS):
+    if capture is None:
+        return JSONResponse({"success": False, "error": "Audio capture not started"},
+                            status_code=503)
+    capture.want()
+    if not await _audio_arrived():
+        return JSONResponse({"success": False, "error": "No audio captured"},
+                            status_code=503)
+    chunk_ms = min(max(chunk_ms, MIN_CHUNK_MS), MAX_CHUNK_MS)
+    frame = SAMPLE_WIDTH * CHANNELS
+    chunk = capture.bytes_per_second * chunk_ms // 1000 // frame * frame
+    return StreamingResponse(_live(chunk), media_type="audio/wav",
+                             headers={"Cache-Control": "no-store"})
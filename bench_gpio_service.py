@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the GPIO service request path on any Linux machine.
+
+Runs the gpio_service.py router in-process on the simulated backend
+and fires concurrent /gpio/set requests at it, while a probe keeps
+timing a request that never touches hardware. With the hardware worker thread
+the probe latency stays flat however slow the (simulated) GPIO is.
+
+Usage:
+  python3 bench_gpio_service.py [--clients 20] [--requests 2000] [--latency-ms 2]
+
+Requires: pip3 install fastapi httpx
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"  {label:<8} n={len(ms):<6} "
+          f"p50={percentile(ms, 50):7.3f}ms  p95={percentile(ms, 95):7.3f}ms  "
+          f"p99={percentile(ms, 99):7.3f}ms  max={max(ms):7.3f}ms  "
+          f"mean={statistics.mean(ms):7.3f}ms")
+
+
+async def run(args):
+    import httpx
+    import gpio_service
+
+    transport = httpx.ASGITransport(app=gpio_service.create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://gpio") as client:
+        set_latency = []
+        probe_latency = []
+        done = asyncio.Event()
+        per_client = args.requests // args.clients
+
+        async def writer(client_id):
+            pin = 2 + client_id % 26
+            for i in range(per_client):
+                started = time.perf_counter()
+                await client.get(f"/gpio/set?pin={pin}&state={i % 2}")
+                set_latency.append(time.perf_counter() - started)
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/gpio/worker")
+                probe_latency.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(c) for c in range(args.clients)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+        stats = (await client.get("/gpio/worker")).json()
+
+    gpio_service.shutdown()
+
+    total = per_client * args.clients
+    print(f"backend={stats['backend']} latency={args.latency_ms}ms "
+          f"clients={args.clients} requests={total}")
+    print(f"  throughput {total / elapsed:.1f} req/s over {elapsed:.2f}s")
+    report("set", set_latency)
+    report("probe", probe_latency)
+    print(f"  worker commands={stats['commands']} busy={stats['busy_ms']}ms "
+          f"max_wait={stats['max_wait_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="simulated duration of every GPIO call")
+    args = parser.parse_args()
+
+    os.environ["GPIO_BACKEND"] = "sim"
+    os.environ["GPIO_SIM_LATENCY_MS"] = str(args.latency_ms)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the LCD transports: characters per second for the old one
+write_byte() per port change path and the batched I2C burst path.
+
+Every frame rewrites all 32 cells of the 16x2 display (two alternating
+screens, so the shadow framebuffer cannot skip anything).
+
+Without --bus the transports write to a fake bus that counts
+transactions and estimates the time they would take on a 100 kHz I2C
+bus; the "wire" figure adds that estimate to the measured time. With
+--bus the real display on that bus is used.
+
+Usage:
+  python3 bench_lcd.py [--frames 50] [--bus 6] [--address 0x27]
+"""
+
+import argparse
+import time
+
+from lcd_driver import DEFAULT_ADDRESS, TRANSPORTS, LcdDriver, open_bus
+
+# 100 kHz: 9 clocks per byte, plus start/address/stop per transaction
+I2C_BYTE_TIME = 90e-6
+I2C_TRANSACTION_TIME = 110e-6
+
+SCREENS = (
+    ["THE BLACKBOX    ", "ESCAPE 00:00:00 "],
+    ["0123456789ABCDEF", "fedcba9876543210"],
+)
+
+
+class CountingBus:
+    """Stand-in for smbus.SMBus that only counts traffic."""
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def write_byte(self, address, value):
+        self.transactions += 1
+        self.bytes += 1
+
+    def write_i2c_block_data(self, address, command, data):
+        self.transactions += 1
+        self.bytes += 1 + len(data)
+
+    def read_byte(self, address):
+        # Port latch only: the driver sees a warm display without R/W wired
+        self.transactions += 1
+        self.bytes += 1
+        return 0x08
+
+    def wire_time(self):
+        return self.transactions * I2C_TRANSACTION_TIME + self.bytes * I2C_BYTE_TIME
+
+
+def run(name, args):
+    bus = CountingBus() if args.bus is None else open_bus(args.bus)
+    transport = TRANSPORTS[name](bus, args.address)
+    # No settle delay and a flush per frame, so nothing is coalesced
+    lcd = LcdDriver(transport, settle=0)
+    lcd.init()
+    lcd.flush()
+
+    start_writes = lcd.writes
+    start_transactions = transport.transactions
+    started = time.perf_counter()
+    for frame in range(args.frames):
+        lcd.show(SCREENS[frame % 2])
+        lcd.flush()
+    elapsed = time.perf_counter() - started
+    lcd.close()
+
+    chars = args.frames * 32
+    line = (f"  {name:<6} {chars / elapsed:9.0f} chars/s  "
+            f"{(transport.transactions - start_transactions) / chars:5.2f} "
+            f"transactions/char  bytes sent={lcd.writes - start_writes}")
+    if isinstance(bus, CountingBus):
+        wire = elapsed + bus.wire_time()
+        line += f"  wire~{chars / wire:7.0f} chars/s"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--bus", type=int, default=None,
+                        help="I2C bus of a real display (default: fake bus)")
+    parser.add_argument("--address", type=lambda v: int(v, 0), default=DEFAULT_ADDRESS)
+    args = parser.parse_args()
+
+    target = "fake bus" if args.bus is None else f"bus {args.bus} @ {args.address:#04x}"
+    print(f"{args.frames} full-screen frames on {target}")
+    for name in ("byte", "burst"):
+        run(name, args)
+
+
+if __name__ == "__main__":
+    main()
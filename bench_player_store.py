@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark the player store: login, create and highscore latency.
+
+Seeds a database with --players players (a third of them completed)
+and times the same operations on two layouts of the players table:
+
+  before  - rollback journal, synchronous=FULL, no indexes besides the
+            uid key: lookups and the highscore query scan the table
+  after   - player_store.py: WAL, synchronous=NORMAL, indexes on
+            player_name, (flags, elapsed_time) and completed players
+
+Both layouts are measured on their own. In theblackbox.py every write
+(create, update, delete) is still passed on to the old store,
+synchronously, so a create there costs the old store's write on top
+of the "after" time; login and the highscore queries do not touch it.
+
+The databases are created in --dir (default: the current directory, so
+on the Pi the SD card is measured, not a RAM disk) and removed after.
+
+Usage:
+  python3 bench_player_store.py [--players 100000] [--ops 200] [--dir .]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import player_store
+from player_store import SqlitePlayerStore
+
+
+class BenchPlayer:
+    """Stand-in for theblackbox.py's Player."""
+
+    FLAGS_CHALLENGE_COMPLETE = 0x04
+
+    def __init__(self, uid, player_name, pin, elapsed_time, flags):
+        self._uid = uid
+        self._player_name = player_name
+        self._pin = pin
+        self._full_name = player_name.title()
+        self._email_address = ""
+        self._elapsed_time = elapsed_time
+        self._flags = flags
+
+    def get_uid(self):
+        return self._uid
+
+    def get_player_name(self):
+        return self._player_name
+
+    def get_elapsed_time(self):
+        return self._elapsed_time
+
+    def get_flags(self):
+        return self._flags
+
+
+class BeforeStore(SqlitePlayerStore):
+    """The same table without WAL, relaxed syncing or indexes."""
+
+    def __init__(self, path, player_class):
+        self.path = path
+        self._player_class = player_class
+        self._legacy = None
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flag_complete = 0     # no literal partial-index query
+        db = self._db()
+        db.execute("PRAGMA journal_mode=DELETE")
+        with db:
+            db.execute(player_store.SCHEMA[0])
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA synchronous=FULL")
+            self._local.db = db
+        return db
+
+
+def seed(count):
+    complete = BenchPlayer.FLAGS_CHALLENGE_COMPLETE
+    for uid in range(1, count + 1):
+        done = random.random() < 0.33
+        yield BenchPlayer(uid, f"player{uid}", f"{random.randint(0, 9999):04d}",
+                          random.randint(600, 7200) if done else 0,
+                          complete if done else 0)
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), sorted(times)[int(len(times) * 0.95) - 1]
+
+
+def run(name, store, players, args):
+    started = time.perf_counter()
+    store.import_players(players)
+    seeded = time.perf_counter() - started
+
+    pins = {p.get_uid(): p._pin for p in random.sample(players, min(args.ops, len(players)))}
+    uids = list(pins)
+    complete = BenchPlayer.FLAGS_CHALLENGE_COMPLETE
+    next_uid = [len(players)]
+
+    def login():
+        uid = random.choice(uids)
+        assert store.login(f"player{uid}", pins[uid]) is not None
+
+    def create():
+        next_uid[0] += 1
+        store.add_player(BenchPlayer(next_uid[0], f"new{next_uid[0]}", "1234", 0, 0))
+
+    def top20():
+        store.list_players(flags_include=complete, order_by="elapsed_time", limit=20)
+
+    def highscore():
+        store.list_players(flags_include=complete, order_by="elapsed_time")
+
+    print(f"  {name} (seeded in {seeded:.1f} s)")
+    for label, fn, runs in (("login", login, args.ops), ("create", create, args.ops),
+                            ("highscore top 20", top20, args.ops),
+                            ("highscore all", highscore, max(args.ops // 20, 3))):
+        median, p95 = timed(fn, runs)
+        print(f"    {label:<17} median {median:8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--dir", default=".")
+    args = parser.parse_args()
+
+    random.seed(1)
+    players = list(seed(args.players))
+    workdir = tempfile.mkdtemp(prefix="bench_player_store_", dir=args.dir)
+    print(f"{args.players} players, {args.ops} operations each, in {workdir}")
+    try:
+        run("before", BeforeStore(os.path.join(workdir, "before.sqlite"), BenchPlayer),
+            players, args)
+        run("after", SqlitePlayerStore(os.path.join(workdir, "after.sqlite"), BenchPlayer),
+            players, args)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Shared camera capture served as JPEG frames and an MJPEG stream.
+
+admin.html's Take Photo used /camera/photo, which captures one picture
+per request and sends it base64-encoded inside JSON. The routes here
+live on an APIRouter that theblackbox.py mounts in-process (see
+add_camera_stream.py) and are served from one capture thread:
+
+Provides:
+  GET /camera/frame              - The latest frame as image/jpeg
+  GET /camera/stream?fps=5       - multipart/x-mixed-replace MJPEG stream,
+                                   at most fps (1 to MAX_FPS) frames a second
+
+The capture thread starts with the first request and keeps the latest
+frame in memory; every viewer is sent that frame, so any number of
+admin tablets share one capture. It stops IDLE_AFTER seconds after the
+last request or stream, and frees the camera for /camera/photo.
+
+Sources, selected with the CAMERA_SOURCE environment variable:
+  mjpeg  - One long-running rpicam-vid (or libcamera-vid) writing MJPEG
+           to a pipe (default). CAMERA_WIDTH, CAMERA_HEIGHT and
+           CAMERA_FPS set its mode.
+  photo  - The existing /camera/photo handler, called CAMERA_FPS times a
+           second but at most PHOTO_MAX_FPS (each call is a full still
+           capture), for cameras the libcamera tools do not drive
+"""
+
+import asyncio
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from event_stream import route_source
+
+log = logging.getLogger(__name__)
+
+IDLE_AFTER = 10.0                   # seconds without viewers before capture stops
+FRAME_TIMEOUT = 5.0                 # longest /camera/frame waits for a first frame
+FRAME_MAX_AGE = 1.0                 # older frames are not served by /camera/frame
+CAPTURE_FPS = 10                    # source frame rate unless CAMERA_FPS is set
+PHOTO_MAX_FPS = 2                   # /camera/photo calls a second, at most
+MAX_FPS = 15
+DEFAULT_FPS = 5                     # /camera/stream rate without ?fps=
+RETRY_DELAY = 2.0                   # seconds before restarting a failed source
+BOUNDARY = "frame"
+
+SOI = b"\xff\xd8"                   # JPEG start and end of image markers
+EOI = b"\xff\xd9"
+
+# Camera set by start()
+camera = None
+
+
+def split_jpegs(chunks):
+    """JPEG images (SOI to EOI) in a byte stream read in chunks."""
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            start = buf.find(SOI)
+            if start == -1:
+                del buf[:-1]            # may be the first byte of an SOI
+                break
+            end = buf.find(EOI, start + 2)
+            if end == -1:
+                del buf[:start]
+                break
+            yield bytes(buf[start:end + 2])
+            del buf[:end + 2]
+
+
+class MjpegProcessSource:
+    """JPEG frames from a long-running libcamera MJPEG process."""
+
+    name = "mjpeg"
+    COMMANDS = ("rpicam-vid", "libcamera-vid")
+
+    def __init__(self, width, height, fps):
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    def frames(self):
+        command = next((shutil.which(c) for c in self.COMMANDS if shutil.which(c)), None)
+        if command is None:
+            raise RuntimeError("rpicam-vid/libcamera-vid not found")
+        proc = subprocess.Popen(
+            [command, "-t", "0", "-n", "--codec", "mjpeg",
+             "--width", str(self.width), "--height", str(self.height),
+             "--framerate", str(self.fps), "-o", "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        try:
+            yield from split_jpegs(iter(lambda: proc.stdout.read(65536), b""))
+            raise RuntimeError(f"{os.path.basename(command)} exited ({proc.poll()})")
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+class PhotoRouteSource:
+    """JPEG frames from the /camera/photo handler (base64 in JSON).
+
+    The handler takes a full still per call, so the rate is capped at
+    PHOTO_MAX_FPS; a handler slower than that is logged once and then
+    called back to back.
+    """
+
+    name = "photo"
+
+    def __init__(self, photo, fps):
+        self._photo = photo
+        self.interval = 1.0 / min(fps, PHOTO_MAX_FPS)
+        self.slow = False
+
+    def frames(self):
+        while True:
+            started = time.monotonic()
+            data = self._photo()
+            if not data.get("success"):
+                raise RuntimeError(data.get("error") or "/camera/photo failed")
+            took = time.monotonic() - started
+            if took > self.interval and not self.slow:
+                self.slow = True
+                log.warning("/camera/photo took %.2fs, camera runs at %.1f fps instead of %.1f",
+                            took, 1.0 / took, 1.0 / self.interval)
+            yield base64.b64decode(data["photo"])
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+
+class Camera:
+    """Latest frame of a source, captured while someone is watching."""
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._thread = None
+        self._wanted = 0.0
+        self.frame = None
+        self.seq = 0
+        self.frame_time = 0.0
+        self.frames = 0
+
+    def want(self):
+        """Keep capturing for another IDLE_AFTER seconds."""
+        with self._lock:
+            self._wanted = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="camera-capture",
+                                                daemon=True)
+                self._thread.start()
+
+    def _idle(self):
+        return time.monotonic() - self._wanted > IDLE_AFTER
+
+    def _run(self):
+        while True:
+            # Decided under the lock, so a want() either sees this thread
+            # still running or starts a new one
+            with self._lock:
+                if self._idle():
+                    self._thread = None
+                    return
+            frames = self.source.frames()
+            try:
+                for frame in frames:
+                    with self._lock:
+                        self.frame = frame
+                        self.seq += 1
+                        self.frame_time = time.monotonic()
+                        self.frames += 1
+                        self._new_frame.notify_all()
+                    if self._idle():
+                        break
+            except Exception as e:
+                log.warning("Camera source %s failed: %s", self.source.name, e)
+                time.sleep(RETRY_DELAY)
+            finally:
+                frames.close()
+
+    def latest(self, timeout=FRAME_TIMEOUT):
+        """A frame no older than FRAME_MAX_AGE, or None after timeout."""
+        self.want()
+        with self._lock:
+            self._new_frame.wait_for(
+                lambda: self.frame is not None and time.monotonic() - self.frame_time <= FRAME_MAX_AGE,
+                timeout)
+            if self.frame is None or time.monotonic() - self.frame_time > FRAME_MAX_AGE:
+                return None
+            return self.frame
+
+
+def create_source(api_router=None, name=None):
+    """The source named by `name` or $CAMERA_SOURCE (default mjpeg)."""
+    name = name or os.environ.get("CAMERA_SOURCE", MjpegProcessSource.name)
+    fps = int(os.environ.get("CAMERA_FPS", str(CAPTURE_FPS)))
+    if name == MjpegProcessSource.name:
+        return MjpegProcessSource(int(os.environ.get("CAMERA_WIDTH", "1280")),
+                                  int(os.environ.get("CAMERA_HEIGHT", "720")), fps)
+    if name == PhotoRouteSource.name:
+        return PhotoRouteSource(route_source(api_router, "/camera/photo"), fps)
+    raise ValueError(f"Unknown camera source: {name}")
+
+
+def start(api_router):
+    """Serve the camera routes; the photo source uses /camera/photo on api_router."""
+    global camera
+    if camera is None:
+        camera = Camera(create_source(api_router))
+    return camera
+
+
+router = APIRouter()
+
+
+@router.get("/camera/frame")
+def camera_frame():
+    if camera is None:
+        return JSONResponse({"success": False, "error": "Camera not started"}, status_code=503)
+    frame = camera.latest()
+    if frame is None:
+        return JSONResponse({"success": False, "error": "No frame from camera"}, status_code=503)
+    return Response(frame, media_type="image/jpeg", headers={"Cache-Control": "no-store"})
+
+
+async def _mjpeg(fps):
+    interval = 1.0 / fps
+    sent = 0
+    while True:
+        started = time.monotonic()
+        camera.want()
+        frame, seq = camera.frame, camera.seq
+        if frame is not None and seq != sent:
+            sent = seq
+            yield (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                   f"Content-Length: {len(frame)}\r\n\r\n").encode() + frame + b"\r\n"
+        await asyncio.sleep(max(interval - (time.monotonic() - started), 0.01))
+
+
+@router.get("/camera/stream")
+async def camera_stream(fps: float = DEFAULT_FPS):
+    if camera is None:
+        return JSONResponse({"success": False, "error": "Camera not started"}, status_code=503)
+    fps = min(max(fps, 1), MAX_FPS)
+    return StreamingResponse(_mjpeg(fps), media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+                             headers={"Cache-Control": "no-store"})
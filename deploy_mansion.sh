@@ -1,6 +1,10 @@
 #!/bin/bash
 # Deploy mansion challenge + GPIO service
 # Run this on the Pi: sudo bash deploy_mansion.sh
+#
+# The GPIO routes are mounted inside theblackbox.py (port 5000) by default.
+# Set GPIO_STANDALONE=1 to run them as the separate blackbox-gpio service
+# on port 5001 instead (pages then need gpioBase pointed at :5001).
 
 set -e
 
@@ -19,24 +23,40 @@ cp "$REPO_DIR/mansion_on_fixed.jpg" "$HTML_DIR/"
 # 2. Deploy GPIO service
 echo "Deploying GPIO service..."
 cp "$REPO_DIR/gpio_service.py" "$BB_DIR/"
+cp "$REPO_DIR/gpio_backend.py" "$BB_DIR/"
 
-# 3. Install and start GPIO systemd service
-echo "Installing GPIO systemd service..."
-cp "$REPO_DIR/blackbox-gpio.service" /etc/systemd/system/
-systemctl daemon-reload
-systemctl enable blackbox-gpio.service
-systemctl restart blackbox-gpio.service
-
-# 4. Wait and verify
-sleep 2
-if systemctl is-active --quiet blackbox-gpio.service; then
-    echo "GPIO service is running!"
+if [ "${GPIO_STANDALONE:-0}" = "1" ]; then
+    GPIO_PORT=5001
+
+    # 3. Install and start GPIO systemd service
+    echo "Installing GPIO systemd service..."
+    cp "$REPO_DIR/blackbox-gpio.service" /etc/systemd/system/
+    systemctl daemon-reload
+    systemctl enable blackbox-gpio.service
+    systemctl restart blackbox-gpio.service
+
+    # 4. Wait and verify
+    sleep 2
+    if systemctl is-active --quiet blackbox-gpio.service; then
+        echo "GPIO service is running!"
+    else
+        echo "WARNING: GPIO service failed to start. Check: journalctl -u blackbox-gpio.service"
+    fi
 else
-    echo "WARNING: GPIO service failed to start. Check: journalctl -u blackbox-gpio.service"
+    GPIO_PORT=5000
+
+    # 3. Mount the GPIO router in theblackbox.py, retire the standalone service
+    echo "Mounting GPIO routes in theblackbox.py..."
+    python3 "$REPO_DIR/add_gpio_router.py"
+    systemctl disable --now blackbox-gpio.service 2>/dev/null || true
+
+    # 4. Restart the main server to load the routes
+    bash "$BB_DIR/restart.sh"
+    sleep 5
 fi
 
 # 5. Test GPIO endpoint
-if curl -s http://127.0.0.1:5001/gpio/set?pin=17\&state=0 > /dev/null 2>&1; then
+if curl -s http://127.0.0.1:$GPIO_PORT/gpio/set?pin=17\&state=0 > /dev/null 2>&1; then
     echo "GPIO endpoint responding OK!"
 else
     echo "WARNING: GPIO endpoint not responding yet (may need a moment)"
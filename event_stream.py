@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events stream for the kiosk page.
+
+The routes live on an APIRouter that theblackbox.py mounts in-process
+(see add_event_stream.py). theblackbox.html opens one EventSource on
+/events instead of polling /banner every 500 ms and tip.php every 2 s.
+
+Provides:
+  GET  /events                - Server-Sent Events stream of state changes
+  GET  /events/state          - Current state and version as JSON
+  GET  /tip                   - Current tip {"tip": ..., "timestamp": ...}
+  POST /tip                   - {"message": "..."} or {"clear": true}
+
+Events (the SSE event name is the topic, data is JSON):
+  banner     - the /banner response, when player or wifi state changes
+  challenge  - {"index": n} when the current challenge changes
+  tip        - {"tip": text or null, "timestamp": unix time}
+  snapshot   - {"version": n, "banner": ..., "challenge": ..., ...}
+
+Every event carries an increasing version as its SSE id. A browser that
+reconnects sends it back as Last-Event-ID and gets the events it missed
+replayed from a short history; when the gap is too old, or the client
+fell too far behind, it gets a snapshot of the full state instead. New
+connections always start with a snapshot.
+
+Banner and challenge state is owned by theblackbox.py. The login,
+logout and challenge action routes are wrapped in poking() (see
+add_event_stream.py), so their changes are sampled and pushed as soon
+as the handler returns. A watcher thread also samples the state
+in-process (the /banner route handler and _challenge_index) every
+INTERVAL, for changes made elsewhere, and publishes only when something
+changed.
+
+Tips are published as they arrive. The current tip is kept in TIP_PATH,
+so it survives a restart like tip.php's did.
+
+Page example:
+  var source = new EventSource(theBlackBoxBase + "events");
+  source.addEventListener("banner", function(e) {
+      var banner = JSON.parse(e.data); ... });
+"""
+
+import asyncio
+import atexit
+import collections
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+log = logging.getLogger(__name__)
+
+TIP_PATH = "/opt/theblackbox/tip.json"
+
+# Watcher thread, created on the first request after start()
+watcher = None
+_sources = None
+_start_lock = threading.Lock()
+
+# Sent instead of an event when a subscriber has to resync from a snapshot
+RESYNC = None
+
+
+class EventHub:
+    """Versioned state plus a fan-out of changes to stream subscribers."""
+
+    HISTORY = 200              # events kept for Last-Event-ID resume
+    QUEUE_SIZE = 100           # per subscriber; a full queue forces a resync
+
+    def __init__(self):
+        self.loop = None
+        self._lock = threading.Lock()
+        self._version = 0
+        self._state = {}
+        self._history = collections.deque(maxlen=self.HISTORY)
+        self._subscribers = set()
+
+    def attach(self, loop):
+        self.loop = loop
+
+    def publish(self, topic, data, changes_only=True):
+        """Record a new value for topic; callable from any thread.
+
+        With changes_only, a value equal to the current one is dropped.
+        Returns the event's version, or None when nothing was published.
+        """
+        with self._lock:
+            if changes_only and self._state.get(topic) == data:
+                return None
+            self._version += 1
+            event = {"id": self._version, "event": topic, "data": data}
+            self._state[topic] = data
+            self._history.append(event)
+            # Queued under the lock so subscribers see versions in order
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self._fanout, event)
+            return self._version
+
+    def _fanout(self, event):
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait(RESYNC)
+            else:
+                subscriber.put_nowait(event)
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        state = dict(self._state)
+        state["version"] = self._version
+        return {"id": self._version, "event": "snapshot", "data": state}
+
+    def subscribe(self, last_id=None):
+        """Return (queue, backlog); backlog is what the client missed."""
+        subscriber = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            oldest = self._history[0]["id"] if self._history else self._version + 1
+            if last_id is not None and oldest - 1 <= last_id <= self._version:
+                backlog = [e for e in self._history if e["id"] > last_id]
+            else:
+                backlog = [self._snapshot()]
+            self._subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def count(self):
+        return len(self._subscribers)
+
+
+hub = EventHub()
+
+
+def route_source(api_router, path, **params):
+    """Return a callable that runs the GET handler registered for path.
+
+    The route is looked up on first use, so it may be added to the router
+    after this is called. params, and keyword arguments of the call, are
+    passed on as query parameters, as far as the handler takes them.
+    """
+    endpoint = None
+    accepted = ()
+
+    def call(**extra):
+        nonlocal endpoint, accepted
+        if endpoint is None:
+            for route in api_router.routes:
+                if getattr(route, "path", None) == path and "GET" in getattr(route, "methods", ()):
+                    accepted = inspect.signature(route.endpoint).parameters
+                    endpoint = route.endpoint
+                    break
+            else:
+                raise LookupError(f"no GET route for {path}")
+        kwargs = {k: v for k, v in {**params, **extra}.items() if k in accepted}
+        return endpoint(**kwargs)
+
+    return call
+
+
+class StateWatcher(threading.Thread):
+    """Samples state owned by theblackbox.py and publishes the changes."""
+
+    # Fallback for changes not made through a poking() route, such as
+    # the Wi-Fi state in the banner
+    INTERVAL = 2.0
+
+    def __init__(self, hub, sources):
+        super().__init__(name="event-watcher", daemon=True)
+        self._hub = hub
+        self._sources = sources
+        self._failing = set()
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+
+    def sample(self):
+        for topic, source in self._sources.items():
+            try:
+                # Round trip through JSON: what subscribers get, and a
+                # stable value to compare against
+                value = json.loads(json.dumps(source(), default=str))
+            except Exception as e:
+                if topic not in self._failing:
+                    self._failing.add(topic)
+                    log.warning("Event source %s failed: %s", topic, e)
+                continue
+            self._failing.discard(topic)
+            self._hub.publish(topic, value)
+
+    def poke(self):
+        """Sample now instead of at the next interval."""
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping.is_set():
+            self.sample()
+            self._wake.wait(self.INTERVAL)
+            self._wake.clear()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout=2)
+
+
+def load_tip(path=None):
+    """The tip saved in path (default TIP_PATH), or None."""
+    try:
+        with open(path or TIP_PATH) as f:
+            tip = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("Could not read %s: %s", path or TIP_PATH, e)
+        return None
+    return tip if isinstance(tip, dict) and "tip" in tip else None
+
+
+def save_tip(tip, path=None):
+    """Keep tip in path (default TIP_PATH), replacing it atomically."""
+    path = path or TIP_PATH
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(tip, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        log.warning("Could not save tip to %s: %s", path, e)
+
+
+def start(api_router, challenge_index):
+    """Sample the kiosk state from the routes on api_router.
+
+    challenge_index returns the current challenge. The watcher thread
+    starts on the first request to these routes, when theblackbox.py has
+    registered all of its own routes.
+    """
+    global _sources
+    _sources = {
+        "banner": route_source(api_router, "/banner"),
+        "challenge": lambda: {"index": challenge_index()},
+    }
+    tip = load_tip()
+    if tip is not None:
+        hub.publish("tip", tip)
+
+
+async def ensure_started():
+    global watcher
+    hub.attach(asyncio.get_running_loop())
+    with _start_lock:
+        if watcher is not None or _sources is None:
+            return
+        watcher = StateWatcher(hub, _sources)
+        watcher.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    global watcher
+    with _start_lock:
+        if watcher is None:
+            return
+        watcher.stop()
+        watcher = None
+
+
+def poke():
+    """Publish state changes right away, e.g. after a login or logout."""
+    if watcher is not None:
+        watcher.poke()
+
+
+def poking(handler):
+    """Wrap a route handler so the state it changes is published at once."""
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def handle(*args, **kwargs):
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                poke()
+    else:
+        @functools.wraps(handler)
+        def handle(*args, **kwargs):
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                poke()
+    return handle
+
+
+router = APIRouter(dependencies=[Depends(ensure_started)])
+
+
+class TipRequest(BaseModel):
+    message: str = ""
+    clear: bool = False
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@router.get("/events")
+async def events(request: Request):
+    last_id = request.headers.get("last-event-id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+
+    subscriber, backlog = hub.subscribe(last_id)
+
+    async def stream():
+        try:
+            yield "retry: 1000\n\n"
+            sent = last_id or 0
+            for event in backlog:
+                sent = event["id"]
+                yield format_event(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is RESYNC:
+                    event = hub.snapshot()
+                elif event["id"] <= sent:
+                    # Already part of the backlog or a snapshot
+                    continue
+                sent = event["id"]
+                yield format_event(event)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/events/state")
+async def events_state():
+    state = hub.snapshot()["data"]
+    state["subscribers"] = hub.count()
+    return state
+
+
+@router.get("/tip")
+async def tip_get():
+    return hub.snapshot()["data"].get("tip") or {"tip": None, "timestamp": 0}
+
+
+@router.post("/tip")
+def tip_post(request: TipRequest):
+    if request.clear:
+        tip = {"tip": None, "timestamp": time.time()}
+    else:
+        message = request.message.strip()
+        if not message:
+            return {"success": False, "error": "Empty message"}
+        tip = {"tip": message, "timestamp": time.time()}
+    save_tip(tip)
+    hub.publish("tip", tip, changes_only=False)
+    return {"success": True}
+
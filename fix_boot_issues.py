@@ -1,15 +1,18 @@
 #!/usr/bin/env python3
 """
-Fix two boot issues on The BlackBox:
-1. Firefox 'already running' error - add lock file cleanup to start.sh
-2. blackbox-audio service not starting - add audio start to start.sh as workaround
+Fix a boot issue on The BlackBox:
+Firefox 'already running' error - add lock file cleanup to start.sh
+
+The blackbox-audio workaround this script used to apply (starting the
+Icecast feed from start.sh, re-enabling its service) is gone: live
+audio is served by theblackbox.py itself (audio_capture.py, see
+add_audio_capture.py), and the feed would hold the microphone.
 """
 
-import subprocess
 import sys
 
 def fix_start_sh():
-    """Add Firefox lock cleanup and audio stream start to start.sh"""
+    """Add Firefox lock cleanup to start.sh"""
     filepath = '/opt/theblackbox/start.sh'
 
     try:
@@ -69,36 +72,6 @@ rm -f /home/pi/.mozilla/firefox/*/.parentlock
     else:
         print(">> Lock file cleanup already present in start.sh")
 
-    # 2. Add audio stream start at the end of the script
-    audio_start = """
-# Start audio stream after everything is up
-(sleep 20 && sudo systemctl start blackbox-audio) &
-"""
-
-    if 'blackbox-audio' not in content:
-        # Add before the final 'wait' command if it exists, or at the end
-        if '\nwait' in content or content.strip().endswith('wait'):
-            content = content.rstrip()
-            # Find the last 'wait' and add before it
-            lines = content.split('\n')
-            new_lines = []
-            added_audio = False
-            # Go through lines in reverse to find last 'wait'
-            for i in range(len(lines) - 1, -1, -1):
-                if lines[i].strip() == 'wait' and not added_audio:
-                    # Insert audio start before this wait
-                    lines.insert(i, audio_start.strip())
-                    lines.insert(i, '')
-                    added_audio = True
-                    break
-            content = '\n'.join(lines) + '\n'
-        else:
-            content = content.rstrip() + '\n' + audio_start
-        modified = True
-        print(">> Added blackbox-audio start to start.sh")
-    else:
-        print(">> blackbox-audio start already present in start.sh")
-
     if modified:
         with open(filepath, 'w') as f:
             f.write(content)
@@ -114,71 +87,17 @@ rm -f /home/pi/.mozilla/firefox/*/.parentlock
     return True
 
 
-def fix_audio_service():
-    """
-    Fix the blackbox-audio systemd service to be more robust.
-    Change After= to use multi-user.target instead of theblackbox.service
-    """
-    filepath = '/etc/systemd/system/blackbox-audio.service'
-
-    new_service = """[Unit]
-Description=BlackBox Audio Stream
-After=network.target sound.target
-Wants=icecast2.service
-
-[Service]
-Type=simple
-User=pi
-ExecStartPre=/bin/sleep 20
-ExecStart=/opt/theblackbox/audio-stream.sh
-Restart=always
-RestartSec=10
-
-[Install]
-WantedBy=multi-user.target
-"""
-
-    try:
-        with open(filepath, 'r') as f:
-            old_content = f.read()
-        print(f"Old service file:")
-        print(old_content)
-    except:
-        print(f"Creating new service file")
-
-    with open(filepath, 'w') as f:
-        f.write(new_service)
-
-    print(f"New service file written:")
-    print(new_service)
-
-    # Reload systemd
-    subprocess.run(['systemctl', 'daemon-reload'], check=True)
-    print("systemd daemon reloaded")
-
-    # Re-enable the service
-    subprocess.run(['systemctl', 'enable', 'blackbox-audio'], check=True)
-    print("blackbox-audio service re-enabled")
-
-    return True
-
-
 if __name__ == '__main__':
     print("=" * 60)
     print("Fixing BlackBox boot issues")
     print("=" * 60)
     print()
 
-    print("Step 1: Fixing start.sh (Firefox locks + audio start)")
+    print("Fixing start.sh (Firefox locks)")
     print("-" * 60)
     fix_start_sh()
     print()
 
-    print("Step 2: Fixing blackbox-audio service file")
-    print("-" * 60)
-    fix_audio_service()
-    print()
-
     print("=" * 60)
     print("All fixes applied!")
     print("Please reboot to test: sudo reboot")
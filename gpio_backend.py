@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Hardware backends for the BlackBox GPIO service.
+
+A backend is the only thing that talks to real pins. gpio_service.py
+drives it from its hardware worker thread, so backends do not need to be
+thread safe. The one exception is input(), which the input sampler
+thread may call; it must be a plain, non-blocking level read.
+
+Backends that can report input changes by interrupt set
+supports_edge_callbacks and call the watch_edges() callback with
+(pin, level) from their own thread.
+
+Backends with their own PWM generator set supports_pwm. Otherwise the
+service runs PWM on its own timing thread, which calls output() for the
+pins it owns.
+
+Backends:
+  rpi  - RPi.GPIO on the Raspberry Pi (default)
+  sim  - In-memory pins with optional artificial call latency, for
+         development and benchmarking on a plain Linux machine
+
+Select with the GPIO_BACKEND environment variable. GPIO_SIM_LATENCY_MS
+sets the simulated per-call latency, GPIO_SIM_EDGES=0 makes the
+simulated backend rely on the input sampler instead of callbacks.
+"""
+
+import os
+import time
+
+
+class GpioBackend:
+    """Interface every backend implements. Levels are 0 or 1."""
+
+    name = "base"
+    supports_edge_callbacks = False
+    supports_pwm = False
+
+    def setup_output(self, pin):
+        raise NotImplementedError
+
+    def output(self, pin, level):
+        raise NotImplementedError
+
+    def setup_input(self, pin, pull):
+        """pull is "up", "down" or "off"."""
+        raise NotImplementedError
+
+    def input(self, pin):
+        raise NotImplementedError
+
+    def watch_edges(self, pin, callback):
+        raise NotImplementedError
+
+    def unwatch_edges(self, pin):
+        pass
+
+    def start_pwm(self, pin, freq, duty):
+        """duty is 0-100 percent."""
+        raise NotImplementedError
+
+    def set_pwm(self, pin, freq, duty):
+        raise NotImplementedError
+
+    def stop_pwm(self, pin):
+        raise NotImplementedError
+
+    def cleanup(self):
+        raise NotImplementedError
+
+
+class RpiGpioBackend(GpioBackend):
+    """Real pins through RPi.GPIO (BCM numbering)."""
+
+    name = "rpi"
+    supports_edge_callbacks = True
+    supports_pwm = True
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self._gpio = GPIO
+        self._pulls = {
+            "up": GPIO.PUD_UP,
+            "down": GPIO.PUD_DOWN,
+            "off": GPIO.PUD_OFF,
+        }
+        self._watched = set()
+        self._pwm = {}
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+
+    def setup_output(self, pin):
+        self.unwatch_edges(pin)
+        self._gpio.setup(pin, self._gpio.OUT)
+
+    def output(self, pin, level):
+        self._gpio.output(pin, self._gpio.HIGH if level else self._gpio.LOW)
+
+    def setup_input(self, pin, pull):
+        self.unwatch_edges(pin)
+        self._gpio.setup(pin, self._gpio.IN, pull_up_down=self._pulls[pull])
+
+    def input(self, pin):
+        return 1 if self._gpio.input(pin) else 0
+
+    def watch_edges(self, pin, callback):
+        # Debouncing is done by the service, so no bouncetime here
+        self._gpio.add_event_detect(
+            pin, self._gpio.BOTH,
+            callback=lambda channel: callback(channel, self.input(channel)))
+        self._watched.add(pin)
+
+    def unwatch_edges(self, pin):
+        if pin in self._watched:
+            self._gpio.remove_event_detect(pin)
+            self._watched.discard(pin)
+
+    def start_pwm(self, pin, freq, duty):
+        # RPi.GPIO generates PWM on its own C thread
+        self.setup_output(pin)
+        pwm = self._gpio.PWM(pin, freq)
+        pwm.start(duty)
+        self._pwm[pin] = [pwm, freq]
+
+    def set_pwm(self, pin, freq, duty):
+        entry = self._pwm[pin]
+        if entry[1] != freq:
+            entry[0].ChangeFrequency(freq)
+            entry[1] = freq
+        entry[0].ChangeDutyCycle(duty)
+
+    def stop_pwm(self, pin):
+        entry = self._pwm.pop(pin, None)
+        if entry is not None:
+            entry[0].stop()
+
+    def cleanup(self):
+        for pin in list(self._pwm):
+            self.stop_pwm(pin)
+        self._gpio.cleanup()
+
+
+class SimulatedBackend(GpioBackend):
+    """
+    In-memory pins. Every call sleeps for `latency` seconds.
+
+    Input pins are driven from outside with set_input(), which fires the
+    edge callback like an interrupt would (or leaves the change to the
+    sampler when edge_callbacks is False).
+    """
+
+    name = "sim"
+
+    def __init__(self, latency=0.0, edge_callbacks=True):
+        self.latency = latency
+        self.supports_edge_callbacks = edge_callbacks
+        self.levels = {}
+        self.modes = {}
+        self.callbacks = {}
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def setup_output(self, pin):
+        self._call()
+        self.callbacks.pop(pin, None)
+        self.modes[pin] = "out"
+        self.levels.setdefault(pin, 0)
+
+    def output(self, pin, level):
+        self._call()
+        if self.modes.get(pin) != "out":
+            raise RuntimeError(f"GPIO {pin} is not set up as an output")
+        self.levels[pin] = 1 if level else 0
+
+    def setup_input(self, pin, pull):
+        self._call()
+        self.callbacks.pop(pin, None)
+        self.modes[pin] = "in"
+        self.levels[pin] = 1 if pull == "up" else 0
+
+    def input(self, pin):
+        return self.levels.get(pin, 0)
+
+    def watch_edges(self, pin, callback):
+        self.callbacks[pin] = callback
+
+    def unwatch_edges(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def set_input(self, pin, level):
+        """Simulate the outside world changing an input pin."""
+        level = 1 if level else 0
+        if self.modes.get(pin) != "in" or self.levels.get(pin) == level:
+            return
+        self.levels[pin] = level
+        callback = self.callbacks.get(pin)
+        if callback is not None:
+            callback(pin, level)
+
+    def cleanup(self):
+        self._call()
+        self.levels.clear()
+        self.modes.clear()
+        self.callbacks.clear()
+
+
+BACKENDS = {
+    RpiGpioBackend.name: RpiGpioBackend,
+    SimulatedBackend.name: SimulatedBackend,
+}
+
+
+def create_backend(name=None):
+    """Create the backend named by `name` or $GPIO_BACKEND (default rpi)."""
+    name = name or os.environ.get("GPIO_BACKEND", RpiGpioBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown GPIO backend: {name}")
+    if name == SimulatedBackend.name:
+        latency_ms = float(os.environ.get("GPIO_SIM_LATENCY_MS", "0"))
+        edges = os.environ.get("GPIO_SIM_EDGES", "1") != "0"
+        return SimulatedBackend(latency=latency_ms / 1000.0, edge_callbacks=edges)
+    return BACKENDS[name]()
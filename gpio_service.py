@@ -1,58 +1,1066 @@
 #!/usr/bin/env python3
 """
 Simple GPIO control service for The BlackBox challenges.
-Runs alongside theblackbox.py on a different port (5001).
+
+The routes live on an APIRouter that theblackbox.py mounts in-process
+(see add_gpio_router.py), so pages reach them on port 5000 next to the
+rest of the BlackBox API. Running this file directly still starts a
+standalone server on port 5001.
+
+Hardware threads start on the first GPIO request, so importing the
+module is cheap and a missing GPIO library only fails the GPIO routes.
 
 Provides:
-  GET /gpio/set?pin=17&state=1   - Set GPIO pin HIGH
-  GET /gpio/set?pin=17&state=0   - Set GPIO pin LOW
+  GET    /gpio/set?pin=17&state=1   - Set GPIO pin HIGH
+  GET    /gpio/set?pin=17&state=0   - Set GPIO pin LOW
+  POST   /gpio/batch                - Set several pins in one go
+  POST   /gpio/sequence             - Run a timed pin/state/delay timeline
+  GET    /gpio/sequence             - List known sequences
+  GET    /gpio/sequence/{id}        - Query a sequence
+  DELETE /gpio/sequence/{id}        - Cancel a running sequence
+
+Sequence example (flicker the mansion lights on):
+  {"steps": [{"pin": 17, "state": 1},
+             {"pin": 17, "state": 0, "delay_ms": 80},
+             {"pin": 17, "state": 1, "delay_ms": 120}],
+   "repeat": 1}
+
+Each step's delay_ms is measured from the previous step. Steps are
+scheduled against absolute deadlines on the service's event loop, so
+timing does not drift over long timelines.
+
+Hardware access happens on a single worker thread that owns the backend
+(see gpio_backend.py). Request handlers only queue commands and await
+the result, so a slow GPIO call never stalls the event loop. The
+exceptions are the input sampler thread, which reads input() levels, and
+the PWM thread, which calls output() on the pins it drives.
+
+  GET    /gpio/worker               - Worker queue depth and timings
+  GET    /gpio/state                - Mode and level of every used pin
+  GET    /gpio/state/{pin}          - Mode and level of one pin
 
-Requires: pip3 install RPi.GPIO
+  GET    /gpio/input?pin=27&pull=up&debounce_ms=10
+                                    - Configure a pin as a watched input
+  DELETE /gpio/input/{pin}          - Stop watching an input pin
+  GET    /gpio/events[?pins=27,22]  - Server-Sent Events stream of input edges
+  GET    /gpio/pwm?pin=17&duty=40&freq=100[&engine=auto|backend|thread]
+                                    - Dim a pin with PWM (duty 0-100 %)
+  GET    /gpio/fade?pin=17&to=100&ms=1500[&freq=100]
+                                    - Fade a pin's duty cycle server side
+  GET    /gpio/pwm/status           - PWM channels with measured jitter
+
+Pin state is kept in an in-process table that the worker updates after
+each hardware write. State queries are answered from that table without
+touching hardware, and writes of a level a pin already has are skipped.
+
+Input edges come from the backend's interrupt callbacks, or from a 1 ms
+sampler thread when the backend has none. Debouncing is leading-edge: an
+edge is reported as soon as it is seen, further changes within
+debounce_ms are held back and reconciled when the window closes.
+Page example:
+  new EventSource(gpioBase + "gpio/events").addEventListener("edge",
+      function(e) { var edge = JSON.parse(e.data); ... });
+
+PWM runs on the backend's own generator when it has one, otherwise on a
+dedicated timing thread that sleeps until just before each edge and then
+spins to it. The thread engine measures every edge against its deadline
+and reports the timing jitter and duty-cycle error per channel. Fades
+are interpolated on the same thread, once per PWM period. /gpio/set on a
+PWM pin stops PWM and drives the pin hard.
+
+The thread engine is limited to PwmEngine.MAX_THREAD_FREQ, since it
+holds the GIL while it spins and shortens the interpreter's switch
+interval while any of its channels run. Only the standalone service
+gives it real-time priority.
+
+Requires: pip3 install RPi.GPIO  (or run with GPIO_BACKEND=sim)
 """
 
-import RPi.GPIO as GPIO
-from fastapi import FastAPI
+import asyncio
+import atexit
+import collections
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import List
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 import uvicorn
 
-app = FastAPI()
+from gpio_backend import create_backend
 
-# Allow CORS from localhost
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Real-time priority for the PWM thread; only the standalone service asks
+# for it, never the theblackbox.py process that serves everything else
+realtime_pwm = False
 
-# Track initialized pins
-initialized_pins = set()
+# Hardware threads, created by start()
+backend = None
+hardware = None
+edges = None
+inputs = None
+pwm = None
+_start_lock = threading.Lock()
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)
 
-@app.get("/gpio/set")
-async def gpio_set(pin: int = 0, state: int = 0):
-    if pin < 1 or pin > 27:
-        return {"error": "Invalid pin number"}
+class PinState:
+    """Last known mode/level of one pin, as written by the worker."""
+
+    __slots__ = ("pin", "mode", "level", "duty", "changed", "changes", "writes",
+                 "skipped")
+
+    def __init__(self, pin, mode):
+        self.pin = pin
+        self.mode = mode
+        self.level = None
+        self.duty = None           # PWM target duty, pwm mode only
+        self.changed = None        # time.time() of the last level change
+        self.changes = 0
+        self.writes = 0
+        self.skipped = 0           # redundant writes that never reached hardware
+
+    def as_dict(self):
+        return {
+            "pin": self.pin,
+            "mode": self.mode,
+            "level": self.level,
+            "duty": self.duty,
+            "last_changed": self.changed,
+            "changes": self.changes,
+            "writes": self.writes,
+            "skipped": self.skipped,
+        }
+
+
+class PinTable:
+    """Authoritative pin state. Written by the worker, read by handlers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pins = {}
+
+    def get(self, pin):
+        with self._lock:
+            state = self._pins.get(pin)
+            return state.as_dict() if state is not None else None
+
+    def snapshot(self):
+        with self._lock:
+            return {pin: self._pins[pin].as_dict() for pin in sorted(self._pins)}
+
+    def mode(self, pin):
+        with self._lock:
+            state = self._pins.get(pin)
+            return state.mode if state is not None else None
+
+    def is_level(self, pin, level):
+        with self._lock:
+            state = self._pins.get(pin)
+            return state is not None and state.level == level
+
+    def set_mode(self, pin, mode):
+        with self._lock:
+            if pin not in self._pins:
+                self._pins[pin] = PinState(pin, mode)
+            else:
+                self._pins[pin].mode = mode
+                self._pins[pin].level = None
+                self._pins[pin].duty = None
+
+    def set_duty(self, pin, duty):
+        with self._lock:
+            state = self._pins[pin]
+            state.writes += 1
+            if state.duty != duty:
+                state.duty = duty
+                state.changed = time.time()
+                state.changes += 1
+
+    def set_level(self, pin, level, skipped=False):
+        with self._lock:
+            state = self._pins[pin]
+            state.writes += 1
+            if skipped:
+                state.skipped += 1
+            elif state.level != level:
+                state.level = level
+                state.changed = time.time()
+                state.changes += 1
+
+    def set_input(self, pin, level):
+        with self._lock:
+            state = self._pins.get(pin)
+            if state is not None and state.level != level:
+                state.level = level
+                state.changed = time.time()
+                state.changes += 1
+
+    def remove(self, pin):
+        with self._lock:
+            self._pins.pop(pin, None)
+
+    def clear(self):
+        with self._lock:
+            self._pins.clear()
+
+
+pin_table = PinTable()
+
+
+class EdgeBroadcaster:
+    """Fans input edges out to event stream subscribers on the event loop."""
+
+    HISTORY = 100              # edges kept for Last-Event-ID resume
+    QUEUE_SIZE = 100           # per subscriber; oldest edges dropped when full
+
+    def __init__(self):
+        self.loop = None
+        self._ids = itertools.count(1)
+        self._history = collections.deque(maxlen=self.HISTORY)
+        self._subscribers = set()
+
+    def attach(self, loop):
+        self.loop = loop
+
+    def publish(self, pin, level):
+        """Called from the input monitor thread."""
+        if self.loop is not None:
+            event = {
+                "pin": pin,
+                "edge": "rising" if level else "falling",
+                "level": level,
+                "time": time.time(),
+            }
+            self.loop.call_soon_threadsafe(self._fanout, event)
+
+    def _fanout(self, event):
+        event["id"] = next(self._ids)
+        self._history.append(event)
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()
+            subscriber.put_nowait(event)
+
+    def subscribe(self, last_id=None):
+        subscriber = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        if last_id is not None:
+            for event in self._history:
+                if event["id"] > last_id and not subscriber.full():
+                    subscriber.put_nowait(event)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def count(self):
+        return len(self._subscribers)
+
+
+class InputMonitor(threading.Thread):
+    """Debounces input pins fed by edge callbacks or by sampling."""
+
+    SAMPLE_INTERVAL = 0.001
+
+    def __init__(self, backend, publish):
+        super().__init__(name="gpio-inputs", daemon=True)
+        self.backend = backend
+        self.sampling = not backend.supports_edge_callbacks
+        self._publish = publish
+        self._cond = threading.Condition()
+        self._pins = {}
+        self._running = True
+
+    def add(self, pin, debounce, level):
+        """Start watching pin. Runs on the hardware worker thread."""
+        with self._cond:
+            self._pins[pin] = {
+                "debounce": debounce,
+                "stable": level,
+                "raw": level,
+                "lock_until": 0.0,
+            }
+            self._cond.notify()
+        if not self.sampling:
+            self.backend.watch_edges(pin, self.raw)
+
+    def remove(self, pin):
+        with self._cond:
+            watched = self._pins.pop(pin, None) is not None
+        if watched and not self.sampling:
+            self.backend.unwatch_edges(pin)
+
+    def clear(self):
+        with self._cond:
+            self._pins.clear()
+
+    def raw(self, pin, level):
+        """Edge callback from the backend's thread."""
+        with self._cond:
+            state = self._pins.get(pin)
+            if state is not None:
+                self._observe(pin, state, level, time.monotonic())
+                self._cond.notify()
+
+    def _observe(self, pin, state, level, now):
+        state["raw"] = level
+        if level != state["stable"] and now >= state["lock_until"]:
+            self._accept(pin, state, level, now)
+
+    def _accept(self, pin, state, level, now):
+        state["stable"] = level
+        state["lock_until"] = now + state["debounce"]
+        pin_table.set_input(pin, level)
+        self._publish(pin, level)
+
+    def run(self):
+        while self._running:
+            with self._cond:
+                now = time.monotonic()
+                if self.sampling:
+                    for pin, state in self._pins.items():
+                        self._observe(pin, state, self.backend.input(pin), now)
+
+                # Reconcile pins whose debounce window has closed
+                timeout = None
+                for pin, state in self._pins.items():
+                    if state["raw"] == state["stable"]:
+                        continue
+                    if now >= state["lock_until"]:
+                        self._accept(pin, state, state["raw"], now)
+                    else:
+                        wait = state["lock_until"] - now
+                        timeout = wait if timeout is None else min(timeout, wait)
+
+                if self.sampling and self._pins:
+                    timeout = self.SAMPLE_INTERVAL
+                self._cond.wait(timeout)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self.join(timeout=2)
+
+
+class PwmEngine(threading.Thread):
+    """Soft PWM timing thread, also drives fades for backend PWM channels."""
+
+    SPIN = 0.0003              # busy-wait the last 300 us before an edge
+    FADE_STEP = 0.01           # duty update rate for backend PWM fades
+    SAMPLES = 1000             # edges kept for jitter statistics
+    SWITCH_INTERVAL = 0.0005   # interpreter thread switch interval while soft PWM runs
+    MAX_THREAD_FREQ = 200      # thread engine limit; every edge spins with the GIL held
+
+    def __init__(self, backend, realtime=False):
+        super().__init__(name="gpio-pwm", daemon=True)
+        self.backend = backend
+        self.realtime = realtime   # ask for SCHED_FIFO (standalone service only)
+        self._cond = threading.Condition()
+        self._channels = {}
+        self._running = True
+        self._saved_switch_interval = None
+
+    # ---- Called on the hardware worker thread ----
+    def set(self, pin, duty, freq, engine, fade_ms=0):
+        now = time.perf_counter()
+        with self._cond:
+            channel = self._channels.get(pin)
+            if channel is not None and channel["engine"] != engine:
+                self._release(channel)
+                channel = None
+
+            if channel is None:
+                channel = {
+                    "pin": pin,
+                    "engine": engine,
+                    "freq": freq,
+                    "duty": 0.0 if fade_ms else duty,
+                    "fade": None,
+                    "phase": "rise",
+                    "level": None,
+                    "next": now,
+                    "rise_at": None,
+                    "period_start": now,
+                    "errors": collections.deque(maxlen=self.SAMPLES),
+                    "duty_errors": collections.deque(maxlen=self.SAMPLES),
+                }
+                if engine == "backend":
+                    self.backend.start_pwm(pin, freq, channel["duty"])
+                    channel["next"] = float("inf")
+                else:
+                    self.backend.setup_output(pin)
+                    if self._saved_switch_interval is None:
+                        # Let this thread win the GIL back quickly after each
+                        # sleep, until the last soft PWM channel stops
+                        self._saved_switch_interval = sys.getswitchinterval()
+                        sys.setswitchinterval(min(self._saved_switch_interval,
+                                                  self.SWITCH_INTERVAL))
+                self._channels[pin] = channel
+            elif engine == "backend" and channel["freq"] != freq:
+                self.backend.set_pwm(pin, freq, channel["duty"])
+
+            channel["freq"] = freq
+            if channel["next"] == float("inf") and (engine == "thread" or fade_ms):
+                # Idle channel (static level or finished backend fade): wake it.
+                # A backend channel without a fade has nothing to time.
+                channel["next"] = now
+                channel["phase"] = "rise"
+            if fade_ms:
+                channel["fade"] = (channel["duty"], duty, now, now + fade_ms / 1000.0)
+            else:
+                channel["fade"] = None
+                channel["duty"] = duty
+                if engine == "backend":
+                    self.backend.set_pwm(pin, freq, duty)
+            self._cond.notify()
+
+    def stop(self, pin):
+        with self._cond:
+            channel = self._channels.pop(pin, None)
+            if channel is not None:
+                self._release(channel)
+
+    def clear(self):
+        with self._cond:
+            for channel in list(self._channels.values()):
+                self._release(channel)
+
+    def _release(self, channel):
+        if channel["engine"] == "backend":
+            self.backend.stop_pwm(channel["pin"])
+        self._channels.pop(channel["pin"], None)
+        if (self._saved_switch_interval is not None
+                and all(ch["engine"] != "thread" for ch in self._channels.values())):
+            sys.setswitchinterval(self._saved_switch_interval)
+            self._saved_switch_interval = None
+
+    # ---- Status, safe from any thread ----
+    def status(self):
+        with self._cond:
+            return {pin: self._channel_info(ch) for pin, ch in sorted(self._channels.items())}
+
+    @staticmethod
+    def _channel_info(channel):
+        info = {
+            "pin": channel["pin"],
+            "engine": channel["engine"],
+            "freq": channel["freq"],
+            "duty": round(channel["duty"], 2),
+            "fading": channel["fade"] is not None,
+            "jitter_us": None,
+            "duty_error_pct": None,
+        }
+        errors = sorted(abs(e) * 1e6 for e in channel["errors"])
+        if errors:
+            info["jitter_us"] = {
+                "mean": round(sum(errors) / len(errors), 1),
+                "p99": round(errors[int(0.99 * (len(errors) - 1))], 1),
+                "max": round(errors[-1], 1),
+                "samples": len(errors),
+            }
+        duty_errors = [abs(e) for e in channel["duty_errors"]]
+        if duty_errors:
+            info["duty_error_pct"] = {
+                "mean": round(sum(duty_errors) / len(duty_errors), 3),
+                "max": round(max(duty_errors), 3),
+            }
+        return info
+
+    # ---- Timing loop ----
+    def run(self):
+        if self.realtime:
+            try:
+                # Best effort: real-time priority keeps edges off the GIL scheduler's mercy
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+            except (AttributeError, OSError):
+                pass
+
+        while self._running:
+            with self._cond:
+                if not self._channels:
+                    self._cond.wait()
+                    continue
+                channel = min(self._channels.values(), key=lambda ch: ch["next"])
+                deadline = channel["next"]
+                delay = deadline - time.perf_counter() - self.SPIN
+                if delay > 0:
+                    self._cond.wait(None if deadline == float("inf") else delay)
+                    continue
+
+            while time.perf_counter() < deadline:
+                pass
+
+            with self._cond:
+                if self._channels.get(channel["pin"]) is channel and channel["next"] == deadline:
+                    self._edge(channel, time.perf_counter())
+
+    def _update_fade(self, channel, now):
+        start, target, t0, t1 = channel["fade"]
+        if now >= t1:
+            channel["duty"] = target
+            channel["fade"] = None
+        else:
+            channel["duty"] = start + (target - start) * (now - t0) / (t1 - t0)
+
+    def _edge(self, channel, now):
+        pin = channel["pin"]
+
+        if channel["engine"] == "backend":
+            if channel["fade"]:
+                self._update_fade(channel, now)
+            self.backend.set_pwm(pin, channel["freq"], channel["duty"])
+            channel["next"] = now + self.FADE_STEP if channel["fade"] else float("inf")
+            return
+
+        period = 1.0 / channel["freq"]
+        if channel["phase"] == "fall" or channel["level"] is not None:
+            channel["errors"].append(now - channel["next"])
+
+        if channel["phase"] == "fall":
+            self.backend.output(pin, 0)
+            channel["level"] = 0
+            if channel["rise_at"] is not None:
+                measured = (now - channel["rise_at"]) / period * 100.0
+                channel["duty_errors"].append(measured - channel["period_duty"])
+            channel["phase"] = "rise"
+            channel["next"] = channel["period_start"] + period
+        else:
+            if channel["fade"]:
+                self._update_fade(channel, now)
+            duty = channel["duty"]
+            channel["period_start"] = channel["next"]
+            if duty <= 0 or duty >= 100:
+                level = 1 if duty >= 100 else 0
+                if channel["level"] != level:
+                    self.backend.output(pin, level)
+                    channel["level"] = level
+                channel["rise_at"] = None
+                # Nothing to time until the duty changes again
+                channel["next"] = channel["next"] + period if channel["fade"] else float("inf")
+            else:
+                self.backend.output(pin, 1)
+                channel["level"] = 1
+                channel["rise_at"] = now
+                channel["period_duty"] = duty
+                channel["phase"] = "fall"
+                channel["next"] += period * duty / 100.0
+
+        # After a long stall, resynchronise instead of bursting to catch up
+        if channel["next"] < now - period:
+            channel["next"] = now
+            channel["phase"] = "rise"
+
+    def stop_thread(self):
+        """Stop the timing thread and every channel."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self.join(timeout=2)
+        # Also gives the switch interval back
+        self.clear()
+
+
+# Sequence bookkeeping
+SEQUENCE_HISTORY = 32          # finished sequences kept for querying
+sequences = {}
+sequence_ids = itertools.count(1)
+
+
+class HardwareWorker(threading.Thread):
+    """Single thread that owns the GPIO backend and runs queued commands."""
+
+    def __init__(self, backend):
+        super().__init__(name="gpio-hardware", daemon=True)
+        self.backend = backend
+        self._queue = queue.Queue()
+        self.commands = 0
+        self.busy_time = 0.0
+        self.max_wait = 0.0
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            func, args, loop, future, queued = item
+            started = time.perf_counter()
+            self.max_wait = max(self.max_wait, started - queued)
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+            self.busy_time += time.perf_counter() - started
+            self.commands += 1
+            loop.call_soon_threadsafe(self._resolve, future, result, error)
+
+    @staticmethod
+    def _resolve(future, result, error):
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def call(self, func, *args):
+        """Run func(*args) on the worker thread and await its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((func, args, loop, future, time.perf_counter()))
+        return await future
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stop(self):
+        self._queue.put(None)
+        self.join(timeout=2)
+
+
+def start():
+    """Create the backend and start the hardware threads (once)."""
+    global backend, hardware, edges, inputs, pwm
+    with _start_lock:
+        if hardware is not None:
+            return
+        backend = create_backend()
+        edges = EdgeBroadcaster()
+        inputs = InputMonitor(backend, edges.publish)
+        inputs.start()
+        pwm = PwmEngine(backend, realtime=realtime_pwm)
+        pwm.start()
+        hardware = HardwareWorker(backend)
+        hardware.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Stop the hardware threads and release the pins."""
+    global hardware
+    with _start_lock:
+        if hardware is None:
+            return
+        hardware.stop()
+        pwm.stop_thread()
+        inputs.stop()
+        backend.cleanup()
+        pin_table.clear()
+        hardware = None
+
+
+async def ensure_started():
+    if hardware is None:
+        try:
+            start()
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"GPIO unavailable: {e}")
+    edges.attach(asyncio.get_running_loop())
+
+
+router = APIRouter(dependencies=[Depends(ensure_started)])
+
+
+class PinStep(BaseModel):
+    pin: int
+    state: int
+    delay_ms: int = 0
+
+
+class BatchRequest(BaseModel):
+    pins: List[PinStep]
+
+
+class SequenceRequest(BaseModel):
+    steps: List[PinStep]
+    repeat: int = 1            # 0 = loop until cancelled
+    replace: bool = True       # cancel running sequences using the same pins
+
+
+def valid_pin(pin):
+    return 1 <= pin <= 27
+
+
+# ---- Hardware commands (run on the worker thread only) ----
+def write_pin(pin, state):
+    level = 1 if state > 0 else 0
 
     # Initialize pin if not already done
-    if pin not in initialized_pins:
-        GPIO.setup(pin, GPIO.OUT)
-        initialized_pins.add(pin)
+    if pin_table.mode(pin) != "out":
+        inputs.remove(pin)
+        pwm.stop(pin)
+        backend.setup_output(pin)
+        pin_table.set_mode(pin, "out")
+    elif pin_table.is_level(pin, level):
+        pin_table.set_level(pin, level, skipped=True)
+        return False
 
     # Set pin state
-    GPIO.output(pin, GPIO.HIGH if state > 0 else GPIO.LOW)
-    return {"pin": pin, "state": state}
+    backend.output(pin, level)
+    pin_table.set_level(pin, level)
+    return True
+
+
+def write_pins(steps):
+    for step in steps:
+        write_pin(step.pin, step.state)
+
+
+def setup_input(pin, pull, debounce):
+    inputs.remove(pin)
+    pwm.stop(pin)
+    backend.setup_input(pin, pull)
+    level = backend.input(pin)
+    pin_table.set_mode(pin, "in")
+    pin_table.set_input(pin, level)
+    inputs.add(pin, debounce, level)
+    return level
+
+
+def release_input(pin):
+    inputs.remove(pin)
+    # Unconfigured again; the next write or PWM sets the pin up afresh
+    pin_table.remove(pin)
+
+
+def start_pwm(pin, duty, freq, engine, fade_ms=0):
+    mode = pin_table.mode(pin)
+    if mode != "pwm":
+        inputs.remove(pin)
+        if fade_ms:
+            # Fade from where the pin is now
+            pwm.set(pin, 100.0 if pin_table.is_level(pin, 1) else 0.0, freq, engine)
+        pin_table.set_mode(pin, "pwm")
+    pwm.set(pin, duty, freq, engine, fade_ms)
+    pin_table.set_duty(pin, duty)
+
+
+def cleanup_pins():
+    pwm.clear()
+    inputs.clear()
+    backend.cleanup()
+    pin_table.clear()
+
+
+def check_steps(steps):
+    """Return an error dict for the first invalid step, or None."""
+    for index, step in enumerate(steps):
+        if not valid_pin(step.pin):
+            return {"error": "Invalid pin number", "step": index}
+        if step.delay_ms < 0:
+            return {"error": "Invalid delay", "step": index}
+    return None
+
+
+def sequence_info(seq):
+    return {
+        "id": seq["id"],
+        "status": seq["status"],
+        "pins": sorted(seq["pins"]),
+        "steps": len(seq["steps"]),
+        "step": seq["step"],
+        "loop": seq["loop"],
+        "repeat": seq["repeat"],
+        "max_late_ms": round(seq["max_late"] * 1000, 3),
+    }
+
+
+def prune_sequences():
+    finished = [s for s in sequences.values() if s["status"] != "running"]
+    for seq in finished[:max(0, len(finished) - SEQUENCE_HISTORY)]:
+        del sequences[seq["id"]]
+
+
+async def run_sequence(seq):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
+    try:
+        while seq["repeat"] == 0 or seq["loop"] < seq["repeat"]:
+            for index, step in enumerate(seq["steps"]):
+                deadline += step.delay_ms / 1000.0
+                remaining = deadline - loop.time()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                seq["max_late"] = max(seq["max_late"], loop.time() - deadline)
+                await hardware.call(write_pin, step.pin, step.state)
+                seq["step"] = index + 1
+            seq["loop"] += 1
+        seq["status"] = "done"
+    except asyncio.CancelledError:
+        seq["status"] = "cancelled"
+        raise
+    except Exception as e:
+        seq["status"] = "error"
+        seq["error"] = str(e)
+    finally:
+        seq["finished"] = time.time()
+        prune_sequences()
+
+
+def sequence_done(seq):
+    """Done callback of a sequence task.
+
+    A task cancelled before it first ran never enters run_sequence(), so
+    its status is settled here.
+    """
+    if seq["status"] == "running":
+        seq["status"] = "cancelled"
+        seq["finished"] = time.time()
+        prune_sequences()
+
+
+@router.get("/gpio/set")
+async def gpio_set(pin: int = 0, state: int = 0):
+    if not valid_pin(pin):
+        return {"error": "Invalid pin number"}
+
+    changed = await hardware.call(write_pin, pin, state)
+    return {"pin": pin, "state": state, "changed": changed}
+
+
+@router.post("/gpio/batch")
+async def gpio_batch(request: BatchRequest):
+    error = check_steps(request.pins)
+    if error:
+        return error
+
+    # One worker command, so nothing else can touch the pins mid-batch
+    await hardware.call(write_pins, request.pins)
+    return {"pins": [{"pin": s.pin, "state": s.state} for s in request.pins]}
 
-@app.get("/gpio/cleanup")
+
+@router.post("/gpio/sequence")
+async def gpio_sequence(request: SequenceRequest):
+    if not request.steps:
+        return {"error": "No steps"}
+    if request.repeat < 0:
+        return {"error": "Invalid repeat"}
+    error = check_steps(request.steps)
+    if error:
+        return error
+    if request.repeat == 0 and not any(step.delay_ms for step in request.steps):
+        # An endless timeline without delays would never yield the event loop
+        return {"error": "Looping sequence needs a delay"}
+
+    pins = {step.pin for step in request.steps}
+    if request.replace:
+        for seq in sequences.values():
+            if seq["status"] == "running" and seq["pins"] & pins:
+                seq["task"].cancel()
+
+    seq = {
+        "id": next(sequence_ids),
+        "status": "running",
+        "pins": pins,
+        "steps": request.steps,
+        "step": 0,
+        "loop": 0,
+        "repeat": request.repeat,
+        "max_late": 0.0,
+        "started": time.time(),
+        "finished": None,
+    }
+    sequences[seq["id"]] = seq
+    seq["task"] = asyncio.create_task(run_sequence(seq))
+    seq["task"].add_done_callback(lambda task: sequence_done(seq))
+    return sequence_info(seq)
+
+
+@router.get("/gpio/sequence")
+async def gpio_sequence_list():
+    return {"sequences": [sequence_info(s) for s in sequences.values()]}
+
+
+@router.get("/gpio/sequence/{seq_id}")
+async def gpio_sequence_get(seq_id: int):
+    seq = sequences.get(seq_id)
+    if seq is None:
+        return {"error": "Unknown sequence"}
+    info = sequence_info(seq)
+    if "error" in seq:
+        info["error"] = seq["error"]
+    return info
+
+
+@router.delete("/gpio/sequence/{seq_id}")
+async def gpio_sequence_cancel(seq_id: int):
+    seq = sequences.get(seq_id)
+    if seq is None:
+        return {"error": "Unknown sequence"}
+    if seq["status"] == "running":
+        seq["task"].cancel()
+        try:
+            await seq["task"]
+        except asyncio.CancelledError:
+            pass
+    return sequence_info(seq)
+
+
+@router.get("/gpio/cleanup")
 async def gpio_cleanup():
-    GPIO.cleanup()
-    initialized_pins.clear()
+    for seq in sequences.values():
+        if seq["status"] == "running":
+            seq["task"].cancel()
+    await hardware.call(cleanup_pins)
     return {"status": "cleanup done"}
 
+
+@router.get("/gpio/state")
+async def gpio_state():
+    return {"pins": pin_table.snapshot()}
+
+
+@router.get("/gpio/state/{pin}")
+async def gpio_state_pin(pin: int):
+    if not valid_pin(pin):
+        return {"error": "Invalid pin number"}
+    state = pin_table.get(pin)
+    if state is None:
+        return {"pin": pin, "mode": None, "level": None}
+    return state
+
+
+@router.get("/gpio/input")
+async def gpio_input(pin: int = 0, pull: str = "up", debounce_ms: int = 10):
+    if not valid_pin(pin):
+        return {"error": "Invalid pin number"}
+    if pull not in ("up", "down", "off"):
+        return {"error": "Invalid pull"}
+    if debounce_ms < 0:
+        return {"error": "Invalid debounce"}
+
+    level = await hardware.call(setup_input, pin, pull, debounce_ms / 1000.0)
+    return {"pin": pin, "pull": pull, "debounce_ms": debounce_ms, "level": level,
+            "source": "sampler" if inputs.sampling else "interrupt"}
+
+
+@router.delete("/gpio/input/{pin}")
+async def gpio_input_release(pin: int):
+    if pin_table.mode(pin) != "in":
+        return {"error": "Pin is not an input"}
+    await hardware.call(release_input, pin)
+    return {"pin": pin, "status": "released"}
+
+
+@router.get("/gpio/events")
+async def gpio_events(request: Request, pins: str = ""):
+    try:
+        wanted = {int(p) for p in pins.split(",") if p.strip()}
+    except ValueError:
+        return {"error": "Invalid pin list"}
+    last_id = request.headers.get("last-event-id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+
+    subscriber = edges.subscribe(last_id)
+
+    async def stream():
+        try:
+            yield "retry: 1000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if wanted and event["pin"] not in wanted:
+                    continue
+                yield f"id: {event['id']}\nevent: edge\ndata: {json.dumps(event)}\n\n"
+        finally:
+            edges.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+def pwm_engine(engine):
+    if engine == "auto":
+        return "backend" if backend.supports_pwm else "thread"
+    if engine == "backend" and not backend.supports_pwm:
+        return None
+    return engine if engine in ("backend", "thread") else None
+
+
+@router.get("/gpio/pwm")
+async def gpio_pwm(pin: int = 0, duty: float = 0, freq: float = 100, engine: str = "auto"):
+    if not valid_pin(pin):
+        return {"error": "Invalid pin number"}
+    if not 0 <= duty <= 100:
+        return {"error": "Invalid duty"}
+    if not 1 <= freq <= 2000:
+        return {"error": "Invalid frequency"}
+    engine = pwm_engine(engine)
+    if engine is None:
+        return {"error": "Invalid engine"}
+    if engine == "thread" and freq > PwmEngine.MAX_THREAD_FREQ:
+        return {"error": "Invalid frequency for thread PWM"}
+
+    await hardware.call(start_pwm, pin, duty, freq, engine)
+    return {"pin": pin, "duty": duty, "freq": freq, "engine": engine}
+
+
+@router.get("/gpio/fade")
+async def gpio_fade(pin: int = 0, to: float = 0, ms: int = 1000, freq: float = 100,
+                    engine: str = "auto"):
+    if not valid_pin(pin):
+        return {"error": "Invalid pin number"}
+    if not 0 <= to <= 100:
+        return {"error": "Invalid duty"}
+    if ms < 1:
+        return {"error": "Invalid duration"}
+    if not 1 <= freq <= 2000:
+        return {"error": "Invalid frequency"}
+    engine = pwm_engine(engine)
+    if engine is None:
+        return {"error": "Invalid engine"}
+    if engine == "thread" and freq > PwmEngine.MAX_THREAD_FREQ:
+        return {"error": "Invalid frequency for thread PWM"}
+
+    await hardware.call(start_pwm, pin, to, freq, engine, ms)
+    return {"pin": pin, "to": to, "ms": ms, "freq": freq, "engine": engine}
+
+
+@router.get("/gpio/pwm/status")
+async def gpio_pwm_status():
+    return {"channels": pwm.status()}
+
+
+@router.get("/gpio/worker")
+async def gpio_worker():
+    return {
+        "backend": backend.name,
+        "queue_depth": hardware.depth(),
+        "commands": hardware.commands,
+        "busy_ms": round(hardware.busy_time * 1000, 3),
+        "max_wait_ms": round(hardware.max_wait * 1000, 3),
+        "input_source": "sampler" if inputs.sampling else "interrupt",
+        "event_subscribers": edges.count(),
+    }
+
+
+def create_app():
+    """Standalone app for running the service on its own port."""
+    app = FastAPI()
+
+    # Allow CORS from localhost
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+
 if __name__ == "__main__":
+    realtime_pwm = True
     try:
-        uvicorn.run(app, host="127.0.0.1", port=5001)
+        uvicorn.run(create_app(), host="127.0.0.1", port=5001)
     finally:
-        GPIO.cleanup()
+        shutdown()
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+In-memory highscore rank index for The BlackBox.
+
+Completed players are kept ordered by (elapsed_time, uid) in an
+indexable skip list, so the highscore queries no longer scan and
+serialize every completed player on each request:
+
+  index.rank(uid)                - 1-based rank, O(log n)
+  index.top(k)                   - best k players, O(log n + k)
+  index.page(offset, limit)      - any slice of the list, O(log n + limit)
+  index.window(uid, before, after)
+                                 - the players around uid, O(log n + size)
+
+Results are lists of the records /player/list already returns (uid,
+player_name, elapsed_time, elapsed_time_str, rank). Records are built
+once per player write, not per request. Equal times are ranked by uid,
+in the order they were played.
+
+theblackbox.py wraps its player store in IndexedStore (see
+add_highscore_index.py). The wrapper passes every call through and
+re-indexes the player written by a call of one of the store's write
+methods: a completed player is inserted or moved (a hint penalty
+changes the time), any other player is dropped from the index. After
+a method that is neither a known write nor a read, the index is
+reloaded from the store, so a write it doesn't know can't leave stale
+ranks behind. The index is loaded from the database on first use, so after a restart it
+matches the stored highscores again.
+
+player_list() answers /player/list?highscore=1 with limit, offset,
+around_uid, window, fields and compact parameters, or format=html for
+the pre-rendered highscore.html rows. Its payload is bounded by the
+page and window size, not by the number of players.
+"""
+
+import html
+import logging
+import random
+import threading
+
+from fastapi.responses import HTMLResponse
+
+log = logging.getLogger(__name__)
+
+MAX_LEVEL = 20                  # enough for ~1M players
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # Positions skipped by each link, so ranks can be summed on the way
+        self.width = [1] * level
+
+
+class RankList:
+    """Indexable skip list of unique, sortable keys.
+
+    insert, remove, rank (number of smaller keys) and select (key at a
+    position) are all O(log n) expected.
+    """
+
+    def __init__(self):
+        self._head = _Node(None, MAX_LEVEL)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _random_level():
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """Build the list from keys already in order, in O(n)."""
+        ranks = cls()
+        tails = [ranks._head] * MAX_LEVEL
+        tail_positions = [0] * MAX_LEVEL
+        position = 0
+        for position, key in enumerate(keys, 1):
+            node = _Node(key, cls._random_level())
+            for i in range(len(node.next)):
+                tails[i].next[i] = node
+                tails[i].width[i] = position - tail_positions[i]
+                tails[i] = node
+                tail_positions[i] = position
+        for i in range(MAX_LEVEL):
+            tails[i].width[i] = position + 1 - tail_positions[i]
+        ranks._size = position
+        return ranks
+
+    def _path(self, key):
+        """Last node before key on every level, and its position."""
+        chain = [None] * MAX_LEVEL
+        steps = [0] * MAX_LEVEL
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            nxt = node.next[level]
+            while nxt is not None and nxt.key < key:
+                steps[level] += node.width[level]
+                node = nxt
+                nxt = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        chain, steps = self._path(key)
+        level = self._random_level()
+        node = _Node(key, level)
+        skipped = 0
+        for i in range(level):
+            prev = chain[i]
+            node.next[i] = prev.next[i]
+            prev.next[i] = node
+            node.width[i] = prev.width[i] - skipped
+            prev.width[i] = skipped + 1
+            skipped += steps[i]
+        for i in range(level, MAX_LEVEL):
+            chain[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain, _ = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(len(node.next)):
+            prev = chain[i]
+            prev.width[i] += node.width[i] - 1
+            prev.next[i] = node.next[i]
+        for i in range(len(node.next), MAX_LEVEL):
+            chain[i].width[i] -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        """Number of keys smaller than key (the 0-based position of key)."""
+        position = 0
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            nxt = node.next[level]
+            while nxt is not None and nxt.key < key:
+                position += node.width[level]
+                node = nxt
+                nxt = node.next[level]
+        return position
+
+    def _node_at(self, position):
+        remaining = position + 1
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def select(self, position):
+        if not 0 <= position < self._size:
+            raise IndexError(position)
+        return self._node_at(position).key
+
+    def iter_from(self, position):
+        """Keys from position on, in order."""
+        if position >= self._size:
+            return
+        node = self._node_at(max(position, 0))
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+
+def player_record(player):
+    """The /player/list fields of a player, without the rank."""
+    return {
+        'uid': player.get_uid(),
+        'player_name': player.get_player_name(),
+        'elapsed_time': player.get_elapsed_time(),
+        'elapsed_time_str': player.get_elapsed_time_str(),
+    }
+
+
+class RankIndex:
+    """Completed players by (elapsed_time, uid), with their records."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ranks = RankList()
+        self._keys = {}             # uid -> (elapsed_time, uid)
+        self._records = {}          # uid -> player_record()
+        self.version = 0            # bumped on every change
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def __contains__(self, uid):
+        return uid in self._keys
+
+    def load(self, players):
+        """Replace the index with players (a dict or iterable of Player)."""
+        if isinstance(players, dict):
+            players = players.values()
+        records = {}
+        for player in players:
+            record = player_record(player)
+            records[record['uid']] = record
+        keys = {uid: (record['elapsed_time'], uid) for uid, record in records.items()}
+        ranks = RankList.from_sorted(sorted(keys.values()))
+        with self._lock:
+            self._ranks = ranks
+            self._keys = keys
+            self._records = records
+            self.version += 1
+
+    def _put(self, player):
+        record = player_record(player)
+        uid = record['uid']
+        key = (record['elapsed_time'], uid)
+        old = self._keys.get(uid)
+        if old != key:
+            if old is not None:
+                self._ranks.remove(old)
+            self._ranks.insert(key)
+            self._keys[uid] = key
+        self._records[uid] = record
+
+    def update(self, player):
+        """Insert a completed player, or move it after a time change."""
+        with self._lock:
+            self._put(player)
+            self.version += 1
+
+    def discard(self, uid):
+        with self._lock:
+            key = self._keys.pop(uid, None)
+            if key is None:
+                return
+            self._ranks.remove(key)
+            del self._records[uid]
+            self.version += 1
+
+    def rank(self, uid):
+        """1-based rank of uid, or None when uid has not completed."""
+        with self._lock:
+            key = self._keys.get(uid)
+            return None if key is None else self._ranks.rank(key) + 1
+
+    def page(self, offset=0, limit=None):
+        """Records from rank offset + 1 on, at most limit of them."""
+        with self._lock:
+            result = []
+            if limit is not None and limit <= 0:
+                return result
+            for rank, key in enumerate(self._ranks.iter_from(offset), offset + 1):
+                result.append(dict(self._records[key[1]], rank=rank))
+                if limit is not None and len(result) >= limit:
+                    break
+            return result
+
+    def top(self, k):
+        return self.page(0, k)
+
+    def window(self, uid, before=2, after=2):
+        """Records of uid and the players just above and below it."""
+        rank = self.rank(uid)
+        if rank is None:
+            return []
+        start = max(rank - 1 - before, 0)
+        return self.page(start, rank - start + after)
+
+
+class IndexedStore:
+    """Player store wrapper that keeps a RankIndex in step with it.
+
+    Every attribute of the wrapped store is passed through. Calls of the
+    write methods below also re-index the player they wrote, reads are
+    left alone. Any other method may be a write this list misses: it is
+    logged once and the whole index is reloaded after each call.
+    Functions in listeners are called with (uid, player) for the same
+    writes, player being None for deletes, and with (None, None) when
+    any player may have changed.
+    """
+
+    # Write methods by what they are called with: a Player object, or the
+    # uid of a player that is read back from the store after the call
+    PLAYER_WRITES = ("add_player", "update_player", "save_player")
+    UID_WRITES = ("set_flag", "clear_flag", "set_flags", "set_elapsed_time")
+    DELETES = ("delete_player", "remove_player")
+    READ_PREFIXES = ("get_", "list_", "find_", "count_")
+    READS = ("login",)
+
+    def __init__(self, store, flag_complete):
+        self._store = store
+        self._flag_complete = flag_complete
+        self._index = RankIndex()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self.listeners = []
+        self._unknown = set()       # names of unknown methods already logged
+
+    @property
+    def index(self):
+        """The rank index, loaded from the store on first use."""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.reload()
+        return self._index
+
+    def reload(self):
+        """Rebuild the index from the completed players in the store."""
+        self._index.load(self._store.list_players(flags_include=self._flag_complete,
+                                                  order_by="elapsed_time"))
+        self._loaded = True
+
+    def reindex(self, player):
+        """Put player in or out of the index according to its flags."""
+        if not self._loaded:
+            # Loaded from the store, writes included, on first use
+            return
+        if player.get_flags() & self._flag_complete:
+            self._index.update(player)
+        else:
+            self._index.discard(player.get_uid())
+
+    def _written(self, uid, player):
+        if player is None:
+            if self._loaded:
+                self._index.discard(uid)
+        else:
+            self.reindex(player)
+        for listener in self.listeners:
+            listener(uid, player)
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if name in self.PLAYER_WRITES:
+            def call(player, *args, **kwargs):
+                result = attr(player, *args, **kwargs)
+                if not hasattr(player, "get_flags") or player.get_uid() is None:
+                    # No flags to tell completion by, or a new player whose
+                    # uid the store returned instead of setting it
+                    uid = player.get_uid()
+                    player = self._store.get_player(result if uid is None else uid)
+                if player is not None:
+                    self._written(player.get_uid(), player)
+                return result
+        elif name in self.UID_WRITES:
+            def call(uid, *args, **kwargs):
+                result = attr(uid, *args, **kwargs)
+                self._written(uid, self._store.get_player(uid))
+                return result
+        elif name in self.DELETES:
+            def call(uid, *args, **kwargs):
+                result = attr(uid, *args, **kwargs)
+                self._written(uid, None)
+                return result
+        elif (callable(attr) and name not in self.READS
+              and not name.startswith(self.READ_PREFIXES)):
+            def call(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                if name not in self._unknown:
+                    self._unknown.add(name)
+                    log.warning("%s() is not a known player store method, "
+                                "reloading the rank index after each call", name)
+                if self._loaded:
+                    self.reload()
+                for listener in self.listeners:
+                    listener(None, None)
+                return result
+        else:
+            return attr
+        return call
+
+
+# ---------------------------------------------------------------------------
+# Paged /player/list responses
+# ---------------------------------------------------------------------------
+LIST_FIELDS = ("uid", "player_name", "elapsed_time", "elapsed_time_str", "rank")
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_WINDOW = 10
+
+
+def list_page(index, offset=0, limit=0, around_uid=0, window=2):
+    """The ranks offset + 1 .. offset + limit plus the window around a uid.
+
+    Rows are in rank order without duplicates; a jump in rank is where a
+    spacer goes. At most limit + 2 * window + 1 rows, however many
+    players there are.
+    """
+    offset = max(offset, 0)
+    limit = min(limit or DEFAULT_LIMIT, MAX_LIMIT)
+    window = min(max(window, 0), MAX_WINDOW)
+    rows = index.page(offset, limit)
+    if around_uid and around_uid not in {row['uid'] for row in rows}:
+        shown = {row['rank'] for row in rows}
+        rows += [row for row in index.window(around_uid, window, window)
+                 if row['rank'] not in shown]
+        rows.sort(key=lambda row: row['rank'])
+    return rows
+
+
+def render_html(rows, highlight_uid=0):
+    """highscore.html list items for rows, with "....." at rank gaps."""
+    items = []
+    previous = 0
+    for row in rows:
+        if row['rank'] != previous + 1:
+            items.append(
+                '<li><div class="highscore-layout-table-window-link">'
+                '<div class="highscore-layout-table-window-link-item"></div>'
+                '<div class="highscore-layout-table-window-link-item">.....</div>'
+                '<div class="highscore-layout-table-window-link-item"></div>'
+                '</div></li>')
+        css = ("highscore-layout-table-window-link-user" if row['uid'] == highlight_uid
+               else "highscore-layout-table-window-link-item")
+        cells = (row['rank'], html.escape(str(row['player_name'])),
+                 html.escape(str(row['elapsed_time_str'])))
+        items.append('<li><div class="highscore-layout-table-window-link">'
+                     + "".join(f'<div class="{css}">{cell}</div>' for cell in cells)
+                     + '</div></li>')
+        previous = row['rank']
+    return "\n".join(items)
+
+
+def player_list(index, offset=0, limit=0, around_uid=0, window=2, fields="",
+                compact=0, format="json"):
+    """Response for /player/list?highscore=1 with paging parameters.
+
+    fields=rank,player_name keeps only those keys, compact=1 sends the
+    rows as lists under one "fields" header, format=html sends the
+    highscore.html list items instead of JSON.
+    """
+    rows = list_page(index, offset, limit, around_uid, window)
+    if format == "html":
+        return HTMLResponse(render_html(rows, around_uid))
+
+    names = [f for f in fields.split(",") if f in LIST_FIELDS] or list(LIST_FIELDS)
+    response = {
+        "total": len(index),
+        "offset": max(offset, 0),
+        "rank": index.rank(around_uid) if around_uid else None,
+    }
+    if compact:
+        response["fields"] = names
+        response["rows"] = [[row[f] for f in names] for row in rows]
+    else:
+        response["players"] = [{f: row[f] for f in names} for row in rows]
+    return response
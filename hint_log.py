@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Persisted hint usage for The BlackBox.
+
+add_hint_system.py counts the hints given per challenge in
+self._hints_used, in memory only, so a restart mid-game forgets them and
+the player can get (and pay for) the same hints again. With
+add_hint_log.py applied, theblackbox.py records every hint given here
+as (uid, challenge index, hint number, time) and restores
+self._hints_used from it when a player's data is loaded.
+
+record() only updates the in-memory state and queues the row; a
+write-behind thread stores queued rows in /opt/theblackbox/hints.sqlite
+in one transaction per FLUSH_INTERVAL (or BATCH_SIZE rows), so
+/challenge/hint never waits for the SD card. Rows still queued are
+written at exit; rows that fail then are logged, one error each.
+
+The statistics are kept up to date on every record() instead of being
+queried from the table:
+
+  GET /challenge/hint/stats
+    {"challenges": [{"challenge": 0, "hints": 7, "players": 4,
+                     "by_hint": [4, 2, 1]}, ...],
+     "pending": 0}
+
+"challenge" is the 0-based challenge index, "by_hint" the number of
+times hint 1, 2, 3... was given. admin_snapshot.py serves it as the
+"hints" section of the admin dashboard.
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from fastapi import APIRouter
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = "/opt/theblackbox/hints.sqlite"
+
+FLUSH_INTERVAL = 1.0                # seconds a queued row may wait
+BATCH_SIZE = 50
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS hint_usage (
+           uid INTEGER NOT NULL,
+           challenge INTEGER NOT NULL,
+           hint_number INTEGER NOT NULL,
+           used_at REAL NOT NULL,
+           PRIMARY KEY (uid, challenge, hint_number))""",
+)
+SELECT_ALL = "SELECT uid, challenge, hint_number FROM hint_usage"
+# A hint already recorded (given again after a restore) keeps its time
+INSERT = ("INSERT OR IGNORE INTO hint_usage (uid, challenge, hint_number, used_at) "
+          "VALUES (?, ?, ?, ?)")
+
+# HintLog set by start()
+hints = None
+
+
+class WriteBehind(threading.Thread):
+    """Writes queued rows in batches on its own thread."""
+
+    def __init__(self, path):
+        super().__init__(name="hint-writer", daemon=True)
+        self.path = path
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self.batches = 0
+        self.written = 0
+
+    def put(self, row):
+        self._queue.put(row)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _take(self):
+        """Block for the first row, then collect for FLUSH_INTERVAL."""
+        try:
+            rows = [self._queue.get(timeout=FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(rows) < BATCH_SIZE and not self._stopping.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                rows.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, db, rows):
+        try:
+            with db:
+                db.executemany(INSERT, rows)
+        except sqlite3.Error as e:
+            # Keep the rows for the next batch rather than lose them
+            log.warning("Hint log write failed, retrying: %s", e)
+            for row in rows:
+                self._queue.put(row)
+            self._stopping.wait(FLUSH_INTERVAL)
+            return
+        self.batches += 1
+        self.written += len(rows)
+
+    def run(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA synchronous=NORMAL")
+        while not self._stopping.is_set():
+            rows = self._take()
+            if rows:
+                self._write(db, rows)
+        rows = []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        if rows:
+            try:
+                with db:
+                    db.executemany(INSERT, rows)
+            except sqlite3.Error as e:
+                # No next batch: leave the rows in the log to re-enter by hand
+                log.error("Hint log write failed at exit, %d rows lost: %s", len(rows), e)
+                for row in rows:
+                    log.error("Lost hint row (uid, challenge, hint, time): %r", row)
+            else:
+                self.batches += 1
+                self.written += len(rows)
+        db.close()
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=5)
+        if self.is_alive():
+            log.error("Hint log writer did not finish, %d rows not written", self.pending())
+
+
+class HintLog:
+    """Hints given per player and challenge, and statistics per challenge."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        db = sqlite3.connect(path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+        rows = db.execute(SELECT_ALL).fetchall()
+        db.close()
+
+        self._lock = threading.Lock()
+        self._used = {}             # (uid, challenge) -> hints given
+        self._stats = {}            # challenge -> {"hints", "players" (set), "by_hint"}
+        for uid, challenge, number in rows:
+            self._add(uid, challenge, number)
+
+        self._writer = WriteBehind(path)
+        self._writer.start()
+
+    def _add(self, uid, challenge, number):
+        """Count one hint; False if it was counted before."""
+        key = (uid, challenge)
+        if self._used.get(key, 0) >= number:
+            return False
+        self._used[key] = number
+        stats = self._stats.setdefault(challenge, {"hints": 0, "players": set(), "by_hint": []})
+        stats["hints"] += 1
+        stats["players"].add(uid)
+        if len(stats["by_hint"]) < number:
+            stats["by_hint"].extend([0] * (number - len(stats["by_hint"])))
+        stats["by_hint"][number - 1] += 1
+        return True
+
+    def record(self, uid, challenge, number):
+        """Hint number (1-based) of challenge was given to player uid."""
+        with self._lock:
+            if not self._add(uid, challenge, number):
+                return
+        self._writer.put((uid, challenge, number, time.time()))
+
+    def hints_used(self, uid):
+        """challenge -> hints given, in the form of self._hints_used."""
+        with self._lock:
+            return {challenge: used for (player, challenge), used in self._used.items()
+                    if player == uid}
+
+    def stats(self):
+        with self._lock:
+            challenges = [{"challenge": challenge, "hints": s["hints"],
+                           "players": len(s["players"]), "by_hint": list(s["by_hint"])}
+                          for challenge, s in sorted(self._stats.items())]
+        return {"challenges": challenges, "pending": self._writer.pending()}
+
+    def close(self):
+        self._writer.stop()
+
+
+def start(path=DEFAULT_PATH):
+    """Load the hint log and start its writer; rows left are written at exit."""
+    global hints
+    if hints is None:
+        hints = HintLog(path)
+        atexit.register(hints.close)
+    return hints
+
+
+def record(player, challenge, number):
+    if hints is not None and player is not None:
+        hints.record(player.get_uid(), challenge, number)
+
+
+def hints_used(player):
+    """self._hints_used for player (none if the log is not started)."""
+    if hints is None or player is None:
+        return {}
+    return hints.hints_used(player.get_uid())
+
+
+router = APIRouter()
+
+
+@router.get("/challenge/hint/stats")
+def hint_stats():
+    if hints is None:
+        return {"error": "Hint log not started"}
+    return hints.stats()
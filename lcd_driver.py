@@ -0,0 +1,794 @@
+#!/usr/bin/env python3
+"""
+HD44780 16x2 LCD driver (PCF8574 I2C backpack) with a shadow framebuffer.
+
+The driver keeps a copy of the controller's DDRAM and only sends the
+cells that changed, with a cursor-address command only where the
+controller's address counter is not already at the next changed cell.
+It never uses the clear display command after init, so a typical
+banner or timer update becomes a handful of I2C writes instead of a
+clear (1.52 ms busy) plus a full repaint.
+
+Two ways to use it:
+
+  Direct API (new code):
+      lcd = LcdDriver.open()
+      lcd.init()
+      lcd.show(["THE BLACKBOX", "00:12:34"])
+      lcd.write("00:12:35", row=1)
+
+  Byte stream (lcd_screen.py, wired in by add_lcd_driver.py):
+      LcdScreen keeps building its usual 4-bit command/data stream and
+      hands every nibble to feed(). The driver decodes the stream into
+      a target framebuffer instead of sending it. Clear, return home,
+      address and data commands only update the target; a render shortly
+      after the last change sends the difference to the display.
+
+All bus I/O (including the init sleeps) runs on a writer thread, so the
+calls above only update the target framebuffer or queue a command and
+return at once. When updates come faster than the bus can take them,
+the writer renders only the latest frame. flush() / flush_async() wait
+until everything queued so far is on the display.
+
+Bus traffic goes through a transport: Pcf8574Transport (default) packs
+commands and strings into I2C bursts, ByteTransport is the old one
+write_byte() per port change with sleeps. bench_lcd.py compares them.
+
+Custom glyphs: the HD44780 has 8 CGRAM slots. Glyphs are registered
+once under a Unicode private-use codepoint (register_glyph(), built-ins
+in GLYPHS) and used as ordinary characters in write() / show():
+
+      lcd.write(glyph("skull") + " GAME OVER " + glyph("skull"))
+
+The driver keeps an LRU table of which glyph sits in which slot and only
+uploads a bitmap (9 bytes) when it is not resident. Slots still visible
+on screen are never evicted; a glyph that finds no free slot is shown
+as its fallback character.
+
+Timing: when the backpack's P1 is wired to the display's R/W pin, the
+driver reads the busy flag after clear / return home and waits exactly
+as long as the controller needs (timing="auto" probes this at init).
+Otherwise it uses fixed delays, picked per boot: the PCF8574 comes up
+with all pins high after a power cycle and keeps its last value over a
+reboot, so reading the control pins before the first write tells a cold display
+(8-bit mode, needs the long init waits) from a warm one. Measured busy
+times are logged at debug level and kept in LcdDriver.busy_times.
+
+Wiring (PCF8574 -> HD44780): P0=RS P1=RW P2=EN P3=backlight P4-P7=D4-D7
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from time import monotonic, sleep
+
+# PCF8574 port bits
+RS = 0x01
+RW = 0x02
+EN = 0x04
+BL = 0x08
+
+# HD44780 commands
+CMD_CLEARDISPLAY = 0x01
+CMD_RETURNHOME = 0x02
+CMD_ENTRYMODESET = 0x04
+CMD_DISPLAYCONTROL = 0x08
+CMD_CURSORSHIFT = 0x10
+CMD_FUNCTIONSET = 0x20
+CMD_SETCGRAMADDR = 0x40
+CMD_SETDDRAMADDR = 0x80
+
+ENTRY_INCREMENT = 0x02
+ENTRY_SHIFT = 0x01
+SHIFT_DISPLAY = 0x08
+SHIFT_RIGHT = 0x04
+DISPLAY_ON = 0x04
+FUNCTION_2LINE = 0x08
+
+DEFAULT_BUS = 6
+DEFAULT_ADDRESS = 0x27
+
+# Start address of each row in DDRAM (rows 2/3 only exist on 20x4 panels)
+ROW_OFFSETS = (0x00, 0x40, 0x14, 0x54)
+# 2-line mode DDRAM: 0x00-0x27 and 0x40-0x67
+DDRAM_ADDRESSES = tuple(range(0x00, 0x28)) + tuple(range(0x40, 0x68))
+
+# Time the controller needs for clear display / return home
+SLOW_COMMAND_TIME = 0.002
+
+# Init: wait after power-on, then after the first and second 0x3 nibble
+# (datasheet: >40ms, >4.1ms, >100us). lcd_emulator.py --search checks them.
+POWER_ON_DELAY = 0.05
+RESET_DELAYS = (0.0045, 0.00015)
+# Warm display: already initialised, but a half-written byte may turn the
+# first reset nibble into return home (1.52ms)
+WARM_RESET_DELAYS = (0.002, 0.0001)
+
+# Give up on the busy flag if it stays set this long
+BUSY_TIMEOUT = 0.01
+
+# How long the byte stream has to be quiet before the target is rendered
+SETTLE_TIME = 0.002
+
+
+log = logging.getLogger(__name__)
+
+# CGRAM: 8 glyphs of 5x8 pixels
+CGRAM_SLOTS = 8
+GLYPH_BASE = 0xE000  # first Unicode private-use codepoint
+
+
+class Glyph:
+    """5x8 bitmap (8 rows, low 5 bits used) under a private-use codepoint."""
+
+    __slots__ = ("codepoint", "name", "rows", "fallback")
+
+    def __init__(self, codepoint, name, rows, fallback):
+        self.codepoint = codepoint
+        self.name = name
+        self.rows = bytes(row & 0x1F for row in rows)
+        self.fallback = fallback
+
+    @property
+    def char(self):
+        return chr(self.codepoint)
+
+
+GLYPHS = {}          # codepoint -> Glyph
+GLYPH_NAMES = {}     # name -> Glyph
+
+
+def register_glyph(name, rows, fallback="#"):
+    """Register (or redefine) a glyph; returns its character."""
+    if len(rows) != 8:
+        raise ValueError("A glyph has 8 rows")
+    existing = GLYPH_NAMES.get(name)
+    codepoint = existing.codepoint if existing else GLYPH_BASE + len(GLYPHS)
+    glyph = Glyph(codepoint, name, rows, fallback)
+    GLYPHS[codepoint] = glyph
+    GLYPH_NAMES[name] = glyph
+    return glyph.char
+
+
+def glyph(name):
+    """Character of a registered glyph, for use in LCD text."""
+    return GLYPH_NAMES[name].char
+
+
+register_glyph("skull", (0b01110, 0b11111, 0b10101, 0b11111,
+                         0b11011, 0b01110, 0b01010, 0b00000), "X")
+register_glyph("drop", (0b00100, 0b00100, 0b01110, 0b01110,
+                        0b11111, 0b11111, 0b01110, 0b00000), "'")
+register_glyph("heart", (0b00000, 0b01010, 0b11111, 0b11111,
+                         0b01110, 0b00100, 0b00000, 0b00000), "<")
+register_glyph("eye", (0b00000, 0b01110, 0b10001, 0b10101,
+                       0b10001, 0b01110, 0b00000, 0b00000), "o")
+# Progress bar cells: bar0 (empty) to bar5 (full), filled from the left
+for _filled in range(6):
+    _row = (0x1F << (5 - _filled)) & 0x1F
+    register_glyph(f"bar{_filled}", (0x1F,) + (_row | 0x11,) * 6 + (0x1F,),
+                   " " if _filled < 3 else "=")
+del _filled, _row
+
+
+def progress_bar(fraction, width):
+    """Text for a `width` cell progress bar (fraction 0.0 - 1.0)."""
+    steps = round(max(0.0, min(1.0, fraction)) * width * 5)
+    return "".join(glyph(f"bar{max(0, min(5, steps - 5 * cell))}")
+                   for cell in range(width))
+
+
+def next_address(address):
+    """DDRAM address after `address` with the counter incrementing."""
+    if address == 0x27:
+        return 0x40
+    if address == 0x67:
+        return 0x00
+    return address + 1
+
+
+class Pcf8574Transport:
+    """
+    Sends HD44780 bytes through a PCF8574 in I2C bursts.
+
+    Every nibble is two port writes, EN high then EN low, with the data
+    and RS bits on both; the controller latches on the falling edge. The
+    byte sequence for each value is pre-encoded, and whole commands and
+    strings are queued in a buffer that flush() sends as one i2c_rdwr
+    message (smbus2) or as 32-byte write_i2c_block_data() chunks. One I2C
+    byte at 100 kHz takes ~90 us, longer than any EN timing or the 37 us
+    execution time of a normal command, so no sleeps are needed between
+    bytes. Only clear display / return home and the init sequence wait,
+    through delay().
+    """
+
+    BLOCK_SIZE = 32
+
+    def __init__(self, bus, address=DEFAULT_ADDRESS):
+        self._bus = bus
+        self._address = address
+        self._buffer = bytearray()
+        self._backlight = BL
+        self._rs = 0
+        self._msg = None
+        if hasattr(bus, "i2c_rdwr"):
+            try:
+                from smbus2 import i2c_msg
+                self._msg = i2c_msg
+            except ImportError:
+                pass
+        self._tables = {level: self._encode_table(level) for level in (BL, 0)}
+        self.transactions = 0
+
+    @staticmethod
+    def _encode_table(backlight):
+        """Port bytes for every (mode, value): 4 bytes, two EN strobes."""
+        table = {}
+        for mode in (0, RS):
+            for value in range(256):
+                high = (value & 0xF0) | mode | backlight
+                low = ((value << 4) & 0xF0) | mode | backlight
+                table[mode, value] = bytes((high | EN, high, low | EN, low))
+        return table
+
+    def set_backlight(self, on):
+        self._backlight = BL if on else 0
+        self._buffer.append((self._rs or 0) | self._backlight)
+        self.flush()
+
+    def nibble(self, value):
+        """Queue a single 4-bit write (init sequence)."""
+        value = (value & 0xF0) | self._backlight
+        if self._rs != 0:
+            self._buffer.append(self._backlight)
+            self._rs = 0
+        self._buffer += bytes((value | EN, value))
+
+    def byte(self, value, mode=0):
+        """Queue a command (mode 0) or data byte (mode RS)."""
+        if mode != self._rs:
+            # RS has to settle before EN goes high
+            self._buffer.append(mode | self._backlight)
+            self._rs = mode
+        self._buffer += self._tables[self._backlight][mode, value]
+
+    def delay(self, seconds):
+        """Send what is queued, then give the controller time."""
+        self.flush()
+        sleep(seconds)
+
+    def read_port(self):
+        self.flush()
+        return self._bus.read_byte(self._address)
+
+    def read_busy(self):
+        """(busy flag, address counter), read in two EN cycles with R/W high."""
+        # D4-D7 written high so the controller can pull them low
+        idle = 0xF0 | RW | self._backlight
+        self._buffer += bytes((idle, idle | EN))
+        high = self.read_port()
+        self._buffer += bytes((idle, idle | EN))
+        low = self.read_port()
+        self._buffer.append(idle)
+        self.flush()
+        self._rs = None
+        value = (high & 0xF0) | (low >> 4)
+        return bool(value & 0x80), value & 0x7F
+
+    def flush(self):
+        buffer = self._buffer
+        if not buffer:
+            return
+        self._buffer = bytearray()
+        if self._msg is not None:
+            self._bus.i2c_rdwr(self._msg.write(self._address, bytes(buffer)))
+            self.transactions += 1
+            return
+        # The PCF8574 has no registers: the "command" byte is just the
+        # first port value of the block
+        size = self.BLOCK_SIZE + 1
+        for offset in range(0, len(buffer), size):
+            chunk = buffer[offset:offset + size]
+            if len(chunk) == 1:
+                self._bus.write_byte(self._address, chunk[0])
+            else:
+                self._bus.write_i2c_block_data(self._address, chunk[0], list(chunk[1:]))
+            self.transactions += 1
+
+
+class ByteTransport:
+    """
+    The original per-byte timing from lcd_clear.py / lcd_screen.py: one
+    write_byte() per port change and fixed sleeps around every strobe.
+    Kept for comparison (bench_lcd.py) and for backpacks that misbehave
+    with block writes.
+    """
+
+    def __init__(self, bus, address=DEFAULT_ADDRESS):
+        self._bus = bus
+        self._address = address
+        self._backlight = BL
+        self.transactions = 0
+
+    def _port(self, value):
+        self._bus.write_byte(self._address, value | self._backlight)
+        self.transactions += 1
+
+    def set_backlight(self, on):
+        self._backlight = BL if on else 0
+        self._port(0)
+
+    def nibble(self, value):
+        self._port(value)
+        self._port(value | EN)
+        sleep(0.0005)
+        self._port(value & ~EN)
+        sleep(0.0001)
+
+    def byte(self, value, mode=0):
+        self.nibble(mode | (value & 0xF0))
+        self.nibble(mode | ((value << 4) & 0xF0))
+
+    def delay(self, seconds):
+        sleep(seconds)
+
+    def flush(self):
+        pass
+
+    def read_port(self):
+        return self._bus.read_byte(self._address)
+
+    def read_busy(self):
+        idle = 0xF0 | RW
+        self._port(idle)
+        self._port(idle | EN)
+        high = self.read_port()
+        self._port(idle)
+        self._port(idle | EN)
+        low = self.read_port()
+        self._port(idle)
+        value = (high & 0xF0) | (low >> 4)
+        return bool(value & 0x80), value & 0x7F
+
+
+TRANSPORTS = {
+    "burst": Pcf8574Transport,
+    "byte": ByteTransport,
+}
+
+
+def open_bus(bus_number=DEFAULT_BUS):
+    """SMBus handle, preferring smbus2 (i2c_rdwr bursts) over smbus."""
+    try:
+        import smbus2 as smbus
+    except ImportError:
+        import smbus
+    return smbus.SMBus(bus_number)
+
+
+class LcdDriver:
+    """
+    Shadow-framebuffer HD44780 driver with a background writer thread.
+
+    Caller side state (target framebuffer, stream decoder, command queue)
+    is guarded by a condition variable. The shadow copy of DDRAM and the
+    transport belong to the writer thread.
+    """
+
+    QUEUE_SIZE = 32
+
+    def __init__(self, transport, cols=16, rows=2, settle=SETTLE_TIME, timing="auto"):
+        if timing not in ("auto", "busy", "delay"):
+            raise ValueError(f"Unknown LCD timing mode: {timing}")
+        self._io = transport
+        self._timing = timing
+        self.cols = cols
+        self.rows = rows
+        self._settle = settle
+        self._cond = threading.Condition()
+
+        # Caller side: target framebuffer, as fed by the byte stream or the
+        # direct API, and commands that cannot be expressed as a frame
+        self._target = dict.fromkeys(DDRAM_ADDRESSES, 0x20)
+        self._cursor = 0           # target address counter
+        self._cgram = None         # CGRAM address while the stream writes glyphs
+        self._nibble = None        # pending high nibble of the stream
+        self._passthrough = False  # stream uses modes the shadow cannot model
+        self._slots = OrderedDict()  # glyph codepoint -> CGRAM slot, LRU first
+        self._ops = deque()
+        self._dirty = False
+        self._requested = 0        # bumped on every change
+        self._completed = 0        # last change the writer has put on the bus
+        self._running = True
+
+        # Writer side: controller model
+        self._shadow = dict.fromkeys(DDRAM_ADDRESSES, 0x20)
+        self._ac = None            # real address counter, None = unknown
+        self._raw = False          # render with explicit addresses only
+        self.boot = None           # "cold" / "warm", detected by init
+        self.busy_flag = False     # waits use the busy flag (else delays)
+        self.busy_times = {}       # instruction -> [count, total s, max s]
+
+        self.writes = 0            # bytes sent to the controller
+        self.frames = 0            # renders the writer has done
+        self.glyph_uploads = 0
+        self.glyph_hits = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, name="lcd-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def open(cls, bus_number=DEFAULT_BUS, address=DEFAULT_ADDRESS,
+             transport="burst", **kwargs):
+        """Driver on I2C bus `bus_number`; transport is "burst" or "byte"."""
+        return cls(TRANSPORTS[transport](open_bus(bus_number), address), **kwargs)
+
+    # ---- Caller side ----
+    def _changed(self):
+        self._dirty = True
+        self._requested += 1
+        self._cond.notify_all()
+
+    def _queue(self, op, key=None):
+        """Queue a command for the writer, replacing a queued one with `key`."""
+        if key is not None:
+            for queued in self._ops:
+                if queued[0] == key:
+                    queued[1:] = op[1:]
+                    self._changed()
+                    return
+        while len(self._ops) >= self.QUEUE_SIZE and self._running:
+            # Only commands that cannot be merged get here (passthrough)
+            self._cond.wait()
+        self._ops.append(op)
+        self._changed()
+
+    def init(self):
+        """Reset the controller into 4-bit, 2-line mode with a blank screen."""
+        with self._cond:
+            # Anything still queued is superseded by the reset
+            self._ops.clear()
+            self._target = dict.fromkeys(DDRAM_ADDRESSES, 0x20)
+            self._cursor = 0
+            self._cgram = None
+            self._nibble = None
+            self._passthrough = False
+            # CGRAM holds garbage after a power cycle
+            self._slots.clear()
+            self._queue(["init"])
+
+    def backlight(self, on):
+        with self._cond:
+            self._queue(["backlight", on], key="backlight")
+
+    def flush(self, timeout=None):
+        """Wait until every change made so far is on the display."""
+        with self._cond:
+            wanted = self._requested
+            return self._cond.wait_for(lambda: self._completed >= wanted
+                                       or not self._thread.is_alive(), timeout)
+
+    async def flush_async(self, timeout=None):
+        return await asyncio.get_running_loop().run_in_executor(None, self.flush, timeout)
+
+    def close(self):
+        """Write out what is pending and stop the writer thread."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join()
+
+    # ---- Direct API ----
+    def write(self, text, row=0, col=0):
+        """Write text at row/col."""
+        with self._cond:
+            text = text[:max(0, self.cols - col)]
+            start = ROW_OFFSETS[row] + col
+            self._put([start + i for i in range(len(text))], text)
+            self._changed()
+
+    def show(self, lines):
+        """Replace the whole screen with `lines` (padded / cut to width)."""
+        with self._cond:
+            addresses = []
+            text = ""
+            for row in range(self.rows):
+                line = lines[row] if row < len(lines) else ""
+                text += line[:self.cols].ljust(self.cols)
+                addresses += [ROW_OFFSETS[row] + col for col in range(self.cols)]
+            self._put(addresses, text)
+            self._changed()
+
+    def clear(self):
+        self.show([])
+
+    def text(self):
+        """What the display currently shows, as a list of strings."""
+        shadow = self._shadow
+        slots = {slot: chr(codepoint) for codepoint, slot in self._slots.items()}
+
+        def char(value):
+            if value is None:
+                return " "
+            if value < CGRAM_SLOTS:
+                return slots.get(value, "?")
+            return chr(value)
+
+        return ["".join(char(shadow[ROW_OFFSETS[row] + col]) for col in range(self.cols))
+                for row in range(self.rows)]
+
+    # ---- Glyph slots ----
+    def _put(self, addresses, text):
+        """Store text in the target, mapping glyphs to resident CGRAM slots."""
+        overwritten = set(addresses)
+        # Slots shown by the cells that stay must keep their bitmap
+        pinned = {value for address, value in self._target.items()
+                  if value < CGRAM_SLOTS and address not in overwritten}
+        for address, char in zip(addresses, text):
+            self._target[address] = self._code(char, pinned)
+
+    def _code(self, char, pinned):
+        code = ord(char)
+        if 0x20 <= code < 0x80:
+            return code
+        glyph = GLYPHS.get(code)
+        if glyph is None:
+            return 0x3F  # '?' outside ASCII
+        slot = self._slots.get(code)
+        if slot is not None:
+            self._slots.move_to_end(code)
+            self.glyph_hits += 1
+        else:
+            slot = self._allocate_slot(pinned)
+            if slot is None:
+                return ord(glyph.fallback)
+            self._slots[code] = slot
+            self._queue(["cgram", slot * 8, bytearray(glyph.rows)])
+            self.glyph_uploads += 1
+        pinned.add(slot)
+        return slot
+
+    def _allocate_slot(self, pinned):
+        """Free slot, or the least recently used one that is not on screen."""
+        free = set(range(CGRAM_SLOTS)) - set(self._slots.values())
+        if free:
+            return min(free)
+        for codepoint, slot in self._slots.items():
+            if slot not in pinned:
+                del self._slots[codepoint]
+                return slot
+        return None
+
+    # ---- Byte stream API (lcd_screen.py) ----
+    def feed(self, data):
+        """Take one 4-bit write (mode bits | nibble) from LcdScreen."""
+        with self._cond:
+            if self._nibble is None:
+                self._nibble = data
+                return
+            high, self._nibble = self._nibble, None
+            value = (high & 0xF0) | ((data >> 4) & 0x0F)
+            if high & RS:
+                self._stream_data(value)
+            else:
+                self._stream_command(value)
+
+    def _stream_command(self, value):
+        if value & CMD_SETDDRAMADDR:
+            self._cgram = None
+            self._cursor = value & 0x7F
+        elif value & CMD_SETCGRAMADDR:
+            # Custom glyph upload: data bytes go to CGRAM until the next
+            # DDRAM address / clear / home
+            self._cgram = value & 0x3F
+        elif value & CMD_FUNCTIONSET:
+            # The driver owns the interface mode
+            pass
+        elif value & CMD_CURSORSHIFT:
+            if value & SHIFT_DISPLAY:
+                self._enter_passthrough(value)
+            elif value & SHIFT_RIGHT:
+                self._cursor = next_address(self._cursor)
+            else:
+                self._cursor = (self._cursor - 1) & 0x7F
+        elif value & CMD_DISPLAYCONTROL:
+            self._queue(["display", value], key="display")
+        elif value & CMD_ENTRYMODESET:
+            if value & ENTRY_SHIFT or not value & ENTRY_INCREMENT:
+                self._enter_passthrough(value)
+            elif self._passthrough:
+                self._queue(["command", value])
+        elif value & CMD_RETURNHOME:
+            self._cgram = None
+            self._cursor = 0
+            if self._passthrough:
+                self._queue(["command", value])
+        elif value == CMD_CLEARDISPLAY:
+            self._cgram = None
+            self._cursor = 0
+            self._target = dict.fromkeys(DDRAM_ADDRESSES, 0x20)
+            if self._passthrough:
+                self._queue(["command", value])
+            self._changed()
+
+    def _stream_data(self, value):
+        if self._cgram is not None:
+            # LcdScreen defines its own character: the slot is no longer ours
+            for codepoint, slot in list(self._slots.items()):
+                if slot == self._cgram >> 3:
+                    del self._slots[codepoint]
+            # Extend the upload that is still queued, if it ends right here
+            last = self._ops[-1] if self._ops else None
+            if last and last[0] == "cgram" and last[1] + len(last[2]) == self._cgram:
+                last[2].append(value)
+            else:
+                self._queue(["cgram", self._cgram, bytearray((value,))])
+            self._cgram = (self._cgram + 1) & 0x3F
+            self._changed()
+            return
+        if self._cursor in self._target:
+            self._target[self._cursor] = value
+        self._cursor = next_address(self._cursor)
+        self._changed()
+
+    def _enter_passthrough(self, value):
+        # Entry shift / display shift move DDRAM under the shadow's feet:
+        # stop diffing and render with explicit addresses until init()
+        if not self._passthrough:
+            self._passthrough = True
+            self._queue(["passthrough"])
+        self._queue(["command", value])
+
+    # ---- Writer thread ----
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._dirty or not self._running)
+                if not self._dirty:
+                    return
+            # Let the stream settle so clear + rewrite becomes one frame
+            if self._settle:
+                sleep(self._settle)
+            with self._cond:
+                ops = list(self._ops)
+                self._ops.clear()
+                frame = dict(self._target)
+                self._dirty = False
+                generation = self._requested
+                self._cond.notify_all()
+            try:
+                for op in ops:
+                    self._execute(op, frame)
+                self._render(frame)
+                self._io.flush()
+            except Exception as e:
+                # Keep the writer alive; the next frame rewrites every cell
+                self.errors += 1
+                if isinstance(e, OSError):
+                    log.warning("LCD write failed: %s", e)
+                else:
+                    log.exception("LCD writer error")
+                self._shadow = dict.fromkeys(DDRAM_ADDRESSES)
+                self._ac = None
+            with self._cond:
+                self._completed = generation
+                self._cond.notify_all()
+
+    def _send(self, value, mode=0):
+        self._io.byte(value, mode)
+        self.writes += 1
+        if mode == 0 and value in (CMD_CLEARDISPLAY, CMD_RETURNHOME):
+            if self.busy_flag:
+                self._wait_ready("clear" if value == CMD_CLEARDISPLAY else "home")
+            else:
+                self._io.delay(SLOW_COMMAND_TIME)
+            self._ac = 0
+            if value == CMD_CLEARDISPLAY:
+                self._shadow = dict.fromkeys(DDRAM_ADDRESSES, 0x20)
+
+    def _execute(self, op, frame):
+        kind = op[0]
+        if kind == "init":
+            self._hardware_init()
+        elif kind == "cgram":
+            self._send(CMD_SETCGRAMADDR | op[1])
+            for value in op[2]:
+                self._send(value, RS)
+            self._ac = None
+        elif kind == "passthrough":
+            self._render(frame)
+            self._raw = True
+        elif kind == "backlight":
+            self._io.set_backlight(op[1])
+        else:
+            self._send(op[1])
+
+    def _wait_ready(self, name):
+        """Poll the busy flag; falls back to delays if it never clears."""
+        self._io.flush()
+        started = monotonic()
+        while True:
+            busy, _ = self._io.read_busy()
+            elapsed = monotonic() - started
+            if not busy:
+                break
+            if elapsed > BUSY_TIMEOUT:
+                log.warning("LCD busy flag stuck for %.1f ms, using fixed delays",
+                            elapsed * 1000)
+                self.busy_flag = False
+                return
+        stats = self.busy_times.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        log.debug("LCD %s busy for %.0f us", name, elapsed * 1e6)
+
+    def _detect_boot(self):
+        try:
+            port = self._io.read_port()
+        except OSError:
+            return "cold"
+        # Never written since power-up: all pins still high. With R/W wired
+        # the display drives D7-D4 (EN and R/W are high), so only the
+        # control bits are reliable; the driver never leaves all four set.
+        return "cold" if port & 0x0F == 0x0F else "warm"
+
+    def _probe_busy_flag(self):
+        """True if busy flag / address counter can be read back."""
+        self._send(CMD_SETDDRAMADDR | 0x40)
+        try:
+            busy, ac = self._io.read_busy()
+        except OSError:
+            return False
+        # Without R/W wired the probe is written as a command instead
+        self._ac = None
+        return not busy and ac == 0x40
+
+    def _hardware_init(self):
+        self.busy_flag = False
+        self.boot = self._detect_boot()
+        if self.boot == "cold":
+            # Wait for LCD power stabilization (cold boot needs >40ms)
+            self._io.delay(POWER_ON_DELAY)
+            delays = RESET_DELAYS
+        else:
+            delays = WARM_RESET_DELAYS
+        # Resynchronise to 8-bit mode from any state, then switch to 4-bit
+        self._io.nibble(0x30)
+        self._io.delay(delays[0])
+        self._io.nibble(0x30)
+        self._io.delay(delays[1])
+        self._io.nibble(0x30)
+        self._io.nibble(0x20)
+
+        self._send(CMD_FUNCTIONSET | FUNCTION_2LINE)
+        if self._timing != "delay":
+            self.busy_flag = self._probe_busy_flag()
+            if not self.busy_flag and self._timing == "busy":
+                log.warning("LCD busy flag not readable (R/W not wired?), using fixed delays")
+        self._send(CMD_DISPLAYCONTROL | DISPLAY_ON)
+        self._send(CMD_CLEARDISPLAY)
+        self._send(CMD_ENTRYMODESET | ENTRY_INCREMENT)
+        self._raw = False
+
+        clear = self.busy_times.get("clear")
+        log.info("LCD init: %s boot, %s%s", self.boot,
+                 "busy flag" if self.busy_flag else "fixed delays",
+                 f", clear took {clear[2] * 1e6:.0f} us" if clear and self.busy_flag else "")
+
+    def _render(self, frame):
+        """Send the cells where `frame` and the shadow differ."""
+        ac = self._ac
+        for address in DDRAM_ADDRESSES:
+            value = frame[address]
+            if self._shadow[address] == value:
+                continue
+            if ac != address or self._raw:
+                self._send(CMD_SETDDRAMADDR | address)
+            self._send(value, RS)
+            self._shadow[address] = value
+            ac = next_address(address)
+        self._ac = None if self._raw else ac
+        self.frames += 1
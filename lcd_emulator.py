@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+HD44780 + PCF8574 emulator for testing LCD code off the Pi.
+
+SMBus is a drop-in for smbus.SMBus / smbus2.SMBus. Port writes to the
+PCF8574 are decoded like the real backpack wiring (P0=RS P1=RW P2=EN
+P3=backlight P4-P7=D4-D7): every EN falling edge latches a nibble into
+an HD44780 model, which keeps DDRAM, CGRAM, the address counter and the
+interface mode, and knows how long each instruction executes (datasheet
+values at 270 kHz).
+
+The emulator flags what would go wrong on real hardware:
+
+  power   instruction sent less than 40 ms after power-on
+  busy    nibble latched while the previous instruction still executes
+          (the controller drops it, like the real one may)
+  setup   RS/RW changed in the same port write that raised EN
+  hold    data/RS changed in the same port write that dropped EN
+
+Busy flag / address counter reads work like on a backpack with P1 wired
+to R/W. With rw_wired=False the display's R/W pin is tied low instead:
+reads only see the port latch, and an EN strobe meant as a read is
+latched as a write.
+
+Power-on state can be cold (8-bit mode, Vcc just rose), boot (8-bit
+mode, powered for a while: the Pi cold boot case, where the app starts
+seconds after power-on), warm (4-bit mode, still configured from before
+a reboot) or warm-mid (4-bit mode with half a byte already latched, as
+when a reboot interrupted a write; worst case, the next nibble completes
+a return home). The PCF8574 port starts all high after a power cycle
+and keeps its last value (backlight on, EN low) over a reboot.
+
+Time is virtual by default: it advances by the I2C transfer time of
+every byte written (100 kHz) and by sleep(). Code under test has to call
+the emulator's sleep() instead of time.sleep, e.g.
+
+    import lcd_driver, lcd_emulator
+    bus = lcd_emulator.SMBus(6, power="cold")
+    lcd_driver.sleep = bus.sleep
+    lcd_driver.monotonic = bus.now
+
+With clock="real" the wall clock is used and writes block for their
+transfer time instead.
+
+Run it to replay the init/clear sequences of lcd_clear.py, the fix_lcd_*
+versions of lcd_screen.py and lcd_driver.py against every power-on
+state; --search finds the shortest lcd_driver.py init delays that are
+safe in all of them.
+
+Usage:
+  python3 lcd_emulator.py [--search]
+"""
+
+import argparse
+import time
+
+# PCF8574 port bits (same wiring as lcd_driver.py)
+RS = 0x01
+RW = 0x02
+EN = 0x04
+BL = 0x08
+
+# I2C at 100 kHz: 9 clocks per byte, plus start + address byte per transfer
+I2C_BYTE_TIME = 90e-6
+
+# Execution times (HD44780U datasheet, fosc = 270 kHz)
+CLEAR_TIME = 1.52e-3
+HOME_TIME = 1.52e-3
+COMMAND_TIME = 37e-6
+DATA_TIME = 37e-6 + 4e-6
+POWER_ON_TIME = 40e-3
+# Initialising by instruction: wait after the 1st / 2nd 8-bit function set
+RESET_TIMES = (4.1e-3, 100e-6)
+
+POWER_STATES = ("cold", "boot", "warm", "warm-mid")
+
+
+class Violation:
+    def __init__(self, when, kind, message):
+        self.when = when
+        self.kind = kind
+        self.message = message
+
+    def __repr__(self):
+        return f"{self.when * 1000:9.3f}ms {self.kind:<5} {self.message}"
+
+
+class Hd44780:
+    """Instruction-level model of the controller."""
+
+    def __init__(self, power="cold", now=0.0):
+        if power not in POWER_STATES:
+            raise ValueError(f"Unknown power state: {power}")
+        self.ddram = bytearray(b" " * 0x80)
+        self.cgram = bytearray(0x40)
+        self.ac = 0
+        self.cgram_mode = False
+        self.increment = True
+        self.shift = False
+        self.display_on = False
+        self.two_lines = True
+        self.eight_bit = power in ("cold", "boot")
+        self.pending = 0x00 if power == "warm-mid" else None  # latched high nibble
+        self.ready_at = now + POWER_ON_TIME if power == "cold" else now
+        self.busy_until = now
+        # Until the first switch to 4-bit mode after power-on the controller
+        # needs the long waits of "initializing by instruction"
+        self.initialized = not self.eight_bit
+        self.resets = 0            # 8-bit function sets in a row
+        self.read_phase = 0
+        self.instructions = 0
+        self.busy_total = 0.0
+
+    def busy(self, now):
+        return now < self.busy_until
+
+    def latch(self, nibble, rs, now, violations):
+        """EN falling edge with RW low. nibble is the D7-D4 port bits."""
+        if now < self.ready_at:
+            violations.append(Violation(now, "power", f"nibble {nibble >> 4:X} "
+                                        f"{(self.ready_at - now) * 1000:.3f}ms before power-on done"))
+            return
+        if self.busy(now):
+            violations.append(Violation(now, "busy", f"nibble {nibble >> 4:X} dropped, busy "
+                                        f"{(self.busy_until - now) * 1e6:.0f}us longer"))
+            return
+        self.read_phase = 0
+        if self.eight_bit:
+            # D3-D0 are not wired, the controller reads them as 0
+            self.execute(nibble & 0xF0, rs, now)
+        elif self.pending is None:
+            self.pending = nibble & 0xF0
+        else:
+            value = self.pending | (nibble >> 4)
+            self.pending = None
+            self.execute(value, rs, now)
+
+    def read(self, rs, now):
+        """D7-D4 driven by the controller while EN is high with RW high."""
+        if rs:
+            value = self.cgram[self.ac & 0x3F] if self.cgram_mode else self.ddram[self.ac]
+        else:
+            value = (0x80 if self.busy(now) else 0) | self.ac
+        if self.eight_bit or self.read_phase == 0:
+            return value & 0xF0
+        return (value << 4) & 0xF0
+
+    def end_read(self):
+        if not self.eight_bit:
+            self.read_phase ^= 1
+
+    def execute(self, value, rs, now):
+        self.instructions += 1
+        duration = COMMAND_TIME
+        if rs:
+            duration = DATA_TIME
+            if self.cgram_mode:
+                self.cgram[self.ac & 0x3F] = value
+            else:
+                self.ddram[self.ac] = value
+            self._move(1 if self.increment else -1)
+        elif value & 0x80:
+            self.cgram_mode = False
+            self.ac = value & 0x7F
+        elif value & 0x40:
+            self.cgram_mode = True
+            self.ac = value & 0x3F
+        elif value & 0x20:
+            if self.eight_bit and value & 0x10:
+                if not self.initialized and self.resets < len(RESET_TIMES):
+                    duration = RESET_TIMES[self.resets]
+                self.resets += 1
+            else:
+                self.resets = 0
+            if not value & 0x10:
+                self.initialized = True
+            self.eight_bit = bool(value & 0x10)
+            self.two_lines = bool(value & 0x08)
+        elif value & 0x10:
+            if not value & 0x08:
+                self._move(1 if value & 0x04 else -1)
+        elif value & 0x08:
+            self.display_on = bool(value & 0x04)
+        elif value & 0x04:
+            self.increment = bool(value & 0x02)
+            self.shift = bool(value & 0x01)
+        elif value & 0x02:
+            duration = HOME_TIME
+            self.cgram_mode = False
+            self.ac = 0
+        elif value & 0x01:
+            duration = CLEAR_TIME
+            self.ddram[:] = b" " * 0x80
+            self.cgram_mode = False
+            self.ac = 0
+            self.increment = True
+        if value & 0xF0 != 0x30 or rs:
+            self.resets = 0
+        self.busy_until = now + duration
+        self.busy_total += duration
+
+    def _move(self, step):
+        if self.cgram_mode:
+            self.ac = (self.ac + step) & 0x3F
+        elif self.two_lines:
+            address = self.ac + step
+            if address == 0x28:
+                address = 0x40
+            elif address == 0x68:
+                address = 0x00
+            elif address == 0x3F:
+                address = 0x27
+            elif address == -1:
+                address = 0x67
+            self.ac = address
+        else:
+            self.ac = (self.ac + step) % 0x50
+
+    def lines(self, cols=16):
+        if self.two_lines:
+            starts = (0x00, 0x40)
+        else:
+            starts = (0x00,)
+        return [bytes(self.ddram[s:s + cols]).decode("latin-1") for s in starts]
+
+
+class SMBus:
+    """Fake smbus.SMBus with a PCF8574 + HD44780 behind every address."""
+
+    def __init__(self, bus=None, power="cold", clock="virtual", rw_wired=True):
+        self.bus = bus
+        self.clock = clock
+        self.rw_wired = rw_wired
+        self._t0 = time.perf_counter()
+        self._virtual = 0.0
+        self._bus_free = 0.0
+        # PCF8574 powers up with all pins high, keeps its latch over a reboot
+        self.port = 0xFF if power in ("cold", "boot") else BL
+        self.violations = []
+        self.transactions = 0
+        self.bytes = 0
+        self.lcd = Hd44780(power, self.now())
+
+    # ---- Clock ----
+    def now(self):
+        if self.clock == "virtual":
+            return self._virtual
+        return time.perf_counter() - self._t0
+
+    def sleep(self, seconds):
+        if self.clock == "virtual":
+            self._virtual += max(0.0, seconds)
+        else:
+            time.sleep(seconds)
+
+    def _transfer(self, count):
+        """Times at which each of `count` data bytes reaches the port."""
+        start = max(self.now(), self._bus_free) + I2C_BYTE_TIME  # address byte
+        times = [start + (i + 1) * I2C_BYTE_TIME for i in range(count)]
+        self._bus_free = times[-1] if times else start
+        self.transactions += 1
+        self.bytes += count
+        if self.clock == "virtual":
+            self._virtual = self._bus_free
+        else:
+            while time.perf_counter() - self._t0 < self._bus_free:
+                pass
+        return times
+
+    # ---- PCF8574 ----
+    def _port_write(self, value, now):
+        prev, self.port = self.port, value
+        if not prev & EN and value & EN:
+            if (prev ^ value) & (RS | RW):
+                self.violations.append(Violation(now, "setup", "RS/RW changed with EN rising"))
+        elif prev & EN and not value & EN:
+            if prev & RW and self.rw_wired:
+                # End of a read cycle (or the PCF8574 power-up state)
+                self.lcd.end_read()
+                return
+            if (prev ^ value) & (0xF0 | RS | RW):
+                self.violations.append(Violation(now, "hold", "data changed with EN falling"))
+            self.lcd.latch(prev & 0xF0, prev & RS, now, self.violations)
+
+    def write_byte(self, addr, value):
+        for when, byte in zip(self._transfer(1), (value,)):
+            self._port_write(byte & 0xFF, when)
+
+    def write_i2c_block_data(self, addr, cmd, vals):
+        data = [cmd] + list(vals)
+        for when, byte in zip(self._transfer(len(data)), data):
+            self._port_write(byte & 0xFF, when)
+
+    def i2c_rdwr(self, *msgs):
+        for msg in msgs:
+            data = list(msg)
+            for when, byte in zip(self._transfer(len(data)), data):
+                self._port_write(byte & 0xFF, when)
+
+    def read_byte(self, addr):
+        now = self._transfer(1)[0]
+        value = self.port
+        if value & RW and value & EN and self.rw_wired:
+            # Quasi-bidirectional pins: only pins latched high can be
+            # pulled low by the controller
+            value = (value & 0x0F) | (value & self.lcd.read(value & RS, now))
+        return value
+
+    def close(self):
+        pass
+
+    # ---- Inspection ----
+    def lines(self, cols=16):
+        return self.lcd.lines(cols)
+
+
+# ===========================================================================
+# Sequence replays
+# ===========================================================================
+def _seq_lcd_screen_original(bus, lcd_driver):
+    # _lcd_write_cmd(0x03) x3, (0x02) with the ~0.6ms per nibble strobe timing
+    io = lcd_driver.ByteTransport(bus)
+    for value in (0x03, 0x03, 0x03, 0x02, 0x28, 0x0C, 0x01, 0x06):
+        io.byte(value)
+    return io
+
+
+def _seq_lcd_screen_v3(bus, lcd_driver):
+    io = lcd_driver.ByteTransport(bus)
+    bus.sleep(0.05)
+    io.nibble(0x30)
+    bus.sleep(0.005)
+    io.nibble(0x30)
+    bus.sleep(0.005)
+    io.nibble(0x30)
+    bus.sleep(0.0002)
+    io.nibble(0x20)
+    bus.sleep(0.0002)
+    for value in (0x28, 0x0C, 0x01):
+        io.byte(value)
+    bus.sleep(0.003)
+    io.byte(0x06)
+    return io
+
+
+def _seq_lcd_clear_old(bus, lcd_driver):
+    # lcd_clear.py before it used lcd_driver.py
+    io = lcd_driver.ByteTransport(bus)
+    for value in (0x30, 0x30, 0x30, 0x20):
+        io.nibble(value)
+    for value in (0x28, 0x0C, 0x01, 0x06):
+        io.byte(value)
+    return io
+
+
+def _seq_driver(transport, rw_wired=True):
+    def run(bus, lcd_driver):
+        bus.rw_wired = rw_wired
+        lcd = lcd_driver.LcdDriver(lcd_driver.TRANSPORTS[transport](bus))
+        lcd.init()
+        lcd.flush()
+        lcd.close()
+        return None
+    return run
+
+
+SEQUENCES = {
+    "lcd_screen original": _seq_lcd_screen_original,
+    "lcd_screen v3": _seq_lcd_screen_v3,
+    "lcd_clear (old)": _seq_lcd_clear_old,
+    "lcd_driver byte": _seq_driver("byte"),
+    "lcd_driver burst": _seq_driver("burst"),
+    "lcd_driver burst, R/W not wired": _seq_driver("burst", rw_wired=False),
+}
+
+TEST_TEXT = "BLACKBOX"
+
+
+def replay(sequence, power):
+    """Run an init sequence, then write TEST_TEXT; returns (bus, ok, elapsed)."""
+    import lcd_driver
+
+    bus = SMBus(power=power)
+    saved = lcd_driver.sleep, lcd_driver.monotonic
+    lcd_driver.sleep = bus.sleep
+    lcd_driver.monotonic = bus.now
+    try:
+        io = sequence(bus, lcd_driver) or lcd_driver.ByteTransport(bus)
+        elapsed = bus.now()
+        # Give the last instruction time to finish, then write the test text
+        bus.sleep(CLEAR_TIME)
+        io.byte(0x80)
+        for char in TEST_TEXT:
+            io.byte(ord(char), RS)
+        io.flush()
+    finally:
+        lcd_driver.sleep, lcd_driver.monotonic = saved
+    ok = (bus.lines()[0].startswith(TEST_TEXT) and bus.lcd.display_on
+          and not bus.lcd.eight_bit and bus.lcd.two_lines)
+    return bus, ok, elapsed
+
+
+def report():
+    for name, sequence in SEQUENCES.items():
+        print(name)
+        for power in POWER_STATES:
+            bus, ok, elapsed = replay(sequence, power)
+            kinds = sorted({v.kind for v in bus.violations})
+            print(f"  {power:<9} {'OK ' if ok else 'BAD'} init {elapsed * 1000:7.2f}ms  "
+                  f"{bus.transactions:4} transfers  violations: "
+                  f"{len(bus.violations)} {','.join(kinds)}")
+            for violation in bus.violations[:3]:
+                print(f"      {violation}")
+
+
+# lcd_driver.py delay constants: (name, index into a tuple or None)
+SEARCH_DELAYS = (
+    ("POWER_ON_DELAY", None),
+    ("RESET_DELAYS", 0),
+    ("RESET_DELAYS", 1),
+    ("WARM_RESET_DELAYS", 0),
+    ("WARM_RESET_DELAYS", 1),
+    ("SLOW_COMMAND_TIME", None),
+)
+
+
+def search():
+    """Shortest lcd_driver.py delays that are safe from every power state."""
+    import lcd_driver
+
+    # Delays matter when the busy flag cannot be read
+    sequence = _seq_driver("burst", rw_wired=False)
+    saved = {name: getattr(lcd_driver, name) for name, _ in SEARCH_DELAYS}
+
+    def get(name, index):
+        value = getattr(lcd_driver, name)
+        return value if index is None else value[index]
+
+    def put(name, index, value):
+        if index is not None:
+            values = list(getattr(lcd_driver, name))
+            values[index] = value
+            value = tuple(values)
+        setattr(lcd_driver, name, value)
+
+    def safe():
+        for power in POWER_STATES:
+            bus, ok, _ = replay(sequence, power)
+            if not ok or bus.violations:
+                return False
+        return True
+
+    print("Shortest safe lcd_driver.py delays (100 kHz I2C, burst transport, no R/W):")
+    try:
+        for name, index in SEARCH_DELAYS:
+            # Binary search on a 10us grid; the current value must be safe
+            current = high = get(name, index)
+            low = 0.0
+            while high - low > 10e-6:
+                middle = (low + high) / 2
+                put(name, index, middle)
+                if safe():
+                    high = middle
+                else:
+                    low = middle
+            put(name, index, high)
+            label = name if index is None else f"{name}[{index}]"
+            print(f"  {label:<21} {high * 1000:8.3f}ms  (now {current * 1000:.3f}ms)")
+    finally:
+        for name, value in saved.items():
+            setattr(lcd_driver, name, value)
+    print("Real hardware runs on a slower or faster oscillator; keep a margin.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--search", action="store_true",
+                        help="find the shortest safe lcd_driver.py init delays")
+    args = parser.parse_args()
+    if args.search:
+        search()
+    else:
+        report()
+
+
+if __name__ == "__main__":
+    main()
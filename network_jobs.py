@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Network actions as jobs on a single worker thread.
+
+/network/action (connect, disconnect, scan) and /network/bypass?enable=
+run nmcli/wpa_cli inside the request, and connect.html then polled
+/network/status every second to find out whether the connection came
+up. With add_network_jobs.py applied, theblackbox.py wraps both handlers
+in queued(): a request with parameters becomes a job and is answered
+right away with
+
+  {"success": true, "job": {"id": 3, "name": "action",
+                            "params": {"connect": 1}, "state": "queued",
+                            "progress": "", "result": null, "error": null,
+                            "created": ..., "started": null, "finished": null}}
+
+Jobs run one at a time in submission order, on the worker thread, so
+no request thread waits for the network tools. A job equal to one
+still queued or running (same route and parameters) is not added
+again; the request gets the existing job. Requests without parameters,
+such as the bypass status, still go straight to the handler.
+
+The worker also owns the radio's scans: start() has the background
+scanner of wifi_scan.py, when it is deployed, run each scan as a "scan"
+job, so a scan never runs in the middle of a connect. A scan=1 request
+is not a job of its own; it goes to the handler, where the wrapper from
+wifi_scan.py joins the scanner's next scan.
+
+A connect job also waits, up to CONNECT_TIMEOUT, until /network/status
+reports the connection, with its progress updated every second; it
+fails if the connection does not come up.
+
+Provides:
+  GET /network/jobs                  - Recent jobs, newest first
+  GET /network/jobs/{id}?wait=10     - One job; with wait, answered when
+                                       the job finishes (or after wait s)
+
+Every state change is also published as a "network-job" event on the
+/events stream (event_stream.py).
+"""
+
+import asyncio
+import collections
+import functools
+import inspect
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from fastapi import APIRouter
+
+from event_stream import hub, route_source
+
+log = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 10                # seconds for a connect job to come up
+MAX_WAIT = 30.0                     # longest ?wait= on /network/jobs/{id}
+HISTORY = 50                        # finished jobs kept
+
+# Parameters answered by the handler instead of as a job
+DIRECT_PARAMS = ("scan",)
+
+# JobQueue set by start()
+jobs = None
+
+
+class Job:
+    def __init__(self, job_id, name, params, run):
+        self.id = job_id
+        self.name = name
+        self.params = params
+        self.run = run
+        self.state = "queued"
+        self.progress = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._finished = threading.Event()
+
+    @property
+    def key(self):
+        return (self.name, tuple(sorted(self.params.items())))
+
+    @property
+    def done(self):
+        return self.state in ("done", "failed")
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; False on timeout."""
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "params": self.params,
+                "state": self.state, "progress": self.progress,
+                "result": self.result, "error": self.error,
+                "created": self.created, "started": self.started,
+                "finished": self.finished}
+
+
+class JobQueue(threading.Thread):
+    """Runs submitted jobs one at a time, newest HISTORY kept."""
+
+    def __init__(self, status=None):
+        super().__init__(name="network-jobs", daemon=True)
+        self._status = status       # () -> /network/status response
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = collections.OrderedDict()     # id -> Job
+        self._active = {}                          # key -> queued/running Job
+
+    def _changed(self, job):
+        hub.publish("network-job", job.to_dict(), changes_only=False)
+
+    def submit(self, name, params, run):
+        """Queue run() as a job, or return the equal job not finished yet."""
+        key = (name, tuple(sorted(params.items())))
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None:
+                return active
+            job = self._active[key] = Job(next(self._ids), name, params, run)
+            self._jobs[job.id] = job
+            finished = [j for j in self._jobs.values() if j.done]
+            for old in finished[:max(len(finished) - HISTORY, 0)]:
+                del self._jobs[old.id]
+        self._changed(job)
+        self._queue.put(job)
+        return job
+
+    def call(self, name, params, run):
+        """Run run() as a job and return its result, or raise its error."""
+        job = self.submit(name, params, run)
+        job.wait()
+        if job.state == "failed":
+            raise RuntimeError(job.error)
+        return job.result
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def recent(self):
+        return [job.to_dict() for job in reversed(list(self._jobs.values()))]
+
+    def progress(self, job, message):
+        job.progress = message
+        self._changed(job)
+
+    def run(self):
+        while True:
+            job = self._queue.get()
+            job.state = "running"
+            job.started = time.time()
+            self._changed(job)
+            try:
+                job.result = job.run()
+                if job.params.get("connect"):
+                    self._await_connection(job)
+                job.state = "done"
+            except Exception as e:
+                log.warning("Network job %s %s failed: %s", job.name, job.params, e)
+                job.error = str(e)
+                job.state = "failed"
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+            job._finished.set()
+            self._changed(job)
+
+    def _await_connection(self, job):
+        """Wait for /network/status to report the connection."""
+        if self._status is None:
+            return
+        for second in range(1, CONNECT_TIMEOUT + 1):
+            self.progress(job, f"Waiting for connection ({second}/{CONNECT_TIMEOUT})")
+            status = self._status()
+            if status.get("connected"):
+                self.progress(job, "Connected")
+                return
+            time.sleep(1)
+        raise RuntimeError(f"Not connected after {CONNECT_TIMEOUT} s")
+
+
+def start(api_router):
+    """Start the worker; connect jobs check /network/status on api_router."""
+    global jobs
+    if jobs is None:
+        jobs = JobQueue(route_source(api_router, "/network/status"))
+        jobs.start()
+        try:
+            import wifi_scan
+        except ImportError:
+            pass
+        else:
+            wifi_scan.run_scan = functools.partial(jobs.call, "scan", {"scan": 1})
+    return jobs
+
+
+def queued(handler, name):
+    """Wrap a route handler so calls with parameters run as jobs.
+
+    Parameters left at their defaults do not count; a call with none
+    set (a status read), or with one of DIRECT_PARAMS, goes to the
+    handler directly.
+    """
+    defaults = {k: p.default for k, p in inspect.signature(handler).parameters.items()}
+
+    @functools.wraps(handler)
+    def submit(*args, **kwargs):
+        params = {k: v for k, v in kwargs.items() if v != defaults.get(k)}
+        if jobs is None or args or not params or any(k in params for k in DIRECT_PARAMS):
+            return handler(*args, **kwargs)
+        job = jobs.submit(name, params, functools.partial(handler, **kwargs))
+        return {"success": True, "job": job.to_dict()}
+
+    return submit
+
+
+router = APIRouter()
+
+
+@router.get("/network/jobs")
+def network_jobs():
+    if jobs is None:
+        return {"error": "Network jobs not started"}
+    return {"jobs": jobs.recent()}
+
+
+@router.get("/network/jobs/{job_id:int}")
+async def network_job(job_id: int, wait: float = 0):
+    if jobs is None:
+        return {"error": "Network jobs not started"}
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": "job not found"}
+    # Polled on the event loop; no thread is held while waiting
+    deadline = time.monotonic() + min(wait, MAX_WAIT)
+    while not job.done and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    return job.to_dict()
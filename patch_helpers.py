@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the add_*.py patch scripts.
+
+The patch scripts import this module, so keep it next to them when
+copying them to the Pi.
+"""
+
+# The routers are mounted right after this route, while theblackbox.py is
+# still filling the REST router (before the app includes it)
+ACTION_ROUTE = 'self._rest_router.add_api_route("/challenge/action"'
+
+
+def insert_after_line(content, idx, lines):
+    """Insert lines, indented like the line at idx, after that line."""
+    line_start = content.rfind("\n", 0, idx) + 1
+    line_end = content.find("\n", idx)
+    if line_end == -1:
+        line_end = len(content)
+    indent = content[line_start:idx]
+    block = "".join("\n" + indent + line for line in lines)
+    return content[:line_end] + block + content[line_end:]
+
+
+def insert_before_line(content, idx, lines):
+    """Insert lines, indented like the line at idx, before that line."""
+    line_start = content.rfind("\n", 0, idx) + 1
+    indent = content[line_start:idx]
+    block = "".join(indent + line + "\n" for line in lines)
+    return content[:line_start] + block + content[line_start:]
+
+
+def mount_after_action_route(content, lines):
+    """Insert lines after the /challenge/action route; None if it is missing."""
+    idx = content.find(ACTION_ROUTE)
+    if idx == -1:
+        return None
+    return insert_after_line(content, idx, lines)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Direct player lookup for the finish and highscore pages.
+
+The route lives on an APIRouter that theblackbox.py mounts in-process
+(see add_player_cache.py). It answers one player by uid without going
+through the generic /player/list path.
+
+Provides:
+  GET /player/{uid}   - {"uid", "player_name", "elapsed_time",
+                         "elapsed_time_str", "rank"}
+
+Records are kept in a uid-keyed LRU cache. Players written through the
+store (IndexedStore in highscore_index.py) replace their entry right
+away, deleted players drop it, and a store call that may have written
+any player empties the cache. An entry built from a Player object also
+remembers the object, and is rebuilt when its name, time or flags no
+longer match, so in-memory changes such as a hint penalty show before
+they are saved. The rank index only follows the store's writes. Only
+players that are not cached yet go through the existing
+/player/list?uid= handler, once; a uid it doesn't know is remembered
+as missing for MISS_TTL seconds, or until that player is written.
+
+The rank is looked up in the rank index on every request, because it
+moves when other players finish.
+"""
+
+import collections
+import threading
+import time
+
+from fastapi import APIRouter
+
+from event_stream import route_source
+from highscore_index import player_record
+
+# Player store and list handler, set by start()
+store = None
+cache = None
+
+
+def fingerprint(player):
+    get_flags = getattr(player, "get_flags", None)
+    return (player.get_player_name(), player.get_elapsed_time(),
+            get_flags() if get_flags is not None else None)
+
+
+class PlayerCache:
+    """uid -> player record, least recently used entries dropped."""
+
+    MAX_ENTRIES = 512
+    MISS_TTL = 2.0                  # seconds an unknown uid is answered from memory
+
+    def __init__(self, load):
+        self._load = load           # uid -> record or None
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # uid -> (record, player, fingerprint)
+        self._missing = collections.OrderedDict()   # uid -> monotonic expiry
+        self._writes = 0            # bumped by written(), so a load can't undo one
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, uid, entry):
+        self._entries[uid] = entry
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def written(self, uid, player):
+        """Listener for IndexedStore writes and deletes."""
+        with self._lock:
+            self._writes += 1
+            if uid is None:
+                self._entries.clear()
+                self._missing.clear()
+                return
+            self._missing.pop(uid, None)
+            if player is None:
+                self._entries.pop(uid, None)
+            else:
+                self._store(uid, (player_record(player), player, fingerprint(player)))
+
+    def get(self, uid):
+        with self._lock:
+            expiry = self._missing.get(uid)
+            if expiry is not None:
+                if time.monotonic() < expiry:
+                    self.hits += 1
+                    return None
+                del self._missing[uid]
+            entry = self._entries.get(uid)
+            if entry is not None:
+                record, player, stamp = entry
+                if player is not None and fingerprint(player) != stamp:
+                    entry = (player_record(player), player, fingerprint(player))
+                self._store(uid, entry)
+                self.hits += 1
+                return entry[0]
+            writes = self._writes
+        self.misses += 1
+        record = self._load(uid)
+        with self._lock:
+            # Not kept when a write came in meanwhile: the load may be stale
+            if self._writes == writes and record is not None:
+                self._store(uid, (record, None, None))
+            elif self._writes == writes:
+                self._missing[uid] = time.monotonic() + self.MISS_TTL
+                while len(self._missing) > self.MAX_ENTRIES:
+                    self._missing.popitem(last=False)
+        return record
+
+
+def start(player_store, api_router):
+    """Serve /player/{uid} from player_store, an IndexedStore."""
+    global store, cache
+    list_players = route_source(api_router, "/player/list")
+
+    def load(uid):
+        players = list_players(uid=uid).get("players") or []
+        for player in players:
+            if str(player.get("uid")) == str(uid):
+                return {k: v for k, v in player.items() if k != "rank"}
+        return None
+
+    store = player_store
+    cache = PlayerCache(load)
+    store.listeners.append(cache.written)
+
+
+router = APIRouter()
+
+
+@router.get("/player/{uid:int}")
+def player_get(uid: int):
+    if cache is None:
+        return {"error": "Player lookup not started"}
+    record = cache.get(uid)
+    if record is None:
+        return {"error": "player not found"}
+    return dict(record, rank=store.index.rank(uid))
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+SQLite player store for The BlackBox.
+
+Keeps the players in /opt/theblackbox/players.sqlite with:
+
+  - WAL journaling and synchronous=NORMAL: readers never wait for a
+    writer, and a commit is one append to the WAL instead of a rewrite
+    of the database plus journal on the SD card
+  - an index on (flags, elapsed_time), and a partial index on
+    elapsed_time for completed players, which is what the highscore
+    query filters and orders by
+  - a unique index on player_name, which login and create look up
+  - fixed SQL texts, so every query is prepared once per connection
+    and reused from sqlite3's statement cache
+
+Players are stored as the indexed columns plus all attributes of the
+Player object as JSON, and are loaded back as objects of the Player
+class theblackbox.py passes in, so no field of Player is lost. An
+attribute JSON would not give back unchanged (a tuple, set, datetime
+or a dict with non-string keys) raises TypeError instead.
+
+theblackbox.py keeps using its store as before (see add_player_store.py):
+open_store() wraps the current store object. On the first start, the
+players of the current store are copied into SQLite (the migration).
+The methods below are then served from SQLite. Methods of the old store
+this one does not have are passed on to it; after one of its write
+methods (PLAYER_WRITES, UID_WRITES) the player is written to SQLite too,
+read back from the old store when the call only had its uid. After any
+other of its methods that is not a read (get_, list_, find_, count_),
+all its players are copied again, so a write missing from those lists
+can't leave SQLite behind. Writes made here are also passed to the old
+store, synchronously, when it has a method of the same name, so reads
+that still go to it see them and it stays complete enough to go back
+to. A write therefore still costs the old store's write on top of the
+SQLite one.
+
+  list_players(flags_include=0, flags_exclude=0, order_by="uid", limit=0)
+  get_player(uid)                 get_player_by_name(player_name)
+  login(player_name, pin)         count_players()
+  add_player(player)              update_player(player)
+  delete_player(uid)
+
+bench_player_store.py measures login, create and highscore latency.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = "/opt/theblackbox/players.sqlite"
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS players (
+           uid INTEGER PRIMARY KEY,
+           player_name TEXT NOT NULL,
+           pin TEXT,
+           flags INTEGER NOT NULL DEFAULT 0,
+           elapsed_time INTEGER NOT NULL DEFAULT 0,
+           data TEXT NOT NULL)""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS players_name ON players (player_name)",
+    "CREATE INDEX IF NOT EXISTS players_flags_time ON players (flags, elapsed_time)",
+)
+
+# Created with the literal flag value, so SQLite can match it to queries
+COMPLETE_INDEX = ("CREATE INDEX IF NOT EXISTS players_complete_time "
+                  "ON players (elapsed_time, uid) WHERE flags & {flag} = {flag}")
+
+ORDER_COLUMNS = {"uid": "uid", "elapsed_time": "elapsed_time, uid",
+                 "player_name": "player_name"}
+
+SELECT_UID = "SELECT data FROM players WHERE uid = ?"
+SELECT_NAME = "SELECT data FROM players WHERE player_name = ?"
+SELECT_LOGIN = "SELECT data FROM players WHERE player_name = ? AND pin = ?"
+SELECT_COUNT = "SELECT COUNT(*) FROM players"
+SELECT_MAX_UID = "SELECT MAX(uid) FROM players"
+INSERT = ("INSERT INTO players (uid, player_name, pin, flags, elapsed_time, data) "
+          "VALUES (?, ?, ?, ?, ?, ?)")
+# Not INSERT OR REPLACE: that would delete another player with the name
+UPSERT = INSERT + (" ON CONFLICT (uid) DO UPDATE SET player_name = excluded.player_name, "
+                   "pin = excluded.pin, flags = excluded.flags, "
+                   "elapsed_time = excluded.elapsed_time, data = excluded.data")
+DELETE = "DELETE FROM players WHERE uid = ?"
+
+
+class DuplicatePlayerName(ValueError):
+    pass
+
+
+def _field(player, name):
+    """Player value by getter, or by attribute when there is no getter."""
+    getter = getattr(player, "get_" + name, None)
+    if getter is not None:
+        return getter()
+    state = vars(player)
+    for key in (name, "_" + name):
+        if key in state:
+            return state[key]
+    return None
+
+
+def _set_field(player, name, value):
+    """Set a Player value by setter, or by attribute when there is no setter."""
+    setter = getattr(player, "set_" + name, None)
+    if setter is not None:
+        setter(value)
+    else:
+        player.__dict__["_" + name if "_" + name in vars(player) else name] = value
+
+
+def _check_json(value, name):
+    """Raise TypeError unless value comes back from JSON as it went in.
+
+    A tuple would load as a list and a datetime or set would not encode,
+    so such Player attributes are refused instead of silently changed.
+    """
+    if value is None or type(value) in (str, int, float, bool):
+        return
+    if type(value) is list:
+        for n, item in enumerate(value):
+            _check_json(item, f"{name}[{n}]")
+    elif type(value) is dict:
+        for key, item in value.items():
+            if type(key) is not str:
+                raise TypeError(f"Player attribute {name} has a {type(key).__name__} key, "
+                                "which JSON would turn into a string")
+            _check_json(item, f"{name}[{key!r}]")
+    else:
+        raise TypeError(f"Player attribute {name} is a {type(value).__name__}, "
+                        "which does not round-trip through JSON")
+
+
+class SqlitePlayerStore:
+    """Players in SQLite (WAL); one connection per thread."""
+
+    # Write methods of the old store this one does not have, by what they
+    # are called with: a Player object, or the uid of the player written
+    PLAYER_WRITES = ("save_player",)
+    UID_WRITES = ("set_flag", "clear_flag", "set_flags", "set_elapsed_time")
+    READ_PREFIXES = ("get_", "list_", "find_", "count_")
+
+    def __init__(self, path, player_class, legacy=None):
+        self.path = path
+        self._player_class = player_class
+        self._legacy = legacy
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flag_complete = getattr(player_class, "FLAGS_CHALLENGE_COMPLETE", 0)
+        self._unknown = set()       # names of unknown old store methods already logged
+
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+            if self._flag_complete:
+                db.execute(COMPLETE_INDEX.format(flag=int(self._flag_complete)))
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                                 cached_statements=64)
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=OFF")
+            self._local.db = db
+        return db
+
+    # ---- Player <-> row ----
+    def _row(self, player):
+        for name, value in vars(player).items():
+            _check_json(value, name)
+        data = json.dumps(vars(player))
+        return (_field(player, "uid"), _field(player, "player_name"),
+                None if _field(player, "pin") is None else str(_field(player, "pin")),
+                _field(player, "flags") or 0, _field(player, "elapsed_time") or 0, data)
+
+    def _player(self, data):
+        player = self._player_class.__new__(self._player_class)
+        player.__dict__.update(json.loads(data))
+        return player
+
+    def _one(self, sql, args):
+        row = self._db().execute(sql, args).fetchone()
+        return None if row is None else self._player(row[0])
+
+    # ---- Reads ----
+    def list_players(self, flags_include=0, flags_exclude=0, order_by="uid", limit=0):
+        """Players as an ordered dict of uid -> Player."""
+        where, args = [], []
+        if flags_include and flags_include == self._flag_complete:
+            # Literal, so the partial index for completed players is used
+            where.append(f"flags & {int(flags_include)} = {int(flags_include)}")
+        elif flags_include:
+            where.append("flags & ? = ?")
+            args += [flags_include, flags_include]
+        if flags_exclude:
+            where.append("flags & ? = 0")
+            args.append(flags_exclude)
+        sql = "SELECT uid, data FROM players"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ORDER_COLUMNS.get(order_by, "uid")
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return {uid: self._player(data) for uid, data in self._db().execute(sql, args)}
+
+    def get_player(self, uid):
+        return self._one(SELECT_UID, (uid,))
+
+    def get_player_by_name(self, player_name):
+        return self._one(SELECT_NAME, (player_name,))
+
+    def login(self, player_name, pin):
+        """The player with this name and PIN, or None."""
+        return self._one(SELECT_LOGIN, (player_name, str(pin)))
+
+    def count_players(self):
+        return self._db().execute(SELECT_COUNT).fetchone()[0]
+
+    # ---- Writes ----
+    def _forward(self, name, *args):
+        method = getattr(self._legacy, name, None) if self._legacy is not None else None
+        return method(*args) if method is not None else None
+
+    def add_player(self, player):
+        """Insert a new player; returns its uid.
+
+        The old store, when it has add_player(), still hands out the uid;
+        otherwise it is the next free one.
+        """
+        if self.get_player_by_name(_field(player, "player_name")) is not None:
+            raise DuplicatePlayerName(f"Player name already exists: {_field(player, 'player_name')}")
+        self._row(player)           # TypeError before the old store has the player
+        uid = self._forward("add_player", player)
+        db = self._db()
+        with self._write_lock, db:
+            if _field(player, "uid") is None:
+                if uid is None:
+                    uid = (db.execute(SELECT_MAX_UID).fetchone()[0] or 0) + 1
+                _set_field(player, "uid", uid)
+            row = self._row(player)
+            try:
+                db.execute(INSERT, row)
+            except sqlite3.IntegrityError as e:
+                raise DuplicatePlayerName(f"Player name already exists: {row[1]}") from e
+        return row[0]
+
+    def update_player(self, player):
+        self._write(player)
+        self._forward("update_player", player)
+
+    def _write(self, player):
+        db = self._db()
+        with self._write_lock, db:
+            db.execute(UPSERT, self._row(player))
+
+    def delete_player(self, uid):
+        db = self._db()
+        with self._write_lock, db:
+            db.execute(DELETE, (uid,))
+        self._forward("delete_player", uid)
+
+    def import_players(self, players):
+        """Bulk insert (migration, benchmarks) in one transaction.
+
+        A name that is already taken gets the uid appended, so no player
+        is lost; returns the renamed uids.
+        """
+        renamed = []
+        db = self._db()
+        with self._write_lock, db:
+            for player in players:
+                row = self._row(player)
+                try:
+                    db.execute(UPSERT, row)
+                except sqlite3.IntegrityError:
+                    _set_field(player, "player_name", f"{row[1]} ({row[0]})")
+                    db.execute(UPSERT, self._row(player))
+                    renamed.append(row[0])
+        return renamed
+
+    # ---- Old store passthrough ----
+    def __getattr__(self, name):
+        if self._legacy is None:
+            raise AttributeError(name)
+        attr = getattr(self._legacy, name)
+        if name in self.PLAYER_WRITES:
+            def call(player, *args, **kwargs):
+                result = attr(player, *args, **kwargs)
+                self._write(player)
+                return result
+        elif name in self.UID_WRITES:
+            def call(uid, *args, **kwargs):
+                result = attr(uid, *args, **kwargs)
+                player = self._legacy.get_player(uid)
+                if player is not None:
+                    self._write(player)
+                return result
+        elif callable(attr) and not name.startswith(self.READ_PREFIXES):
+            def call(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                if name not in self._unknown:
+                    self._unknown.add(name)
+                    log.warning("%s() of the old store is not a known method, "
+                                "copying all its players after each call", name)
+                self.import_players(self._legacy.list_players().values())
+                return result
+        else:
+            return attr
+        return call
+
+
+def migrate(legacy, store):
+    """Copy every player of the old store into an empty SQLite store."""
+    if store.count_players():
+        return 0
+    players = list(legacy.list_players().values())
+    renamed = store.import_players(players)
+    log.info("Migrated %d players to %s", len(players), store.path)
+    if renamed:
+        log.warning("Duplicate player names renamed to 'name (uid)' for uids %s", renamed)
+    return len(players)
+
+
+def open_store(legacy, player_class, path=DEFAULT_PATH):
+    """SQLite store in front of legacy, migrated on the first start."""
+    store = SqlitePlayerStore(path, player_class, legacy)
+    if legacy is not None:
+        migrate(legacy, store)
+    return store
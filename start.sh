@@ -80,7 +80,5 @@ plymouth --quit 2>/dev/null
 echo "Startup complete"
 
 # Keep script running - wait for Python process
-
-# Start audio stream after everything is up
-(sleep 20 && sudo systemctl start blackbox-audio) &
+# (live audio is served by theblackbox.py at /audio/live)
 wait
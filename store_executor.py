@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Bounded, thread-pooled access to the player store.
+
+theblackbox.py's REST handlers (player/login, player/create,
+player/list, challenge/hint) call the player store directly, so a slow
+SD-card fsync in one of them holds up whatever else touches the store
+in the meantime. start() wraps the store (see add_store_executor.py) in
+a PooledStore that runs every call on one of two lanes:
+
+  read   - READERS threads; get_/list_/find_/count_/load_, and login()
+           of SqlitePlayerStore, which is a single SELECT
+  write  - one thread, so writes are serialized in submission order
+           and reads never queue behind a write
+
+Any other method, login() of the old store included (it may record the
+login), counts as a write.
+
+Each lane takes at most MAX_PENDING calls, queued and running; a caller
+beyond that waits up to SUBMIT_TIMEOUT for a slot and then gets
+StoreBusy instead of piling up server threads. The caller still waits
+for its own result, so handlers keep their return values and errors.
+Handlers wrapped in busy_as_503() (player/login, player/create and
+challenge/hint, see add_store_executor.py) answer StoreBusy with a 503
+{"success": false, "error": ...} instead of a 500.
+
+SqlitePlayerStore (player_store.py) opens one connection per thread, so
+the lane threads are its connection pool: READERS read connections and
+one write connection, however many server threads there are.
+
+Provides:
+  GET /store/stats    - {"read": {...}, "write": {...}} with depth,
+                        max_depth, calls, errors and wait/run times (ms)
+"""
+
+import collections
+import concurrent.futures
+import functools
+import inspect
+import threading
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from player_store import SqlitePlayerStore
+
+READERS = 2
+MAX_PENDING = 32                    # per lane, queued + running
+SUBMIT_TIMEOUT = 10.0               # seconds to wait for a free slot
+SAMPLES = 256                       # recent calls the times are taken over
+
+# PooledStore set by start()
+pooled = None
+
+
+class StoreBusy(RuntimeError):
+    pass
+
+
+def _summary(times):
+    """avg/p95/max in ms of sorted durations in seconds."""
+    if not times:
+        return {"avg": 0, "p95": 0, "max": 0}
+    return {"avg": round(sum(times) / len(times) * 1000, 2),
+            "p95": round(times[min(int(len(times) * 0.95), len(times) - 1)] * 1000, 2),
+            "max": round(times[-1] * 1000, 2)}
+
+
+class Lane:
+    """Bounded executor with queue depth and wait time statistics."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="store-" + name)
+        self._slots = threading.BoundedSemaphore(MAX_PENDING)
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._max_depth = 0
+        self._calls = 0
+        self._errors = 0
+        self._waits = collections.deque(maxlen=SAMPLES)
+        self._runs = collections.deque(maxlen=SAMPLES)
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn on this lane and return its result (or raise its error)."""
+        if not self._slots.acquire(timeout=SUBMIT_TIMEOUT):
+            raise StoreBusy(f"Player store {self.name} queue is full")
+        queued = time.monotonic()
+        with self._lock:
+            self._depth += 1
+            self._max_depth = max(self._max_depth, self._depth)
+        try:
+            return self._executor.submit(self._run, queued, fn, args, kwargs).result()
+        finally:
+            with self._lock:
+                self._depth -= 1
+            self._slots.release()
+
+    def _run(self, queued, fn, args, kwargs):
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls += 1
+                self._waits.append(started - queued)
+                self._runs.append(time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            waits, runs = sorted(self._waits), sorted(self._runs)
+            stats = {"workers": self.workers, "depth": self._depth,
+                     "max_depth": self._max_depth, "calls": self._calls,
+                     "errors": self._errors}
+        stats["wait_ms"] = _summary(waits)
+        stats["run_ms"] = _summary(runs)
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class PooledStore:
+    """Runs every call of store on the read or the write lane."""
+
+    # Methods that only read; everything else goes to the writer
+    READ_PREFIXES = ("get_", "list_", "find_", "count_", "load_")
+
+    def __init__(self, store, readers=READERS):
+        self._store = store
+        self._reads = ("login",) if isinstance(store, SqlitePlayerStore) else ()
+        self.read = Lane("read", readers)
+        self.write = Lane("write", 1)
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if not callable(attr):
+            return attr
+        if name.startswith(self.READ_PREFIXES) or name in self._reads:
+            lane = self.read
+        else:
+            lane = self.write
+
+        def call(*args, **kwargs):
+            return lane.call(attr, *args, **kwargs)
+
+        return call
+
+    def stats(self):
+        return {"read": self.read.stats(), "write": self.write.stats()}
+
+    def shutdown(self):
+        self.write.shutdown()
+        self.read.shutdown()
+
+
+def busy_as_503(handler):
+    """Wrap a route handler so StoreBusy is answered with a 503."""
+    def busy(e):
+        return JSONResponse({"success": False, "error": str(e)}, status_code=503)
+
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def handle(*args, **kwargs):
+            try:
+                return await handler(*args, **kwargs)
+            except StoreBusy as e:
+                return busy(e)
+    else:
+        @functools.wraps(handler)
+        def handle(*args, **kwargs):
+            try:
+                return handler(*args, **kwargs)
+            except StoreBusy as e:
+                return busy(e)
+    return handle
+
+
+def start(player_store, readers=READERS):
+    """Wrap player_store in a PooledStore and serve its statistics."""
+    global pooled
+    pooled = PooledStore(player_store, readers)
+    return pooled
+
+
+router = APIRouter()
+
+
+@router.get("/store/stats")
+def store_stats():
+    if pooled is None:
+        return {"error": "Store executor not started"}
+    return pooled.stats()
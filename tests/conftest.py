@@ -0,0 +1,34 @@
+import os
+import sys
+
+# The modules are deployed side by side in /opt/theblackbox, not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GPIO_BACKEND", "sim")
+
+
+# The parts of theblackbox.py's Player the highscore and player lookup
+# tests need
+COMPLETE = 4
+
+
+class Player:
+    def __init__(self, uid, name, elapsed_time, flags=COMPLETE):
+        self.uid = uid
+        self.name = name
+        self.elapsed_time = elapsed_time
+        self.flags = flags
+
+    def get_uid(self):
+        return self.uid
+
+    def get_player_name(self):
+        return self.name
+
+    def get_elapsed_time(self):
+        return self.elapsed_time
+
+    def get_elapsed_time_str(self):
+        return f"{self.elapsed_time}s"
+
+    def get_flags(self):
+        return self.flags
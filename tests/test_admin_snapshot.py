@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admin_snapshot
+from admin_snapshot import SnapshotState
+
+
+@pytest.fixture
+def sections():
+    return {"banner": {"player": "a"}, "network": {"connected": True}}
+
+
+@pytest.fixture
+def state(sections):
+    return SnapshotState({name: (lambda name=name: sections[name]) for name in sections})
+
+
+def test_version_moves_only_when_a_section_changes(state, sections):
+    state.refresh()
+    version, full = state.since(None)
+    assert full == sections
+
+    state.invalidate()
+    state.refresh()
+    assert state.since(version) == (version, {})
+
+    sections["banner"] = {"player": "b"}
+    state.invalidate("banner")
+    state.refresh()
+    assert state.since(version) == (version + 1, {"banner": {"player": "b"}})
+    assert state.samples == 5
+
+
+def test_sources_are_called_without_the_lock():
+    entered, release = threading.Event(), threading.Event()
+
+    def slow():
+        entered.set()
+        release.wait(5)
+        return {}
+
+    state = SnapshotState({"slow": slow})
+    sampler = threading.Thread(target=state.refresh)
+    sampler.start()
+    assert entered.wait(5)
+    try:
+        # A second refresh neither waits for nor repeats the running sample
+        state.refresh()
+        assert state.since(None)[1] == {}
+        assert state.samples == 1
+    finally:
+        release.set()
+        sampler.join(5)
+    assert state.since(None)[1] == {"slow": {}}
+
+
+@pytest.fixture
+def client(monkeypatch, state):
+    monkeypatch.setattr(admin_snapshot, "state", state)
+    app = FastAPI()
+    app.include_router(admin_snapshot.router)
+    return TestClient(app)
+
+
+def test_conditional_get(client, sections):
+    response = client.get("/admin/snapshot")
+    body, etag = response.json(), response.headers["etag"]
+    assert not body["delta"] and body["sections"] == sections
+    assert client.get("/admin/snapshot", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/admin/snapshot?since={body['version']}").status_code == 304
+
+    # A delta and the full state never share an ETag
+    sections["banner"] = {"player": "b"}
+    delta = client.get(f"/admin/snapshot?since={body['version']}&fresh=1")
+    assert delta.json()["delta"] and list(delta.json()["sections"]) == ["banner"]
+    full = client.get("/admin/snapshot")
+    assert full.headers["etag"] != delta.headers["etag"]
+    assert client.get("/admin/snapshot", headers={"If-None-Match": delta.headers["etag"]}
+                      ).json()["sections"] == sections
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import audio_capture
+from audio_capture import AudioCapture, PcmRing
+
+
+def test_ring_wraps_and_skips_overwritten_audio():
+    ring = PcmRing(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghij")
+    assert ring.oldest() == 2 and ring.available() == 8
+    assert ring.read(0, 100) == (b"cdefghij", 10)
+    assert ring.read(7, 2) == (b"hi", 9)
+
+    ring.write(b"0123456789ab")
+    assert ring.read(0, 100) == (b"456789ab", 22)
+
+
+def test_reset_forgets_the_buffered_audio():
+    ring = PcmRing(8)
+    ring.write(b"abcd")
+    ring.reset()
+    assert ring.available() == 0
+    assert ring.read(0, 100) == (b"", 4)
+    ring.write(b"ef")
+    assert ring.read(0, 100) == (b"ef", 6)
+
+
+class IdleCapture(AudioCapture):
+    """No arecord: the ring holds only what a test writes."""
+
+    def want(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(audio_capture, "capture", IdleCapture(rate=1000))
+    monkeypatch.setattr(audio_capture, "STALL_TIMEOUT", 0.2)
+    app = FastAPI()
+    app.include_router(audio_capture.router)
+    return TestClient(app)
+
+
+def test_clip_without_audio_is_a_503(client):
+    response = client.get("/audio/clip?seconds=1")
+    assert response.status_code == 503
+    assert response.json()["error"] == "No audio captured"
+
+
+def test_clip_has_the_announced_length_when_capture_stalls(client):
+    audio_capture.capture.ring.write(b"\x01\x02" * 300)
+    response = client.get("/audio/clip?seconds=2")
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == 44 + 4000
+    body = response.content
+    assert len(body) == 44 + 4000
+    assert body[44:644] == b"\x01\x02" * 300
+    assert body[644:] == bytes(3400)
+
+
+def test_live_without_audio_is_a_503(client):
+    assert client.get("/audio/live").status_code == 503
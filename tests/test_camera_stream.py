@@ -0,0 +1,110 @@
+import base64
+import logging
+import threading
+import time
+
+import pytest
+
+import camera_stream
+from camera_stream import Camera, PhotoRouteSource, split_jpegs
+
+FRAME_A = b"\xff\xd8" + b"a" * 10 + b"\xff\xd9"
+FRAME_B = b"\xff\xd8" + b"b\xff" * 5 + b"\xff\xd9"
+
+
+def test_frames_split_across_reads():
+    stream = FRAME_A + FRAME_B
+    chunks = [stream[:1], stream[1:7], stream[7:15], stream[15:]]
+    assert list(split_jpegs(chunks)) == [FRAME_A, FRAME_B]
+
+
+def test_garbage_before_and_between_frames_is_skipped():
+    chunks = [b"noise\xff", b"\xd8" + FRAME_A[2:] + b"junk", FRAME_B[:3], FRAME_B[3:] + b"\xff"]
+    assert list(split_jpegs(chunks)) == [FRAME_A, FRAME_B]
+
+
+class Source:
+    """Yields the frames a test puts in, and records when it is closed."""
+
+    name = "test"
+
+    def __init__(self):
+        self.queue = []
+        self.ready = threading.Event()
+        self.closed = threading.Event()
+
+    def put(self, frame):
+        self.queue.append(frame)
+        self.ready.set()
+
+    def frames(self):
+        try:
+            while True:
+                self.ready.wait(0.01)
+                self.ready.clear()
+                while self.queue:
+                    yield self.queue.pop(0)
+        finally:
+            self.closed.set()
+
+
+@pytest.fixture
+def source(monkeypatch):
+    monkeypatch.setattr(camera_stream, "IDLE_AFTER", 0.2)
+    monkeypatch.setattr(camera_stream, "FRAME_MAX_AGE", 0.2)
+    return Source()
+
+
+def test_latest_waits_for_a_frame_up_to_the_timeout(source):
+    camera = Camera(source)
+    started = time.monotonic()
+    assert camera.latest(timeout=0.1) is None
+    assert time.monotonic() - started >= 0.1
+
+    threading.Timer(0.05, source.put, [FRAME_A]).start()
+    assert camera.latest(timeout=2) == FRAME_A
+
+
+def test_latest_skips_frames_older_than_the_max_age(source):
+    camera = Camera(source)
+    source.put(FRAME_A)
+    assert camera.latest(timeout=2) == FRAME_A
+    time.sleep(0.25)
+    assert camera.latest(timeout=0.05) is None
+    source.put(FRAME_B)
+    assert camera.latest(timeout=2) == FRAME_B
+
+
+def test_capture_stops_when_idle_and_restarts_on_demand(source):
+    camera = Camera(source)
+    source.put(FRAME_A)
+    assert camera.latest(timeout=2) == FRAME_A
+    # The source only notices idleness with a frame, as a camera sends them
+    deadline = time.monotonic() + 5
+    while camera._thread is not None and time.monotonic() < deadline:
+        source.put(FRAME_A)
+        time.sleep(0.02)
+    assert camera._thread is None and source.closed.is_set()
+
+    source.queue.clear()
+    time.sleep(0.25)                # the last frame is too old now
+    source.put(FRAME_B)
+    assert camera.latest(timeout=2) == FRAME_B
+    assert camera._thread is not None
+
+
+def test_photo_source_is_capped_and_warns_when_slow(monkeypatch, caplog):
+    photo = {"success": True, "photo": base64.b64encode(FRAME_A).decode()}
+    source = PhotoRouteSource(lambda: photo, 10)
+    assert source.interval == 1.0 / camera_stream.PHOTO_MAX_FPS
+
+    clock = iter([0.0, 0.1, 0.1, 1.0, 2.0, 2.0])
+    monkeypatch.setattr(camera_stream, "time", type("Time", (), {
+        "monotonic": staticmethod(lambda: next(clock)), "sleep": staticmethod(lambda s: None)}))
+    frames = source.frames()
+    with caplog.at_level(logging.WARNING, logger="camera_stream"):
+        assert next(frames) == FRAME_A and not source.slow
+        assert next(frames) == FRAME_A and source.slow
+    frames.close()
+    assert [r.getMessage() for r in caplog.records] == [
+        "/camera/photo took 1.00s, camera runs at 1.0 fps instead of 2.0"]
@@ -0,0 +1,67 @@
+import asyncio
+import inspect
+
+import pytest
+
+import event_stream
+from event_stream import EventHub
+
+
+def test_publish_changes_only():
+    hub = EventHub()
+    assert hub.publish("banner", {"player": "a"}) == 1
+    assert hub.publish("banner", {"player": "a"}) is None
+    assert hub.publish("banner", {"player": "a"}, changes_only=False) == 2
+
+
+def test_subscribe_replays_missed_events():
+    hub = EventHub()
+    for n in range(5):
+        hub.publish("challenge", {"index": n})
+    _, backlog = hub.subscribe(last_id=3)
+    assert [e["id"] for e in backlog] == [4, 5]
+
+    # Unknown or too old: a snapshot of the full state
+    _, backlog = hub.subscribe()
+    assert backlog[0]["event"] == "snapshot"
+    assert backlog[0]["data"]["challenge"] == {"index": 4}
+
+
+class CountingWatcher:
+    pokes = 0
+
+    def poke(self):
+        self.pokes += 1
+
+
+@pytest.fixture
+def watcher(monkeypatch):
+    counting = CountingWatcher()
+    monkeypatch.setattr(event_stream, "watcher", counting)
+    return counting
+
+
+def test_poking_sync_and_async_handlers(watcher):
+    def login(name: str = ""):
+        return {"player": name}
+
+    async def logout():
+        return {"success": True}
+
+    assert event_stream.poking(login)(name="x") == {"player": "x"}
+    assert asyncio.run(event_stream.poking(logout)()) == {"success": True}
+    assert watcher.pokes == 2
+
+
+def test_poking_keeps_the_signature():
+    def login(name: str = "", password: str = ""):
+        pass
+
+    assert list(inspect.signature(event_stream.poking(login)).parameters) == ["name", "password"]
+
+
+def test_tip_survives_restart(tmp_path):
+    path = str(tmp_path / "tip.json")
+    assert event_stream.load_tip(path) is None
+    event_stream.save_tip({"tip": "Look up", "timestamp": 1.0}, path)
+    assert event_stream.load_tip(path) == {"tip": "Look up", "timestamp": 1.0}
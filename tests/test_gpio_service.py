@@ -0,0 +1,134 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+import gpio_backend
+import gpio_service
+
+
+@pytest.fixture
+def service():
+    gpio_service.start()
+    yield gpio_service
+    gpio_service.shutdown()
+    gpio_service.sequences.clear()
+
+
+def test_sequence_cancelled_before_first_run(service):
+    async def scenario():
+        request = service.SequenceRequest(
+            steps=[service.PinStep(pin=17, state=1, delay_ms=1000)], repeat=0)
+        # The second request replaces the first before its task ever ran
+        first = await service.gpio_sequence(request)
+        second = await service.gpio_sequence(request)
+        await asyncio.wait([service.sequences[first["id"]]["task"]])
+        assert service.sequences[first["id"]]["status"] == "cancelled"
+        assert service.sequences[first["id"]]["finished"] is not None
+
+        await service.gpio_sequence_cancel(second["id"])
+        assert service.sequences[second["id"]]["status"] == "cancelled"
+
+    asyncio.run(scenario())
+
+
+class PwmBackend(gpio_backend.SimulatedBackend):
+    """Simulated pins with a PWM generator, like RPi.GPIO's."""
+
+    supports_pwm = True
+
+    def __init__(self):
+        super().__init__()
+        self.duty = {}
+
+    def start_pwm(self, pin, freq, duty):
+        self.setup_output(pin)
+        self.duty[pin] = duty
+
+    def set_pwm(self, pin, freq, duty):
+        self.duty[pin] = duty
+
+    def stop_pwm(self, pin):
+        self.duty.pop(pin, None)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_backend_pwm_without_fade_then_fade():
+    backend = PwmBackend()
+    engine = gpio_service.PwmEngine(backend)
+    engine.start()
+    try:
+        engine.set(17, 40.0, 100, "backend")
+        assert backend.duty[17] == 40.0
+        time.sleep(0.05)
+        assert engine.is_alive()
+
+        engine.set(17, 80.0, 100, "backend", fade_ms=100)
+        assert wait_for(lambda: not engine.status()[17]["fading"])
+        assert backend.duty[17] == 80.0
+
+        # Dimming again after the fade finished
+        engine.set(17, 10.0, 100, "backend")
+        time.sleep(0.05)
+        assert engine.is_alive()
+        assert backend.duty[17] == 10.0
+    finally:
+        engine.stop_thread()
+
+
+def test_thread_pwm_restores_switch_interval():
+    before = sys.getswitchinterval()
+    engine = gpio_service.PwmEngine(gpio_backend.SimulatedBackend())
+    engine.start()
+    try:
+        engine.set(17, 50.0, 100, "thread")
+        engine.set(18, 50.0, 100, "thread")
+        assert sys.getswitchinterval() < before
+        engine.stop(17)
+        assert sys.getswitchinterval() < before
+        engine.stop(18)
+        assert sys.getswitchinterval() == before
+    finally:
+        engine.stop_thread()
+
+
+def test_stop_thread_stops_channels_and_restores_switch_interval():
+    before = sys.getswitchinterval()
+    backend = PwmBackend()
+    engine = gpio_service.PwmEngine(backend)
+    engine.start()
+    engine.set(17, 50.0, 100, "thread")
+    engine.set(18, 50.0, 100, "backend")
+    engine.stop_thread()
+    assert sys.getswitchinterval() == before
+    assert engine.status() == {}
+    assert backend.duty == {}
+
+
+def test_shutdown_restores_switch_interval(service):
+    before = sys.getswitchinterval()
+    asyncio.run(service.gpio_pwm(pin=17, duty=50, freq=100, engine="thread"))
+    assert sys.getswitchinterval() < before
+    service.shutdown()
+    assert sys.getswitchinterval() == before
+    assert service.pin_table.snapshot() == {}
+
+
+def test_released_input_is_unconfigured(service):
+    async def scenario():
+        await service.gpio_input(pin=27)
+        assert (await service.gpio_state_pin(27))["mode"] == "in"
+        await service.gpio_input_release(27)
+        assert (await service.gpio_state_pin(27))["mode"] is None
+        assert (await service.gpio_input_release(27))["error"] == "Pin is not an input"
+
+    asyncio.run(scenario())
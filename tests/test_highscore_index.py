@@ -0,0 +1,171 @@
+import random
+
+from conftest import COMPLETE, Player
+from highscore_index import (IndexedStore, RankIndex, RankList, list_page, player_list,
+                             render_html)
+
+
+class Store:
+    """The old store's interface, in memory."""
+
+    def __init__(self, players=()):
+        self.players = {p.uid: p for p in players}
+        self.lists = 0
+
+    def list_players(self, flags_include=0, order_by="uid"):
+        self.lists += 1
+        return {uid: p for uid, p in self.players.items() if p.flags & flags_include}
+
+    def get_player(self, uid):
+        return self.players.get(uid)
+
+    def add_player(self, player):
+        self.players[player.uid] = player
+        return player.uid
+
+    def update_player(self, player):
+        self.players[player.uid] = player
+
+    def set_flag(self, uid, flag):
+        self.players[uid].flags |= flag
+
+    def delete_player(self, uid):
+        del self.players[uid]
+
+
+def test_rank_list_matches_sorted_list():
+    rng = random.Random(7)
+    keys = sorted(rng.sample(range(10000), 300))
+    ranks = RankList.from_sorted(keys)
+    for key in rng.sample(range(10000), 200):
+        if key in keys:
+            keys.remove(key)
+            ranks.remove(key)
+        else:
+            keys.append(key)
+            keys.sort()
+            ranks.insert(key)
+    assert len(ranks) == len(keys)
+    assert list(ranks.iter_from(0)) == keys
+    for position in rng.sample(range(len(keys)), 50):
+        assert ranks.select(position) == keys[position]
+        assert ranks.rank(keys[position]) == position
+    assert list(ranks.iter_from(len(keys) - 3)) == keys[-3:]
+
+
+def test_rank_index_ties_and_window():
+    index = RankIndex()
+    index.load([Player(uid, f"p{uid}", 100 - uid % 3) for uid in range(1, 11)])
+    order = [row["uid"] for row in index.page()]
+    assert order == sorted(order, key=lambda uid: (100 - uid % 3, uid))
+
+    index.update(Player(5, "p5", 1))
+    assert index.rank(5) == 1
+    assert [row["rank"] for row in index.window(order[-1], 2, 2)] == [8, 9, 10]
+
+    index.discard(5)
+    assert 5 not in index and len(index) == 9
+
+
+def test_list_page_adds_window_after_gap():
+    index = RankIndex()
+    index.load([Player(uid, f"p{uid}", uid) for uid in range(1, 51)])
+    rows = list_page(index, limit=3, around_uid=40, window=1)
+    assert [row["rank"] for row in rows] == [1, 2, 3, 39, 40, 41]
+
+
+def ranked(count):
+    index = RankIndex()
+    index.load([Player(uid, f"p{uid}", uid) for uid in range(1, count + 1)])
+    return index
+
+
+def test_list_page_limits_and_offsets():
+    index = ranked(150)
+    assert len(list_page(index)) == 20
+    assert len(list_page(index, limit=1000)) == 100
+    assert [row["rank"] for row in list_page(index, offset=10, limit=3)] == [11, 12, 13]
+    assert list_page(index, offset=-5, limit=1)[0]["rank"] == 1
+    assert list_page(index, offset=150) == []
+    assert list_page(index, offset=500, around_uid=3, window=1) == \
+        index.window(3, 1, 1)
+
+
+def test_list_page_window_around_a_uid():
+    index = ranked(50)
+    # On the page already: no window rows
+    assert [row["rank"] for row in list_page(index, limit=5, around_uid=3)] == [1, 2, 3, 4, 5]
+    # Overlapping the page: no duplicates
+    rows = list_page(index, limit=5, around_uid=6, window=2)
+    assert [row["rank"] for row in rows] == [1, 2, 3, 4, 5, 6, 7, 8]
+    # The window is capped, and empty for a player without a rank
+    assert len(list_page(index, limit=1, around_uid=30, window=50)) == 1 + 21
+    assert [row["rank"] for row in list_page(index, limit=2, around_uid=99)] == [1, 2]
+    assert [row["rank"] for row in list_page(index, limit=2, around_uid=50, window=-1)] == \
+        [1, 2, 50]
+
+
+def test_player_list_fields_and_compact_rows():
+    index = ranked(30)
+    response = player_list(index, limit=2, around_uid=10, window=0, fields="rank,player_name")
+    assert response == {"total": 30, "offset": 0, "rank": 10, "players": [
+        {"player_name": "p1", "rank": 1}, {"player_name": "p2", "rank": 2},
+        {"player_name": "p10", "rank": 10}]}
+
+    response = player_list(index, offset=40, around_uid=99, fields="bogus", compact=1)
+    assert response["rank"] is None and response["rows"] == []
+    assert response["fields"] == ["uid", "player_name", "elapsed_time",
+                                  "elapsed_time_str", "rank"]
+
+
+def test_player_list_html_marks_gaps_and_the_player():
+    index = ranked(30)
+    index.update(Player(31, "<b>", 100))
+    rows = list_page(index, limit=2, around_uid=31, window=0)
+    items = render_html(rows, highlight_uid=31).split("\n")
+    assert len(items) == 4
+    assert "....." in items[2] and "....." not in items[1]
+    assert "&lt;b&gt;" in items[3] and "<b>" not in items[3]
+    assert items[3].count("window-link-user") == 3
+    assert "window-link-user" not in items[0]
+    assert player_list(index, limit=2, around_uid=31, window=0,
+                       format="html").body.decode() == "\n".join(items)
+
+
+def test_indexed_store_follows_writes_without_reloading():
+    store = Store([Player(1, "a", 50), Player(2, "b", 40, flags=0)])
+    indexed = IndexedStore(store, COMPLETE)
+    written = []
+    indexed.listeners.append(lambda uid, player: written.append(uid))
+    assert [row["uid"] for row in indexed.index.page()] == [1]
+
+    indexed.add_player(Player(3, "c", 30))
+    indexed.set_flag(2, COMPLETE)
+    indexed.update_player(Player(1, "a", 20))
+    assert [row["uid"] for row in indexed.index.page()] == [1, 3, 2]
+
+    indexed.delete_player(3)
+    assert [row["uid"] for row in indexed.index.page()] == [1, 2]
+    assert written == [3, 2, 1, 3]
+    assert store.lists == 1
+
+
+def test_indexed_store_passes_reads_through():
+    store = Store([Player(1, "a", 50)])
+    indexed = IndexedStore(store, COMPLETE)
+    assert indexed.get_player(1) is store.players[1]
+    assert indexed.list_players(COMPLETE) == store.players
+
+
+def test_indexed_store_reloads_after_unknown_writes():
+    store = Store([Player(1, "a", 50), Player(2, "b", 40, flags=0)])
+    store.finish = lambda uid: store.set_flag(uid, COMPLETE)
+    indexed = IndexedStore(store, COMPLETE)
+    written = []
+    indexed.listeners.append(lambda uid, player: written.append((uid, player)))
+    assert [row["uid"] for row in indexed.index.page()] == [1]
+
+    indexed.finish(2)
+    assert [row["uid"] for row in indexed.index.page()] == [2, 1]
+    assert written == [(None, None)]
+    assert store.lists == 2
@@ -0,0 +1,87 @@
+import logging
+import sqlite3
+import time
+
+import pytest
+
+import hint_log
+from hint_log import HintLog
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "hints.sqlite")
+
+
+@pytest.fixture
+def opened(path):
+    logs = []
+
+    def open_log():
+        logs.append(HintLog(path))
+        return logs[-1]
+
+    yield open_log
+    for hints in logs:
+        hints.close()
+
+
+def stored(path):
+    db = sqlite3.connect(path)
+    try:
+        return sorted(db.execute(hint_log.SELECT_ALL).fetchall())
+    finally:
+        db.close()
+
+
+def test_rows_are_written_in_batches(monkeypatch, opened, path):
+    monkeypatch.setattr(hint_log, "BATCH_SIZE", 3)
+    monkeypatch.setattr(hint_log, "FLUSH_INTERVAL", 0.2)
+    hints = opened()
+    for number in range(1, 8):
+        hints.record(1, 0, number)
+    deadline = time.monotonic() + 5
+    while hints._writer.written < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # 3 + 3 rows when the batch is full, the last one after FLUSH_INTERVAL
+    assert hints._writer.batches == 3 and hints.stats()["pending"] == 0
+    assert stored(path) == [(1, 0, number) for number in range(1, 8)]
+
+
+def test_hints_are_restored_after_a_restart(opened):
+    hints = opened()
+    hints.record(1, 0, 1)
+    hints.record(1, 0, 2)
+    hints.record(1, 3, 1)
+    hints.record(2, 0, 1)
+    hints.close()
+
+    restarted = opened()
+    assert restarted.hints_used(1) == {0: 2, 3: 1}
+    assert restarted.hints_used(2) == {0: 1}
+    assert restarted.hints_used(3) == {}
+    # Given again after the restore: not counted twice
+    restarted.record(1, 0, 2)
+    assert restarted.stats()["challenges"][0]["hints"] == 3
+
+
+def test_stats_per_challenge(opened):
+    hints = opened()
+    for uid, challenge, number in [(1, 0, 1), (1, 0, 2), (2, 0, 1), (2, 0, 1), (1, 2, 1),
+                                   (3, 0, 3)]:
+        hints.record(uid, challenge, number)
+    assert hints.stats()["challenges"] == [
+        {"challenge": 0, "hints": 4, "players": 3, "by_hint": [2, 1, 1]},
+        {"challenge": 2, "hints": 1, "players": 1, "by_hint": [1]},
+    ]
+
+
+def test_rows_lost_at_exit_are_logged(monkeypatch, opened, caplog):
+    monkeypatch.setattr(hint_log, "FLUSH_INTERVAL", 5)
+    hints = opened()
+    monkeypatch.setattr(hint_log, "INSERT", "INSERT INTO missing VALUES (?, ?, ?, ?)")
+    hints.record(7, 1, 1)
+    with caplog.at_level(logging.ERROR, logger="hint_log"):
+        hints.close()
+    lost = [r.getMessage() for r in caplog.records if "Lost hint row" in r.getMessage()]
+    assert len(lost) == 1 and "(7, 1, 1, " in lost[0]
@@ -0,0 +1,111 @@
+import pytest
+
+import lcd_driver
+import lcd_emulator
+from lcd_driver import LcdDriver, glyph
+
+
+@pytest.mark.parametrize("power", lcd_emulator.POWER_STATES)
+@pytest.mark.parametrize("sequence", ["lcd_driver byte", "lcd_driver burst",
+                                      "lcd_driver burst, R/W not wired"])
+def test_driver_init_has_no_violations(sequence, power):
+    bus, ok, _ = lcd_emulator.replay(lcd_emulator.SEQUENCES[sequence], power)
+    assert ok
+    assert bus.violations == []
+
+
+@pytest.fixture
+def emulated(monkeypatch):
+    """Open a driver on an emulated cold-booted display."""
+    drivers = []
+
+    def open_driver(transport="burst", rw_wired=True):
+        bus = lcd_emulator.SMBus(power="cold", rw_wired=rw_wired)
+        monkeypatch.setattr(lcd_driver, "sleep", bus.sleep)
+        monkeypatch.setattr(lcd_driver, "monotonic", bus.now)
+        lcd = LcdDriver(lcd_driver.TRANSPORTS[transport](bus), settle=0)
+        drivers.append(lcd)
+        lcd.init()
+        lcd.flush()
+        return bus, lcd
+
+    yield open_driver
+    for lcd in drivers:
+        lcd.close()
+
+
+@pytest.mark.parametrize("transport, rw_wired", [("byte", True), ("burst", True),
+                                                  ("burst", False)])
+def test_redraws_have_no_violations(emulated, transport, rw_wired):
+    bus, lcd = emulated(transport, rw_wired)
+    for frame in (["THE BLACKBOX", "00:12:34"], ["THE BLACKBOX", "00:12:35"],
+                  ["GAME OVER", ""], []):
+        lcd.show(frame)
+        lcd.flush()
+        assert bus.lines() == [(frame[row] if row < len(frame) else "").ljust(16)
+                               for row in range(2)]
+    # Clear and rewrite through the byte stream, as LcdScreen does
+    for nibble in (0x00, 0x10, 0x80, 0x00):
+        lcd.feed(nibble)
+    for char in b"HI":
+        lcd.feed(lcd_driver.RS | (char & 0xF0))
+        lcd.feed(lcd_driver.RS | ((char << 4) & 0xF0))
+    lcd.flush()
+    assert bus.lines()[0].startswith("HI ")
+    assert bus.violations == []
+
+
+def reinit_delays(lcd, bus, monkeypatch):
+    """The sleeps of a second (warm) init."""
+    delays = []
+    monkeypatch.setattr(lcd_driver, "sleep", lambda s: delays.append(s) or bus.sleep(s))
+    lcd.init()
+    lcd.flush()
+    return delays
+
+
+def test_busy_flag_replaces_fixed_sleeps(emulated, monkeypatch):
+    bus, lcd = emulated()
+    assert lcd.busy_flag
+    assert lcd.busy_times["clear"][0] == 1
+    # Only the reset waits; clear display is waited for by polling
+    assert reinit_delays(lcd, bus, monkeypatch) == list(lcd_driver.WARM_RESET_DELAYS)
+    assert lcd.busy_flag
+    assert lcd.busy_times["clear"][0] == 2
+    assert bus.violations == []
+
+
+def test_fixed_sleeps_without_rw(emulated, monkeypatch):
+    bus, lcd = emulated(rw_wired=False)
+    assert not lcd.busy_flag
+    assert reinit_delays(lcd, bus, monkeypatch) == (list(lcd_driver.WARM_RESET_DELAYS)
+                                                   + [lcd_driver.SLOW_COMMAND_TIME])
+    assert "clear" not in lcd.busy_times
+    assert bus.violations == []
+
+
+def test_glyph_cache_evicts_least_recently_used(emulated):
+    bus, lcd = emulated()
+    names = ["skull", "drop", "heart", "eye", "bar0", "bar1", "bar2", "bar3"]
+    lcd.write("".join(glyph(name) for name in names))
+    lcd.flush()
+    assert lcd.glyph_uploads == 8
+
+    # All 8 slots are on screen: a 9th glyph falls back to its character
+    lcd.write(glyph("bar4"), col=8)
+    lcd.flush()
+    assert lcd.text()[0][8] == "="
+
+    # Skull and drop leave the screen, drop is used again: skull is evicted
+    lcd.write("  ")
+    lcd.write(glyph("drop"), col=9)
+    lcd.write(glyph("bar4"), col=10)
+    lcd.flush()
+    slots = lcd._slots
+    assert lcd_driver.GLYPH_NAMES["skull"].codepoint not in slots
+    assert slots[lcd_driver.GLYPH_NAMES["bar4"].codepoint] == 0
+    assert slots[lcd_driver.GLYPH_NAMES["drop"].codepoint] == 1
+    assert lcd.glyph_uploads == 9 and lcd.glyph_hits == 1
+    assert bytes(bus.lcd.cgram[0:8]) == lcd_driver.GLYPH_NAMES["bar4"].rows
+    assert lcd.text()[0][9:11] == glyph("drop") + glyph("bar4")
+    assert bus.violations == []
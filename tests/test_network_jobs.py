@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+from fastapi import APIRouter
+
+import network_jobs
+import wifi_scan
+from network_jobs import JobQueue
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    queue = JobQueue()
+    queue.start()
+    monkeypatch.setattr(network_jobs, "jobs", queue)
+    return queue
+
+
+def test_jobs_run_in_order_and_equal_jobs_are_shared(jobs):
+    release = threading.Event()
+    ran = []
+    first = jobs.submit("action", {"connect": 1}, lambda: release.wait(5) and ran.append(1))
+    second = jobs.submit("action", {"disconnect": 1}, lambda: ran.append(2))
+    assert jobs.submit("action", {"disconnect": 1}, lambda: ran.append(3)) is second
+    release.set()
+    assert second.wait(5) and first.done
+    assert ran == [1, 2]
+    assert [job["id"] for job in jobs.recent()] == [second.id, first.id]
+
+
+def test_call_returns_the_result_or_raises(jobs):
+    def fail():
+        raise OSError("no radio")
+
+    assert jobs.call("scan", {"scan": 1}, lambda: {"success": True}) == {"success": True}
+    with pytest.raises(RuntimeError, match="no radio"):
+        jobs.call("scan", {"scan": 1}, fail)
+
+
+def test_queued_runs_changes_as_jobs_but_not_scans(jobs):
+    calls = []
+
+    def action(connect: int = 0, scan: int = 0):
+        calls.append((connect, scan))
+        return {"success": True}
+
+    submit = network_jobs.queued(action, "action")
+    assert submit(scan=1) == {"success": True}
+    assert submit() == {"success": True}
+    response = submit(connect=1)
+    assert response["job"]["name"] == "action"
+    assert jobs.get(response["job"]["id"]).wait(5)
+    assert calls == [(0, 1), (0, 0), (1, 0)]
+
+
+def test_scanner_scans_run_on_the_job_worker(monkeypatch):
+    monkeypatch.setattr(network_jobs, "jobs", None)
+    monkeypatch.setattr(wifi_scan, "run_scan", None)
+    monkeypatch.setattr(wifi_scan, "SETTLE", 0)
+    jobs = network_jobs.start(APIRouter())
+    scanner = wifi_scan.ScanCache(lambda: {"access-points": []},
+                                  lambda: {"success": True}, interval=60)
+    scanner.start()
+    try:
+        assert scanner.request_scan().result(5) == {"success": True}
+    finally:
+        scanner.stop()
+    assert [job["name"] for job in jobs.recent()] == ["scan"]
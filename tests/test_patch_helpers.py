@@ -0,0 +1,24 @@
+from patch_helpers import (ACTION_ROUTE, insert_after_line, insert_before_line,
+                           mount_after_action_route)
+
+SOURCE = (
+    "    def routes(self):\n"
+    "        " + ACTION_ROUTE + ", self._action)\n"
+    "        self._app.include_router(self._rest_router)\n"
+)
+
+
+def test_mount_after_action_route_keeps_indent():
+    content = mount_after_action_route(SOURCE, ["import foo", "foo.start()"])
+    assert content.splitlines()[2:4] == ["        import foo", "        foo.start()"]
+    assert content.splitlines()[-1] == "        self._app.include_router(self._rest_router)"
+
+
+def test_mount_without_action_route():
+    assert mount_after_action_route("def main():\n    pass\n", ["x"]) is None
+
+
+def test_insert_around_last_line_without_newline():
+    content = "a\n    b"
+    assert insert_after_line(content, content.find("b"), ["c"]) == "a\n    b\n    c"
+    assert insert_before_line(content, content.find("b"), ["c"]) == "a\n    c\n    b"
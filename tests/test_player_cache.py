@@ -0,0 +1,43 @@
+from conftest import Player
+from player_cache import PlayerCache
+
+
+def test_written_players_are_served_from_the_cache():
+    loads = []
+    cache = PlayerCache(lambda uid: loads.append(uid) or {"uid": uid})
+    player = Player(1, "a", 50)
+    cache.written(1, player)
+    assert cache.get(1)["elapsed_time"] == 50
+
+    # A hint penalty on the object shows before it is saved
+    player.elapsed_time = 80
+    assert cache.get(1)["elapsed_time"] == 80
+
+    cache.written(1, None)
+    assert cache.get(1) == {"uid": 1}
+    assert cache.get(1) == {"uid": 1}
+    assert loads == [1]
+
+
+def test_unknown_writes_empty_the_cache():
+    cache = PlayerCache(lambda uid: {"uid": uid})
+    cache.written(1, Player(1, "a", 50))
+    cache.written(None, None)
+    assert cache.get(1) == {"uid": 1}
+
+
+def test_missing_players_are_remembered_until_written(monkeypatch):
+    loads = []
+    cache = PlayerCache(lambda uid: loads.append(uid) and None)
+    assert cache.get(7) is None and cache.get(7) is None
+    assert loads == [7]
+
+    cache.written(7, Player(7, "g", 30))
+    assert cache.get(7)["player_name"] == "g"
+    cache.written(7, None)
+    assert cache.get(7) is None
+    assert loads == [7, 7]
+
+    monkeypatch.setattr(PlayerCache, "MISS_TTL", 0)
+    assert cache.get(8) is None and cache.get(8) is None
+    assert loads == [7, 7, 8, 8]
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+
+from player_store import DuplicatePlayerName, open_store
+
+
+class Player:
+    FLAGS_CHALLENGE_COMPLETE = 4
+
+    def __init__(self, uid, player_name, flags=0, elapsed_time=0):
+        self._uid = uid
+        self._player_name = player_name
+        self._pin = "1234"
+        self._flags = flags
+        self._elapsed_time = elapsed_time
+        self._hints = {"1": [0.5, None]}
+        self._alive = True
+
+    def get_uid(self):
+        return self._uid
+
+    def get_player_name(self):
+        return self._player_name
+
+    def get_flags(self):
+        return self._flags
+
+
+class LegacyStore:
+    """The old store: hands out uids, and has writes keyed by uid."""
+
+    def __init__(self, players=()):
+        self.players = {p.get_uid(): p for p in players}
+
+    def list_players(self):
+        return dict(self.players)
+
+    def get_player(self, uid):
+        return self.players.get(uid)
+
+    def add_player(self, player):
+        uid = 100 + len(self.players)
+        self.players[uid] = player
+        return uid
+
+    def set_flag(self, uid, flag):
+        self.players[uid]._flags |= flag
+
+    def finish(self, uid, elapsed_time):
+        self.players[uid]._elapsed_time = elapsed_time
+        self.set_flag(uid, Player.FLAGS_CHALLENGE_COMPLETE)
+
+    def version(self):
+        return "legacy"
+
+
+@pytest.fixture
+def legacy():
+    return LegacyStore([Player(1, "a"), Player(2, "b")])
+
+
+@pytest.fixture
+def store(legacy, tmp_path):
+    return open_store(legacy, Player, str(tmp_path / "players.sqlite"))
+
+
+def test_migration_and_login(store):
+    assert store.count_players() == 2
+    assert store.login("a", 1234).get_uid() == 1
+    assert store.login("a", 9999) is None
+
+
+def test_add_player_takes_the_old_store_uid(store):
+    assert store.add_player(Player(None, "c")) == 102
+    assert store.get_player_by_name("c").get_uid() == 102
+    with pytest.raises(DuplicatePlayerName):
+        store.add_player(Player(None, "c"))
+
+
+def test_uid_writes_of_the_old_store_reach_sqlite(store):
+    store.set_flag(2, Player.FLAGS_CHALLENGE_COMPLETE)
+    assert store.get_player(2).get_flags() == Player.FLAGS_CHALLENGE_COMPLETE
+    assert list(store.list_players(flags_include=Player.FLAGS_CHALLENGE_COMPLETE)) == [2]
+    assert store.version() == "legacy"
+
+
+def test_attributes_keep_their_types_after_migration(legacy, store):
+    for uid, original in legacy.players.items():
+        migrated = store.get_player(uid)
+        assert type(migrated) is Player
+        assert {k: (type(v), v) for k, v in vars(migrated).items()} == \
+            {k: (type(v), v) for k, v in vars(original).items()}
+
+
+@pytest.mark.parametrize("value", [(1, 2), {1: "a"}, [set()], datetime(2026, 1, 1)])
+def test_attributes_json_would_change_are_refused(legacy, store, value):
+    player = Player(None, "c")
+    player._extra = value
+    with pytest.raises(TypeError, match="_extra"):
+        store.add_player(player)
+    assert len(legacy.players) == 2
+
+
+def test_unknown_writes_of_the_old_store_reach_sqlite(store):
+    store.finish(1, 321)
+    assert store.get_player(1)._elapsed_time == 321
+    assert list(store.list_players(flags_include=Player.FLAGS_CHALLENGE_COMPLETE)) == [1]
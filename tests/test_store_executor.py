@@ -0,0 +1,153 @@
+import threading
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import store_executor
+from player_store import SqlitePlayerStore
+from store_executor import Lane, PooledStore, StoreBusy
+
+
+class Store:
+    """Records the thread of every call."""
+
+    def __init__(self):
+        self.threads = {}
+        self.written = []
+
+    def _call(self, name):
+        self.threads.setdefault(name, set()).add(threading.current_thread().name)
+
+    def get_player(self, uid):
+        self._call("get_player")
+
+    def login(self, player_name, pin):
+        self._call("login")
+
+    def set_flag(self, uid, flag):
+        self._call("set_flag")
+        self.written.append(uid)
+
+
+class SqliteStore(SqlitePlayerStore):
+    def __init__(self):
+        self._legacy = None
+        self.threads = {}
+
+    def login(self, player_name, pin):
+        Store._call(self, "login")
+
+
+@pytest.fixture
+def pooled():
+    pool = PooledStore(Store())
+    yield pool
+    pool.shutdown()
+
+
+def lanes(pool):
+    return {name: {thread.rsplit("_", 1)[0] for thread in threads}
+            for name, threads in pool._store.threads.items()}
+
+
+def test_reads_and_writes_run_on_their_lanes(pooled):
+    pooled.get_player(1)
+    pooled.set_flag(1, 4)
+    pooled.login("a", 1234)
+    assert lanes(pooled) == {"get_player": {"store-read"}, "set_flag": {"store-write"},
+                             "login": {"store-write"}}
+
+
+def test_sqlite_login_is_a_read():
+    pool = PooledStore(SqliteStore())
+    try:
+        pool.login("a", 1234)
+        assert lanes(pool) == {"login": {"store-read"}}
+    finally:
+        pool.shutdown()
+
+
+def test_writes_run_in_submission_order(pooled):
+    running, release = threading.Event(), threading.Event()
+    store = pooled._store
+
+    def set_flag(uid, flag):
+        if uid == 0:
+            running.set()
+            release.wait(5)
+        else:
+            store.written.append(uid)
+
+    store.set_flag = set_flag
+    queued = pooled.write._executor._work_queue
+    callers = []
+    for uid in range(6):
+        callers.append(threading.Thread(target=pooled.set_flag, args=(uid, 4)))
+        callers[-1].start()
+        # uid 0 is running, the others wait in the executor's queue
+        assert running.wait(5)
+        while queued.qsize() < uid:
+            pass
+    release.set()
+    for caller in callers:
+        caller.join(5)
+    assert store.written == [1, 2, 3, 4, 5]
+
+
+@pytest.fixture
+def full_lane(monkeypatch):
+    monkeypatch.setattr(store_executor, "MAX_PENDING", 1)
+    monkeypatch.setattr(store_executor, "SUBMIT_TIMEOUT", 0.05)
+    lane = Lane("write", 1)
+    release = threading.Event()
+    holder = threading.Thread(target=lane.call, args=(release.wait, 5))
+    holder.start()
+    while lane.stats()["depth"] < 1:
+        pass
+    yield lane
+    release.set()
+    holder.join(5)
+    lane.shutdown()
+
+
+def test_full_lane_raises_store_busy(full_lane):
+    with pytest.raises(StoreBusy, match="write queue is full"):
+        full_lane.call(lambda: None)
+    stats = full_lane.stats()
+    assert stats["depth"] == 1 and stats["calls"] == 0
+
+
+def test_busy_handlers_answer_503(full_lane):
+    app = FastAPI()
+    app.add_api_route("/player/login",
+                      store_executor.busy_as_503(lambda: full_lane.call(lambda: None)))
+    response = TestClient(app).get("/player/login")
+    assert response.status_code == 503
+    assert response.json() == {"success": False,
+                               "error": "Player store write queue is full"}
+
+
+def test_stats_report_depth_and_times(monkeypatch, pooled):
+    clock = iter([0.0, 0.5, 0.7, 1.0, 1.0, 1.1])
+    monkeypatch.setattr(store_executor, "time",
+                        types.SimpleNamespace(monotonic=lambda: next(clock)))
+
+    def fail(uid):
+        raise KeyError(uid)
+
+    pooled._store.get_player = fail
+    pooled.set_flag(1, 4)
+    with pytest.raises(KeyError):
+        pooled.get_player(1)
+
+    monkeypatch.setattr(store_executor, "pooled", pooled)
+    app = FastAPI()
+    app.include_router(store_executor.router)
+    stats = TestClient(app).get("/store/stats").json()
+    assert stats["write"] == {"workers": 1, "depth": 0, "max_depth": 1, "calls": 1,
+                              "errors": 0, "wait_ms": {"avg": 500.0, "p95": 500.0, "max": 500.0},
+                              "run_ms": {"avg": 200.0, "p95": 200.0, "max": 200.0}}
+    assert stats["read"]["errors"] == 1 and stats["read"]["calls"] == 1
+    assert stats["read"]["wait_ms"]["max"] == 0 and stats["read"]["run_ms"]["max"] == 100.0
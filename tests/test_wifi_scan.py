@@ -0,0 +1,30 @@
+from wifi_scan import ScanCache
+
+
+def ap(bssid, signal):
+    return {"bssid": bssid, "ssid": "net-" + bssid, "signal": signal}
+
+
+def test_list_sends_only_the_changes_since_a_version():
+    responses = [{"access-points": [ap("a", 50), ap("b", 40)], "wifi": True},
+                 {"access-points": [ap("a", 50), ap("c", 30)], "wifi": True}]
+    cache = ScanCache(lambda: responses.pop(0), dict)
+
+    full = cache.list()
+    assert [x["bssid"] for x in full["access-points"]] == ["a", "b"]
+    assert full["delta"] is False and full["wifi"] is True
+
+    cache.refresh()
+    delta = cache.list(since=full["version"])
+    assert delta["delta"] is True
+    assert [x["bssid"] for x in delta["access-points"]] == ["c"]
+    assert delta["removed"] == ["b"]
+
+    assert cache.list(since=delta["version"])["access-points"] == []
+    # From before this cache started (a restart): the full list
+    assert cache.list(since=0)["delta"] is False
+
+
+def test_scan_requests_share_one_scan():
+    cache = ScanCache(lambda: {"access-points": []}, dict)
+    assert cache.request_scan() is cache.request_scan()
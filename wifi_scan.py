@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Background Wi-Fi scanning with a cached access point table.
+
+connect.html polls /network/list every few seconds and asks for a scan
+with /network/action?scan=1 when it opens. Each of those used to reach
+the radio. With add_wifi_scan.py applied, theblackbox.py registers
+network_list() for /network/list and wraps its /network/action handler
+in shared_scan(), and a scanner thread owns the radio:
+
+  - It scans every SCAN_INTERVAL seconds while /network/list has been
+    asked for in the last IDLE_AFTER seconds, and not at all otherwise,
+    so the kiosk gets the CPU back when nobody looks at the list.
+  - A scan=1 request joins the scan in flight, or the next one, instead
+    of starting its own; concurrent requests share one scan.
+  - SETTLE seconds after a scan, the list is read once from the original
+    /network/list handler into the cache.
+  - With network_jobs.py deployed, each scan runs as a job on the
+    network job worker (run_scan), so it never overlaps a connect.
+
+/network/list answers from the cache; a cache older than TTL asks the
+scanner for a scan without waiting for it. Every access point (by
+bssid) carries the version it last changed at:
+
+  GET /network/list
+    {"access-points": [...], "version": 1792336601234, "delta": false}
+  GET /network/list?since=1792336601234
+    {"access-points": [changed or new], "removed": ["bssid", ...],
+     "version": 1792336601240, "delta": true}
+
+A since= older than the cache's history (or from before a restart)
+gets the full list.
+"""
+
+import concurrent.futures
+import functools
+import inspect
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+SCAN_INTERVAL = 15.0                # seconds between scans while wanted
+IDLE_AFTER = 60.0                   # stop scanning this long after the last list request
+TTL = 30.0                          # list age that asks for a scan right away
+SETTLE = 3.0                        # seconds from scan request to reading the results
+SCAN_TIMEOUT = 30.0                 # scan=1 requests wait at most this long
+REMOVED_KEPT = 256                  # removed bssids remembered for deltas
+
+# ScanCache set by start()
+cache = None
+# Runs a scan callable and returns its response; network_jobs.start()
+# sets it to run the scans on its worker
+run_scan = None
+
+
+def _caller(handler, **params):
+    """Call handler with the params its signature takes."""
+    accepted = inspect.signature(handler).parameters
+    kwargs = {k: v for k, v in params.items() if k in accepted}
+    return lambda: handler(**kwargs)
+
+
+class ScanCache(threading.Thread):
+    """Access point table, refreshed by one scanner thread."""
+
+    def __init__(self, read, scan, interval=SCAN_INTERVAL):
+        super().__init__(name="wifi-scanner", daemon=True)
+        self._read = read           # () -> original /network/list response
+        self._scan = scan           # () -> original scan=1 response
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._pending = None        # Future of the next scan
+        self._inflight = None       # Future of the scan running now
+        # Starts at the boot time, so versions from before a restart
+        # are older than the history and get the full list
+        self.version = int(time.time() * 1000)
+        self._floor = self.version
+        self._aps = {}              # bssid -> (version, access point), scan order
+        self._removed = {}          # bssid -> version it disappeared at
+        self._extra = {}            # other keys of the original response
+        self._refreshed = None      # monotonic time of the last read
+        self._wanted = 0.0          # monotonic time of the last list request
+        self.scans = 0
+
+    # ---- Scanning ----
+    def request_scan(self):
+        """Future of the scan in flight, or of the next one."""
+        with self._lock:
+            future = self._inflight or self._pending
+            if future is None:
+                future = self._pending = concurrent.futures.Future()
+        self._wake.set()
+        return future
+
+    def _wanted_recently(self):
+        return time.monotonic() - self._wanted < IDLE_AFTER
+
+    def run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                future, self._pending = self._pending, None
+                if future is None and self._wanted_recently():
+                    future = concurrent.futures.Future()
+                self._inflight = future
+            if future is None:
+                continue
+            try:
+                result = self._scan() if run_scan is None else run_scan(self._scan)
+            except Exception as e:
+                log.warning("Wi-Fi scan failed: %s", e)
+                result = {"error": str(e)}
+            self.scans += 1
+            with self._lock:
+                self._inflight = None
+            future.set_result(result)
+            if not self._stopping.wait(SETTLE):
+                self.refresh()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    # ---- Table ----
+    def refresh(self):
+        """Read the access point list and version what changed."""
+        try:
+            response = self._read()
+        except Exception as e:
+            log.warning("Reading the Wi-Fi list failed: %s", e)
+            return
+        aps = response.get("access-points") or []
+        with self._lock:
+            self._extra = {k: v for k, v in response.items() if k != "access-points"}
+            table = {}
+            for ap in aps:
+                bssid = ap.get("bssid")
+                current = self._aps.get(bssid)
+                if current is not None and current[1] == ap:
+                    table[bssid] = current
+                else:
+                    self.version += 1
+                    table[bssid] = (self.version, ap)
+                    self._removed.pop(bssid, None)
+            for bssid in self._aps.keys() - table.keys():
+                self.version += 1
+                self._removed[bssid] = self.version
+            while len(self._removed) > REMOVED_KEPT:
+                bssid = next(iter(self._removed))
+                self._floor = max(self._floor, self._removed.pop(bssid))
+            self._aps = table
+            self._refreshed = time.monotonic()
+
+    def list(self, since=-1):
+        """The /network/list response, or the changes after since."""
+        self._wanted = time.monotonic()
+        if self._refreshed is None:
+            self.refresh()
+        elif self._wanted - self._refreshed > TTL:
+            self.request_scan()
+        with self._lock:
+            if since < self._floor or since > self.version:
+                return dict(self._extra, **{"access-points": [ap for _, ap in self._aps.values()],
+                                            "version": self.version, "delta": False})
+            return {"access-points": [ap for changed, ap in self._aps.values() if changed > since],
+                    "removed": [bssid for bssid, gone in self._removed.items() if gone > since],
+                    "version": self.version, "delta": True}
+
+
+def start(list_handler, action_handler, interval=SCAN_INTERVAL):
+    """Cache list_handler's access points; scan through action_handler."""
+    global cache
+    if cache is None:
+        if "scan" in inspect.signature(action_handler).parameters:
+            scan = _caller(action_handler, scan=1)
+        else:
+            # Never call the action handler without knowing what it does
+            log.warning("/network/action takes no scan parameter; only reading the list")
+            scan = dict
+        cache = ScanCache(_caller(list_handler), scan, interval)
+        cache.start()
+    return cache
+
+
+def network_list(since: int = -1):
+    if cache is None:
+        return {"error": "Wi-Fi scanner not started"}
+    return cache.list(since)
+
+
+def shared_scan(action_handler):
+    """Wrap the /network/action handler so scan=1 joins the shared scan."""
+    @functools.wraps(action_handler)
+    def action(*args, **kwargs):
+        if cache is not None and kwargs.get("scan"):
+            try:
+                return cache.request_scan().result(SCAN_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                return {"error": "Wi-Fi scan timed out"}
+        return action_handler(*args, **kwargs)
+
+    return action